@@ -1,28 +1,174 @@
+import argparse
+import hashlib
+import json
 import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from intent_router import IntentRouter
+from tracing import span, start as start_tracing
 
 # --- Config runtime ---
 OLLAMA_LLM = os.getenv("OLLAMA_LLM", "gemma3")  # ton modèle local (déjà installé)
-OLLAMA_EMBED = os.getenv("OLLAMA_EMBED", "nomic-embed-text")  # modèle d'embeddings Ollama
+# modèle d'embeddings Ollama ; vide = celui enregistré par la collection active (voir embedding_migration.py)
+OLLAMA_EMBED = os.getenv("OLLAMA_EMBED", "")
+DEFAULT_EMBED = "nomic-embed-text"
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # modèles gardés chargés entre deux appels
 PERSIST_DIR = "./memo_db"  # persistance disque entre sessions
+MEMO_BACKEND = os.getenv("MEMO_BACKEND", "chroma")  # "chroma" ou "numpy" (index en process, voir numpy_store.py)
+INGEST_BATCH = int(os.getenv("MEMO_INGEST_BATCH", "64"))  # faits par appel d'embedding (import en masse)
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))  # budget de démarrage à froid
+# recherche hybride (lexical_index.py) : BM25 + vecteurs fusionnés par RRF
+LEXICAL_FASTPATH = os.getenv("MEMO_LEXICAL_FASTPATH", "on").lower() not in ("0", "off", "false", "no")
+RRF_DEPTH = int(os.getenv("MEMO_RRF_DEPTH", "10"))  # candidats pris dans chaque classement avant fusion
+
+# --- Initialisation paresseuse ---
+# Rien de lourd à l'import : LangChain, les embeddings, le store et le LLM sont
+# importés/construits au premier usage. L'aide et `from MemoryTry import handle` restent instantanés.
+STARTUP_TIMINGS: Dict[str, float] = {}  # étape -> millisecondes (voir --profile-startup)
+_init_lock = threading.RLock()
+_embeddings = None
+_store = None
+_lexical = None
+_lifecycle = None
+_chat = None
+_background_maintenance = False  # activé par la boucle interactive
+
+
+@contextmanager
+def _timed(step: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[step] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def active_collection() -> Dict:
+    """Pointeur memo_db/memo.active.json : collection active et son modèle d'embedding."""
+    from embedding_migration import read_pointer
+    return read_pointer(PERSIST_DIR)
+
+
+def embed_model() -> str:
+    return OLLAMA_EMBED or active_collection().get("embedding_model") or DEFAULT_EMBED
+
+
+def build_embeddings(model: str):
+    """Embeddings Ollama (avec cache LRU + disque, puis regroupement des appels concurrents)."""
+    from langchain_community.embeddings import OllamaEmbeddings
+    from embedding_batcher import EMBED_COALESCE, MEMO_EMBED_API, CoalescingEmbeddings
+    from embedding_cache import CachedEmbeddings
+    base = OllamaEmbeddings(model=model)
+    variant = ""
+    if EMBED_COALESCE:
+        base = CoalescingEmbeddings(base)  # appels concurrents regroupés en lots
+        if MEMO_EMBED_API == "embed":
+            variant = "embed"  # vecteurs normalisés : cachés à part de ceux de /api/embeddings
+    return CachedEmbeddings(base, model_name=model, variant=variant)
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _init_lock:
+            if _embeddings is None:
+                with _timed("import embeddings"):
+                    from langchain_community.embeddings import OllamaEmbeddings  # noqa: F401 (import seul)
+                with _timed("init embeddings"):
+                    _embeddings = build_embeddings(embed_model())
+    return _embeddings
+
+
+def open_store(collection: str, embeddings):
+    """Ouvre une collection (Chroma ou index NumPy selon MEMO_BACKEND) ; sert aussi à la migration."""
+    Path(PERSIST_DIR).mkdir(parents=True, exist_ok=True)
+    if MEMO_BACKEND == "numpy":
+        from numpy_store import NumpyVectorStore
+        return NumpyVectorStore(embeddings, PERSIST_DIR, collection_name=collection)
+    from langchain_community.vectorstores import Chroma
+    return Chroma(collection_name=collection, embedding_function=embeddings, persist_directory=PERSIST_DIR)
+
+
+def get_store():
+    """Vector store persistant de la collection active, construit avec le modèle d'embedding courant."""
+    global _store
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                embeddings = get_embeddings()
+                with _timed("import store"):
+                    from embedding_migration import check_embedding_model
+                    if MEMO_BACKEND == "numpy":
+                        import numpy_store  # noqa: F401
+                    else:
+                        from langchain_community.vectorstores import Chroma  # noqa: F401
+                with _timed("init store"):
+                    store = open_store(active_collection()["collection"], embeddings)
+                    # refuse de mélanger des vecteurs de deux modèles (EmbeddingModelMismatch)
+                    check_embedding_model(store, embeddings.model_name)
+                _store = store
+    return _store
+
+
+def get_lexical():
+    """Index BM25 des souvenirs (memo_db/memo.bm25.jsonl), reconstruit depuis le store s'il manque."""
+    global _lexical
+    if _lexical is None:
+        with _init_lock:
+            if _lexical is None:
+                with _timed("init lexical"):
+                    from lexical_index import LexicalIndex
+                    # textes seuls (indépendant du modèle d'embedding) : commun à toutes les collections
+                    index = LexicalIndex(PERSIST_DIR, collection_name="memo")
+                if not index.exists:
+                    with _timed("build lexical"):
+                        rebuild_lexical(index)
+                _lexical = index
+    return _lexical
+
+
+def get_lifecycle():
+    """Doublons, accès, éviction et maintenance de la collection (memory_lifecycle.py)."""
+    global _lifecycle
+    if _lifecycle is None:
+        with _init_lock:
+            if _lifecycle is None:
+                from memory_lifecycle import MemoryLifecycle
+                _lifecycle = MemoryLifecycle(get_store(), get_lexical(), get_embeddings(), key=fact_hash)
+                if _background_maintenance:
+                    _lifecycle.start()
+    return _lifecycle
+
+
+def get_chat():
+    """LLM local (gemma3 par défaut)."""
+    global _chat
+    if _chat is None:
+        with _init_lock:
+            if _chat is None:
+                with _timed("import chat"):
+                    from langchain_community.chat_models import ChatOllama
+                with _timed("init chat"):
+                    _chat = ChatOllama(model=OLLAMA_LLM, keep_alive=OLLAMA_KEEP_ALIVE)
+    return _chat
+
+
+def profile_startup() -> bool:
+    """Construit tous les composants et affiche le temps par étape. True si dans le budget."""
+    for get in (get_embeddings, get_store, get_lexical, get_chat):
+        get()
+    total = round(sum(STARTUP_TIMINGS.values()), 1)
+    print("Démarrage à froid (ms) :")
+    for step, ms in STARTUP_TIMINGS.items():
+        print(f"  {step:<18} {ms:>8.1f}")
+    print(f"  {'total':<18} {total:>8.1f}  (budget {STARTUP_BUDGET_MS:.0f})")
+    return total <= STARTUP_BUDGET_MS
 
-# --- LangChain / Chroma (versions community) ---
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.chat_models import ChatOllama
-from langchain_community.vectorstores import Chroma
-from langchain_core.messages import HumanMessage, SystemMessage
-
-# 1) Initialiser embeddings + Chroma (persistant)
-embeddings = OllamaEmbeddings(model=OLLAMA_EMBED)
-Path(PERSIST_DIR).mkdir(parents=True, exist_ok=True)
-store = Chroma(
-    collection_name="memo",
-    embedding_function=embeddings,
-    persist_directory=PERSIST_DIR,
-)
-
-# 2) Initialiser le LLM local (gemma3)
-chat = ChatOllama(model=OLLAMA_LLM)
 def extract_after_prefix(msg: str, prefix: str) -> str:
     low = msg.lower()
     i = low.find(prefix)
@@ -36,21 +182,201 @@ def extract_after_prefix(msg: str, prefix: str) -> str:
     return msg[j:].strip()
 
 
+def fact_hash(text: str) -> str:
+    """Empreinte du contenu (espaces et casse normalisés) : sert d'id dans la collection."""
+    norm = " ".join(text.split()).casefold()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
 def remember(text: str) -> str:
     """
     Ajoute un souvenir au vector store et persiste sur disque.
     """
     if not text.strip():
         return "Rien à mémoriser."
-    store.add_texts([text.strip()], metadatas=[{"type": "memory"}])
+    from memory_lifecycle import new_metadata
+
+    text = text.strip()
+    h = fact_hash(text)
+    store = get_store()
+    lifecycle = get_lifecycle()  # construit avant l'ajout (sinon le fait serait indexé deux fois)
+    if store.get(ids=[h])["ids"]:
+        lifecycle.touch([h])
+        return "Je le savais déjà."
+    # quasi-doublon (formulation différente) : le vecteur calculé ici est réutilisé par add_texts (cache)
+    if lifecycle.find_near_duplicate(get_embeddings().embed_documents([text])[0]):
+        return "Je le savais déjà (sous une autre forme)."
+    with span("vector.add", n=1):
+        store.add_texts([text], metadatas=[new_metadata(h)], ids=[h])
+    lifecycle.lexical.add([h], [text])
+    if lifecycle.over_capacity():
+        lifecycle.evict(protect=[h])  # le nouveau fait (aucun accès) n'est pas candidat
+    if not store.get(ids=[h])["ids"]:
+        return "Je n'ai pas pu le garder en mémoire."
     # store.persist()
     return "C'est noté, je m'en souviendrai."
 
+
+# --- Import en masse ---
+def iter_facts(path: str) -> Iterator[str]:
+    """
+    Lit les faits au fil de l'eau :
+      - .jsonl : un objet par ligne ({"text": ...} ou {"fact": ...}) ou une chaîne JSON
+      - sinon  : un fait par ligne (lignes vides et « # commentaires » ignorées)
+    """
+    is_jsonl = path.lower().endswith(".jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or (not is_jsonl and line.startswith("#")):
+                continue
+            if is_jsonl:
+                obj = json.loads(line)
+                line = obj if isinstance(obj, str) else (obj.get("text") or obj.get("fact") or "")
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_documents(page_size: int = 1000) -> Iterator[List[str]]:
+    """Textes de tous les souvenirs du store, page par page."""
+    store = get_store()
+    offset = 0
+    while True:
+        docs = store.get(include=["documents"], limit=page_size, offset=offset)["documents"]
+        if not docs:
+            return
+        yield docs
+        offset += len(docs)
+
+
+def known_hashes(page_size: int = 1000) -> Set[str]:
+    """Empreintes de tous les souvenirs déjà présents (y compris ceux d'avant les ids hachés)."""
+    seen: Set[str] = set()
+    for docs in iter_documents(page_size):
+        seen.update(fact_hash(d) for d in docs)
+    return seen
+
+
+def rebuild_lexical(index, page_size: int = 1000) -> int:
+    """Réindexe tout le store dans l'index BM25 (premier lancement, ou après un import interrompu)."""
+    for docs in iter_documents(page_size):
+        index.add([fact_hash(d) for d in docs], docs)
+    index.compact()
+    return len(index)
+
+
+def remember_many(facts: Iterable[str], batch_size: int = INGEST_BATCH) -> Dict:
+    """
+    Ajoute des faits par lots : un seul add_texts (donc un seul embed_documents et
+    une seule écriture Chroma) par lot. Les doublons (déjà en base ou dans l'import) sont ignorés,
+    ainsi que les quasi-doublons d'un souvenir déjà en base.
+    """
+    from memory_lifecycle import new_metadata
+
+    t0 = time.perf_counter()
+    store = get_store()
+    seen = known_hashes()
+    lifecycle = get_lifecycle()
+    stats = {"read": 0, "added": 0, "duplicates": 0, "near_duplicates": 0}
+    batch: List[str] = []
+    ids: List[str] = []
+
+    def flush_batch():
+        if not batch:
+            return
+        vectors = get_embeddings().embed_documents(list(batch))  # remis en cache pour add_texts
+        keep = [i for i, v in enumerate(vectors) if not lifecycle.find_near_duplicate(v)]
+        stats["near_duplicates"] += len(batch) - len(keep)
+        texts, keys = [batch[i] for i in keep], [ids[i] for i in keep]
+        if texts:
+            with span("vector.add", n=len(texts)):
+                store.add_texts(texts, metadatas=[new_metadata(h) for h in keys], ids=keys)
+            lifecycle.lexical.add(keys, texts)
+        stats["added"] += len(texts)
+        batch.clear()
+        ids.clear()
+
+    for fact in facts:
+        stats["read"] += 1
+        h = fact_hash(fact)
+        if h in seen:
+            stats["duplicates"] += 1
+            continue
+        seen.add(h)
+        batch.append(fact)
+        ids.append(h)
+        if len(batch) >= batch_size:
+            flush_batch()
+    flush_batch()
+    if lifecycle.over_capacity():
+        stats["evicted"] = lifecycle.evict()
+
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    stats["facts_per_s"] = round(stats["read"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
+
+
+def ingest_file(path: str, batch_size: int = INGEST_BATCH) -> Dict:
+    return remember_many(iter_facts(path), batch_size=batch_size)
+
+def _doc_id(doc) -> str:
+    return doc.metadata.get("hash") or fact_hash(doc.page_content)
+
+
+def search(query: str, k: int = 3, touch: bool = True, info: Optional[Dict] = None) -> List:
+    """
+    Recherche hybride : classement BM25 + classement vectoriel fusionnés par RRF.
+    Chemin rapide : si le meilleur résultat lexical contient tous les mots de la requête
+    (ex: « Qu'aime André ? »), on répond sans calculer d'embedding.
+    touch=False : l'appelant ne compte comme accès que les souvenirs qu'il utilise vraiment.
+    info : dict rempli avec {"lexical_only": bool} (chemin rapide pris ou non).
+    """
+    from langchain_core.documents import Document
+    from lexical_index import rrf
+
+    depth = max(k, RRF_DEPTH)
+    with span("memory.search", k=k) as sp:
+        lexical = get_lexical()
+        with span("lexical.search", k=depth) as lsp:
+            lex_hits = [doc_id for doc_id, _ in lexical.search(query, k=depth)]
+            lsp.set(hits=len(lex_hits))
+        found = {i: Document(page_content=lexical.text(i), metadata={"type": "memory", "hash": i})
+                 for i in lex_hits}
+        fast = bool(LEXICAL_FASTPATH and lex_hits and lexical.coverage(query, lex_hits[0]) >= 1.0)
+        if info is not None:
+            info["lexical_only"] = fast
+        if fast:
+            sp.set(hits=min(k, len(lex_hits)), lexical_only=1)
+            if touch:
+                get_lifecycle().touch(lex_hits[:k])
+            return [found[i] for i in lex_hits[:k]]
+
+        with span("vector.search", k=depth) as vsp:
+            vec_docs = get_store().similarity_search(query, k=depth)
+            vsp.set(hits=len(vec_docs))
+        vec_hits = []
+        for d in vec_docs:
+            found.setdefault(_doc_id(d), d)
+            vec_hits.append(_doc_id(d))
+        docs = [found[i] for i, _ in rrf([lex_hits, vec_hits])[:k]]
+        sp.set(hits=len(docs), lexical_only=0)
+    if touch:
+        get_lifecycle().touch([_doc_id(d) for d in docs])
+    return docs
+
+def forget(query: str, k: int = 5) -> str:
+    """Oublie les souvenirs qui correspondent à la requête (store vectoriel + index BM25)."""
+    texts = get_lifecycle().forget(query, search(query, k=k))
+    if not texts:
+        return "Je n'ai rien trouvé à oublier."
+    return "J'ai oublié :\n" + "\n".join(f"- {t}" for t in texts)
+
 def recall(query: str, k: int = 3) -> str:
     """
     Recherche sémantique dans la mémoire.
     """
-    docs = store.similarity_search(query, k=k)
+    docs = search(query, k=k)
     if not docs:
         return "Je n'ai rien trouvé dans ma mémoire."
     # Retour simple : listes des contenus
@@ -59,11 +385,28 @@ def recall(query: str, k: int = 3) -> str:
         lines.append(f"- {i}. {d.page_content}")
     return "Voici ce que j'ai retrouvé :\n" + "\n".join(lines)
 
+# cumul des answer_with_mem (commande `stats`)
+PACK_STATS = {"calls": 0, "candidates": 0, "kept": 0, "tokens": 0, "saved_tokens": 0}
+
 def answer_with_mem(context_query: str, user_msg: str) -> str:
     """
     (Optionnel) Utilise les souvenirs pertinents comme contexte pour répondre avec gemma3.
+    Les candidats sont filtrés (seuil, redondance) et tassés dans un budget de tokens (context_packing.py).
     """
-    docs = store.similarity_search(context_query, k=3)
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from context_packing import MEMO_PACK, MEMO_PACK_CANDIDATES, pack_context
+
+    if MEMO_PACK:
+        info: Dict = {}
+        hits = search(context_query, k=MEMO_PACK_CANDIDATES, touch=False, info=info)
+        # chemin rapide : le classement BM25 est réutilisé, la question n'est pas embeddée
+        docs, stats = pack_context(context_query, hits, get_embeddings(), ranked=info["lexical_only"])
+        get_lifecycle().touch([_doc_id(d) for d in docs])
+        PACK_STATS["calls"] += 1
+        for key in ("candidates", "kept", "tokens", "saved_tokens"):
+            PACK_STATS[key] += stats[key]
+    else:
+        docs = search(context_query, k=3)
     context = "\n".join(d.page_content for d in docs) if docs else "Aucun souvenir pertinent."
     messages = [
         SystemMessage(content=(
@@ -72,41 +415,117 @@ def answer_with_mem(context_query: str, user_msg: str) -> str:
         )),
         HumanMessage(content=f"CONTEXTE_MEMOIRE:\n{context}\n\nQuestion:\n{user_msg}")
     ]
-    resp = chat(messages)
+    with span("llm.invoke", model=OLLAMA_LLM) as sp:
+        sp.set_prompt(messages)
+        resp = get_chat().invoke(messages)
+        sp.set_output(resp.content)
     return resp.content
 
+# --- Commandes (répondues sans LLM par le routeur) ---
+def _cmd_remember(msg: str) -> str:
+    fact = extract_after_prefix(msg, "souviens-toi de")
+    if not fact:
+        return "Je n'ai rien à mémoriser (format: « Souviens-toi de : <fait> »)."
+    return remember(fact)
+
+def _cmd_recall(msg: str) -> str:
+    ask = extract_after_prefix(msg, "rappelle-moi")
+    if not ask:
+        return "Dis-moi ce que je dois rappeler (format: « Rappelle-moi : <question> »)."
+    return recall(ask, k=3)
+
+def _cmd_forget(msg: str) -> str:
+    # oubli explicite (store vectoriel, pas seulement les slots)
+    what = extract_after_prefix(msg, "oublie")
+    if not what:
+        return "Dis-moi quoi oublier (format: « Oublie : <souvenir> »)."
+    return forget(what)
+
+def _cmd_stats(msg: str) -> str:
+    # cache d'embeddings, cycle de vie, routage, contexte des réponses
+    embeddings = get_embeddings()
+    batcher = getattr(embeddings.base, "stats", None)
+    return ("Cache d'embeddings : " + json.dumps(embeddings.stats(), ensure_ascii=False)
+            + ("\nLots d'embeddings : " + json.dumps(batcher(), ensure_ascii=False) if batcher else "")
+            + f"\nSouvenirs : {len(get_lexical())} ; cycle de vie : "
+            + json.dumps(get_lifecycle().stats, ensure_ascii=False)
+            + "\nRoutage : " + json.dumps(ROUTER.stats, ensure_ascii=False)
+            + "\nContexte mémoire : " + json.dumps(PACK_STATS, ensure_ascii=False))
+
+ROUTER = IntentRouter()
+ROUTER.add_command("souviens-toi de", _cmd_remember)
+ROUTER.add_command("rappelle-moi", _cmd_recall)
+ROUTER.add_command("oublie", _cmd_forget)
+ROUTER.add_command("stats", _cmd_stats, exact=True)
+
 def handle(msg: str) -> str:
-    low = msg.lower().strip()
+    answer = ROUTER.route(msg)
+    if answer is not None:
+        return answer
 
-    # Ajout de souvenirs
-    if low.startswith("souviens-toi de"):
-        fact = extract_after_prefix(msg, "souviens-toi de")
-        if not fact:
-            return "Je n'ai rien à mémoriser (format: « Souviens-toi de : <fait> »)."
-        return remember(fact)
-
-    # Rappel / interrogation de la mémoire
-    if low.startswith("rappelle-moi"):
-        ask = extract_after_prefix(msg, "rappelle-moi")
-        if not ask:
-            return "Dis-moi ce que je dois rappeler (format: « Rappelle-moi : <question> »)."
-        return recall(ask, k=3)
-
-    # Démo : question libre appuyée par la mémoire (optionnel)
+    # Démo : question libre appuyée par la mémoire (optionnel) -> LLM
+    low = msg.lower().strip()
     if low.startswith("qu'aime") or low.startswith("que sait-tu") or "mémoire" in low:
         return answer_with_mem(msg, msg)
 
     return ("Commandes disponibles :\n"
             "- \"Souviens-toi de : <fait>\"\n"
             "- \"Rappelle-moi <question>\"\n"
+            "- \"Oublie : <souvenir>\"\n"
+            "- \"stats\" (cache d'embeddings, taille de la mémoire, routage)\n"
             "- Ou pose une question libre, j'essaierai d'utiliser ma mémoire.")
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire long terme avec Ollama + Chroma.")
+    parser.add_argument("--import", dest="import_path", metavar="FICHIER",
+                        help="importe des faits en masse (texte: un par ligne, ou .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH,
+                        help=f"faits par lot d'embeddings (défaut {INGEST_BATCH})")
+    parser.add_argument("--reindex", action="store_true",
+                        help="reconstruit l'index BM25 (memo_db/memo.bm25.jsonl) depuis le store")
+    parser.add_argument("--maintain", action="store_true",
+                        help="éviction (TTL / MEMO_MAX_FACTS) puis compaction, une fois")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help=f"mesure import + init de chaque composant (budget STARTUP_BUDGET_MS={STARTUP_BUDGET_MS:.0f})")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        sys.exit(0 if profile_startup() else 1)
+
+    if args.reindex:
+        from lexical_index import LexicalIndex
+        index = LexicalIndex(PERSIST_DIR, collection_name="memo")
+        index.clear()
+        print(f"Index BM25 reconstruit : {rebuild_lexical(index)} souvenirs.")
+        return
+
+    if args.maintain:
+        lifecycle = get_lifecycle()
+        lifecycle.maintain()
+        print(f"Maintenance terminée : {len(get_lexical())} souvenirs, {lifecycle.stats['evicted']} évincés.")
+        return
+
+    if args.import_path:
+        stats = ingest_file(args.import_path, batch_size=args.batch_size)
+        print(f"Import terminé : {stats['added']} ajoutés, {stats['duplicates']} doublons et "
+              f"{stats['near_duplicates']} quasi-doublons ignorés "
+              f"sur {stats['read']} lus en {stats['seconds']} s ({stats['facts_per_s']} faits/s).")
+        return
+
+    start_tracing()  # endpoint Prometheus si AGENT_METRICS_PORT
     print("Mémoire long terme avec Ollama (gemma3 + Chroma).")
     print("Exemples:\n - Souviens-toi de : André aime les agents d’IA.\n - Rappelle-moi : Qu’aime André ?\n")
+    global _background_maintenance
+    _background_maintenance = True  # éviction + compaction périodiques (MEMO_MAINTENANCE_S), dès le 1er usage
     try:
         while True:
             msg = input("Vous : ")
             print(handle(msg))
     except (KeyboardInterrupt, EOFError):
         print("\nAu revoir !")
+    finally:
+        if _lifecycle is not None:
+            _lifecycle.stop()
+
+if __name__ == "__main__":
+    main()
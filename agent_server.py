@@ -0,0 +1,371 @@
+# agent_server.py — Service HTTP asyncio autour de l'Agent du Labo 6 (plusieurs sessions en parallèle)
+#   POST /chat     {"session": "alice", "message": "...", "stream": true}
+#                  stream=true  -> text/event-stream : data: {"token": "..."} puis data: {"done": true, "reply": ...}
+#                  stream=false -> JSON {"session", "reply", "routed"}
+#   GET  /health   {"status": "ok", "active": ..., "in_model": ...}
+#   GET  /metrics  texte Prometheus (spans de tracing.py + jauges du serveur)
+#
+# Concurrence :
+#   - les tours d'une même session sont sérialisés (verrou asyncio, ordre d'arrivée) ;
+#   - au plus SERVER_MAX_INFLIGHT appels au modèle en même temps, les autres tours attendent leur tour
+#     (file de SERVER_MAX_QUEUE places, attente max SERVER_QUEUE_TIMEOUT_S) ;
+#   - 429 si la file est pleine ou si la session a déjà SERVER_SESSION_PENDING tours en attente,
+#     503 si l'attente d'un créneau modèle dépasse le délai. Rien n'est enregistré pour ce tour (ni pour un
+#     client parti en cours de route) : route() lit les faits sans toucher à la mémoire, slots et tours ne
+#     sont écrits que par commit(), après la réponse.
+# Les réponses du routeur (slots, commandes) ne prennent pas de créneau modèle.
+# Backpressure : les morceaux passent par une file bornée (SERVER_STREAM_BUFFER) ; quand un client lit
+# lentement, la file se remplit et le thread du tour attend avant de lire le morceau suivant du modèle.
+#
+#   python agent_server.py                    # Ollama sur OLLAMA_HOST
+#   python agent_server.py --fake 200         # modèle factice (200 ms par réponse)
+#   python stub_ollama.py & OLLAMA_HOST=http://localhost:11500 python agent_server.py   # test de charge
+#
+# Variables d'environnement :
+#   AGENT_SERVER_HOST / AGENT_SERVER_PORT   adresse d'écoute (défaut 0.0.0.0:8080)
+#   SERVER_MAX_INFLIGHT      appels simultanés au modèle (défaut 4)
+#   SERVER_MAX_QUEUE         tours en attente au-delà (défaut 32)
+#   SERVER_QUEUE_TIMEOUT_S   attente max d'un créneau modèle (défaut 30 s)
+#   SERVER_SESSION_PENDING   tours en cours + en attente par session (défaut 2)
+#   SERVER_STREAM_BUFFER     morceaux de réponse en attente d'envoi par tour (défaut 64)
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Tuple
+
+from session_store import SessionManager, SessionStore
+from tracing import prometheus_text, span
+
+AGENT_SERVER_HOST = os.getenv("AGENT_SERVER_HOST", "0.0.0.0")
+AGENT_SERVER_PORT = int(os.getenv("AGENT_SERVER_PORT", "8080"))
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+SERVER_MAX_INFLIGHT = int(os.getenv("SERVER_MAX_INFLIGHT", "4"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))
+SERVER_QUEUE_TIMEOUT_S = float(os.getenv("SERVER_QUEUE_TIMEOUT_S", "30"))
+SERVER_SESSION_PENDING = int(os.getenv("SERVER_SESSION_PENDING", "2"))
+SERVER_STREAM_BUFFER = int(os.getenv("SERVER_STREAM_BUFFER", "64"))
+
+MAX_BODY = 1 << 20  # 1 Mo
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class Saturated(RuntimeError):
+    """Pas de créneau modèle libre dans le délai imparti (-> 503)."""
+
+
+class ClientGone(RuntimeError):
+    """Le client a fermé la connexion pendant le streaming."""
+
+
+# --------- Tours (thread de travail) ----------
+class AgentServer:
+    """
+    Chaque tour s'exécute en entier dans un thread du pool : le verrou de session de SessionManager
+    (RLock) doit être relâché par le thread qui l'a pris. Les morceaux de réponse remontent vers la
+    boucle asyncio par une file bornée : le thread attend qu'il y ait de la place (client lent).
+    """
+    def __init__(self, sessions: SessionManager, max_inflight: int = SERVER_MAX_INFLIGHT,
+                 max_queue: int = SERVER_MAX_QUEUE, queue_timeout_s: float = SERVER_QUEUE_TIMEOUT_S,
+                 session_pending: int = SERVER_SESSION_PENDING):
+        self.sessions = sessions
+        self.max_inflight = max_inflight
+        self.capacity = max_inflight + max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.session_pending = session_pending
+        self._model_slots = threading.BoundedSemaphore(max_inflight)
+        self._pool = ThreadPoolExecutor(self.capacity, thread_name_prefix="turn")
+        self._pending: Dict[str, int] = {}               # session -> tours admis (boucle asyncio seulement)
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self.active = 0                                  # tours admis (en cours + en attente)
+        self.in_model = 0                                # appels au modèle en cours
+        self._count_lock = threading.Lock()
+        self.stats = {"accepted": 0, "routed": 0, "completed": 0, "rejected_429": 0,
+                      "rejected_503": 0, "errors": 0, "disconnects": 0}
+
+    def _count(self, key: str, delta: int = 1):
+        with self._count_lock:
+            if key == "in_model":
+                self.in_model += delta
+            else:
+                self.stats[key] += delta
+
+    def _turn(self, session_id: str, text: str, emit: Callable[[str, object], None],
+              gone: threading.Event) -> Tuple[str, bool]:
+        with span("server.turn") as sp:
+            with self.sessions.session(session_id) as agent:
+                reply = agent.route(text)  # sans effet sur la mémoire jusqu'au commit()
+                if reply is not None:
+                    agent.commit(text, reply)
+                    sp.set(routed=1)
+                    return reply, True
+                if not self._model_slots.acquire(timeout=self.queue_timeout_s):
+                    raise Saturated("aucun créneau modèle libre")
+                self._count("in_model")
+                try:
+                    parts = []
+                    for chunk in agent.llm.stream(agent.prepare(text)):
+                        if gone.is_set():
+                            raise ClientGone()
+                        parts.append(chunk.content)
+                        emit("token", chunk.content)
+                finally:
+                    self._count("in_model", -1)
+                    self._model_slots.release()
+                reply = "".join(parts).strip()
+                agent.commit(text, reply)
+                sp.set(routed=0)
+                return reply, False
+
+    # --------- Admission ----------
+    def admit(self, session_id: str) -> Optional[str]:
+        """Motif du refus (429), ou None si le tour est admis."""
+        if self.active >= self.capacity:
+            return "serveur saturé, réessayez plus tard"
+        if self._pending.get(session_id, 0) >= self.session_pending:
+            return "trop de messages en attente pour cette session"
+        self.active += 1
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._session_locks.setdefault(session_id, asyncio.Lock())
+        return None
+
+    def _leave(self, session_id: str):
+        self.active -= 1
+        self._pending[session_id] -= 1
+        if not self._pending[session_id]:
+            del self._pending[session_id]
+            del self._session_locks[session_id]
+
+    async def run_turn(self, session_id: str, text: str, events: asyncio.Queue, gone: threading.Event):
+        """Exécute un tour admis ; pousse ("token"|"done"|"error", ...) dans `events`."""
+        loop = asyncio.get_running_loop()
+
+        def emit(kind: str, data):
+            # appelé depuis le thread du tour : bloque tant que la file est pleine
+            fut = asyncio.run_coroutine_threadsafe(events.put((kind, data)), loop)
+            while True:
+                try:
+                    return fut.result(timeout=0.1)
+                except FutureTimeout:
+                    if gone.is_set():
+                        fut.cancel()
+                        raise ClientGone()
+
+        try:
+            async with self._session_locks[session_id]:  # ordre d'arrivée au sein de la session
+                reply, routed = await loop.run_in_executor(self._pool, self._turn, session_id, text, emit, gone)
+            self._count("routed" if routed else "completed")
+            await events.put(("done", {"reply": reply, "routed": routed}))
+        except Saturated as e:
+            self._count("rejected_503")
+            await events.put(("error", (503, str(e))))
+        except ClientGone:
+            self._count("disconnects")
+        except Exception as e:
+            self._count("errors")
+            await events.put(("error", (500, f"{type(e).__name__}: {e}")))
+        finally:
+            self._leave(session_id)
+
+    def metrics_text(self) -> str:
+        lines = [
+            "# HELP agent_server_active Tours admis (en cours + en attente).",
+            "# TYPE agent_server_active gauge",
+            f"agent_server_active {self.active}",
+            "# HELP agent_server_in_model Appels au modèle en cours.",
+            "# TYPE agent_server_in_model gauge",
+            f"agent_server_in_model {self.in_model}",
+            "# HELP agent_server_sessions_pending Sessions avec au moins un tour admis.",
+            "# TYPE agent_server_sessions_pending gauge",
+            f"agent_server_sessions_pending {len(self._pending)}",
+            "# HELP agent_server_requests_total Tours par issue.",
+            "# TYPE agent_server_requests_total counter",
+        ]
+        lines += [f'agent_server_requests_total{{outcome="{k}"}} {v}' for k, v in sorted(self.stats.items())]
+        return prometheus_text() + "\n".join(lines) + "\n"
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+# --------- HTTP ----------
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        raise ValueError("requête vide")
+    method, path, _ = request_line.split(" ", 2)
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        k, _, v = line.partition(":")
+        headers[k.strip().lower()] = v.strip()
+    length = int(headers.get("content-length", "0"))
+    if length > MAX_BODY:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?")[0], headers, body
+
+
+def _head(status: int, content_type: str, length: Optional[int] = None, extra: str = "") -> bytes:
+    head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\nConnection: close\r\n"
+    if length is not None:
+        head += f"Content-Length: {length}\r\n"
+    return (head + extra + "\r\n").encode("latin-1")
+
+
+async def _send(writer: asyncio.StreamWriter, status: int, obj, content_type: str = "application/json; charset=utf-8",
+                extra: str = ""):
+    body = obj if isinstance(obj, bytes) else json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    writer.write(_head(status, content_type, len(body), extra) + body)
+    await writer.drain()
+
+
+def _sse(obj: Dict) -> bytes:
+    return f"data: {json.dumps(obj, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _discard(events: asyncio.Queue):
+    while True:
+        await events.get()
+
+
+class HttpFrontend:
+    def __init__(self, server: AgentServer):
+        self.server = server
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, path, _, body = await _read_request(reader)
+            except OverflowError:
+                await _send(writer, 413, {"error": "corps trop volumineux"})
+                return
+            except (ValueError, asyncio.IncompleteReadError):
+                await _send(writer, 400, {"error": "requête HTTP invalide"})
+                return
+            if path == "/chat":
+                if method != "POST":
+                    await _send(writer, 405, {"error": "POST attendu"})
+                    return
+                await self.chat(writer, body)
+            elif path == "/health" and method == "GET":
+                s = self.server
+                await _send(writer, 200, {"status": "ok", "active": s.active, "in_model": s.in_model,
+                                          "capacity": s.capacity, "hot_sessions": s.sessions.hot_count()})
+            elif path == "/metrics" and method == "GET":
+                await _send(writer, 200, self.server.metrics_text().encode("utf-8"),
+                            "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                await _send(writer, 404, {"error": f"chemin inconnu : {path}"})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def chat(self, writer: asyncio.StreamWriter, body: bytes):
+        try:
+            req = json.loads(body or b"{}")
+            session_id = str(req["session"])
+            text = str(req["message"]).strip()
+        except (ValueError, KeyError, TypeError):
+            await _send(writer, 400, {"error": 'JSON attendu : {"session": ..., "message": ...}'})
+            return
+        if not text:
+            await _send(writer, 400, {"error": "message vide"})
+            return
+        streaming = bool(req.get("stream", True))
+
+        refused = self.server.admit(session_id)
+        if refused:
+            self.server._count("rejected_429")
+            await _send(writer, 429, {"error": refused}, extra="Retry-After: 1\r\n")
+            return
+        self.server._count("accepted")
+
+        events: asyncio.Queue = asyncio.Queue(maxsize=SERVER_STREAM_BUFFER)
+        gone = threading.Event()
+        task = asyncio.create_task(self.server.run_turn(session_id, text, events, gone))
+        started = False
+        try:
+            while True:
+                kind, data = await events.get()
+                if kind == "error":
+                    status, message = data
+                    if started:  # en-têtes déjà partis : l'erreur voyage dans le flux
+                        writer.write(_sse({"error": message, "status": status}))
+                    else:
+                        extra = "Retry-After: 1\r\n" if status == 503 else ""
+                        await _send(writer, status, {"error": message}, extra=extra)
+                    break
+                if kind == "done":
+                    if not streaming:
+                        await _send(writer, 200, {"session": session_id, **data})
+                        break
+                    if not started:
+                        writer.write(_head(200, "text/event-stream; charset=utf-8", extra="Cache-Control: no-cache\r\n"))
+                    writer.write(_sse({"done": True, **data}))
+                    break
+                if streaming:  # token
+                    if not started:
+                        writer.write(_head(200, "text/event-stream; charset=utf-8", extra="Cache-Control: no-cache\r\n"))
+                        started = True
+                    writer.write(_sse({"token": data}))
+                    await writer.drain()  # client lent : la file se remplit et le tour attend (emit)
+            await writer.drain()
+        except ConnectionError:
+            gone.set()  # le thread de travail s'arrête au prochain morceau, sans enregistrer le tour
+        finally:
+            # plus personne ne lit la file : la vider pour qu'aucun put ne bloque la fin du tour
+            discard = asyncio.create_task(_discard(events))
+            await task
+            discard.cancel()
+
+
+# --------- Démarrage ----------
+def build_sessions(fake_ms: Optional[float] = None, db: Optional[str] = None) -> SessionManager:
+    from lab6module2 import KEEP_ALIVE, MODEL_NAME, Agent
+    from llm_cache import cached
+    if fake_ms is not None:
+        from fake_models import FakeChatModel
+        llm = FakeChatModel(latency_s=fake_ms / 1000)
+    else:
+        from langchain_community.chat_models import ChatOllama
+        llm = cached(ChatOllama(model=MODEL_NAME, base_url=OLLAMA_HOST, keep_alive=KEEP_ALIVE))
+    return SessionManager(lambda: Agent(memory_path=None, llm=llm), store=SessionStore(db) if db else None)
+
+
+async def serve(server: AgentServer, host: str = AGENT_SERVER_HOST, port: int = AGENT_SERVER_PORT):
+    frontend = HttpFrontend(server)
+    srv = await asyncio.start_server(frontend.handle, host, port, backlog=server.capacity * 4)
+    print(f"Agent HTTP sur http://{host}:{port} (modèle : {server.max_inflight} en parallèle, "
+          f"file : {server.capacity - server.max_inflight})", flush=True)
+    async with srv:
+        await srv.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP/SSE de l'agent (Labo 6, sessions multiples).")
+    parser.add_argument("--host", default=AGENT_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=AGENT_SERVER_PORT)
+    parser.add_argument("--fake", type=float, metavar="MS", default=None,
+                        help="modèle factice avec cette latence (ms) au lieu d'Ollama")
+    parser.add_argument("--db", default=None, help="fichier SQLite des sessions (défaut SESSIONS_DB)")
+    args = parser.parse_args()
+    server = AgentServer(build_sessions(args.fake, args.db))
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# bench_memory.py — Benchmark hors-ligne du coût par tour des agents à mémoire
+# Fait tourner SummaryMemory (lab4), HybridAgent (lab5), Agent (lab6) et MemoryTry
+# contre des modèles factices (fake_models.py) : ce qui est mesuré est le coût propre du code
+# (assemblage du prompt, résumés, persistance, recherche), pas le temps du modèle.
+#
+# Exemples :
+#   python bench_memory.py --turns 300 --out bench_v1.json
+#   python bench_memory.py --cases lab6 --latency-ms 50 --output-tokens 80
+# Le JSON produit (clés triées) se compare directement entre deux versions (diff, jq).
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from fake_models import FakeChatModel, FakeEmbeddings
+
+NAMES = ["André", "Marc", "Louis", "Zoé", "Inès"]
+WORDS = ("agent mémoire résumé contexte modèle projet ydays objectif tokens cohérence "
+         "recherche vecteur session utilisateur réponse latence prompt donnée").split()
+
+
+def synthetic_dialogue(n: int, seed: int = 0, min_words: int = 3, max_words: int = 60) -> List[str]:
+    """Dialogue déterministe : phrases de longueur variable, présentations et questions de rappel."""
+    rng = random.Random(seed)
+    turns = []
+    for i in range(n):
+        if i % 7 == 0:
+            turns.append(f"Je m'appelle {NAMES[(i // 7) % len(NAMES)]}.")
+        elif i % 11 == 0:
+            turns.append("Quel est mon nom ?")
+        else:
+            k = rng.randint(min_words, max_words)
+            turns.append(" ".join(rng.choice(WORDS) for _ in range(k)).capitalize() + ".")
+    return turns
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def _dist(values: List[float]) -> Dict:
+    return {
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+        "p50": round(_pct(values, 0.50), 4),
+        "p95": round(_pct(values, 0.95), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+def run_turns(fake: FakeChatModel, turns: List[str], turn_fn: Callable[[str], None],
+              finish: Callable[[], None] = lambda: None, per_turn: bool = False) -> Dict:
+    me = threading.get_ident()
+    overhead_ms, wall_ms, prompt_tokens, eval_tokens, rows = [], [], [], [], []
+    for i, text in enumerate(turns):
+        since = len(fake.log)
+        t0 = time.perf_counter()
+        turn_fn(text)
+        wall = time.perf_counter() - t0
+        model = fake.model_seconds(me, since)
+        chat = [e for e in fake.log[since:] if e["thread"] == me and e["kind"] == "chat"]
+        tokens = chat[-1]["prompt_tokens"] if chat else 0
+        evaluated = chat[-1]["prompt_eval_tokens"] if chat else 0
+        overhead_ms.append((wall - model) * 1000)
+        wall_ms.append(wall * 1000)
+        prompt_tokens.append(tokens)
+        eval_tokens.append(evaluated)
+        if per_turn:
+            rows.append({"turn": i, "overhead_ms": round(overhead_ms[-1], 4), "prompt_tokens": tokens,
+                         "prompt_eval_tokens": evaluated})
+    t0 = time.perf_counter()
+    finish()
+    result = {
+        "turns": len(turns),
+        "overhead_ms": _dist(overhead_ms),
+        "wall_ms": _dist(wall_ms),
+        "prompt_tokens": {"first": prompt_tokens[0] if prompt_tokens else 0,
+                          "last": prompt_tokens[-1] if prompt_tokens else 0,
+                          "mean": round(sum(prompt_tokens) / max(1, len(prompt_tokens)), 1),
+                          "max": max(prompt_tokens or [0])},
+        # tokens réellement réévalués avec le cache de préfixe (le reste est réutilisé)
+        "prompt_eval_tokens": {"mean": round(sum(eval_tokens) / max(1, len(eval_tokens)), 1),
+                               "max": max(eval_tokens or [0])},
+        "llm_calls": fake.calls,
+        "summary_calls": fake.summary_calls,
+        # entrée de chaque appel de résumé (bornée avec la mémoire hiérarchique)
+        "summary_prompt_tokens": _dist([e["prompt_tokens"] for e in fake.log if e["kind"] == "summary"]),
+        "finish_ms": round((time.perf_counter() - t0) * 1000, 4),
+    }
+    if per_turn:
+        result["per_turn"] = rows
+    return result
+
+
+# --------- Cas de benchmark ----------
+def bench_lab4(turns, fake, workdir, per_turn):
+    import lab4
+    mem = lab4.SummaryMemory(llm=fake, max_buffer_turns=3)
+
+    def turn(text):  # même enchaînement que lab4.main().ask
+        mem.add_user(text)
+        answer = fake.invoke(mem.context_messages()).content.strip()
+        mem.add_ai(answer)
+        mem.maybe_summarize()
+
+    return run_turns(fake, turns, turn, per_turn=per_turn)
+
+
+def bench_lab5(turns, fake, workdir, per_turn):
+    import lab5Module2
+    agent = lab5Module2.HybridAgent(llm=fake)
+    return run_turns(fake, turns, agent.respond, finish=agent.summary_mem.flush, per_turn=per_turn)
+
+
+def bench_lab6(turns, fake, workdir, per_turn):
+    import lab6module2
+    agent = lab6module2.Agent(memory_path=os.path.join(workdir, "memory.json"), llm=fake)
+    # finish = sauvegarde complète (snapshot + compaction du journal)
+    return run_turns(fake, turns, agent.respond, finish=agent.save, per_turn=per_turn)
+
+
+def bench_lab6_hier(turns, fake, workdir, per_turn):
+    import lab6module2
+    agent = lab6module2.Agent(memory_path=os.path.join(workdir, "memory.json"), llm=fake, memory="hier")
+    return run_turns(fake, turns, agent.respond, finish=agent.save, per_turn=per_turn)
+
+
+def bench_memory(turns, fake, workdir, per_turn, embed_latency_s=0.0):
+    import MemoryTry
+    from embedding_cache import CachedEmbeddings
+    emb = FakeEmbeddings(latency_s=embed_latency_s)
+    MemoryTry.PERSIST_DIR = workdir
+    MemoryTry.MEMO_BACKEND = "numpy"
+    MemoryTry._embeddings = CachedEmbeddings(emb, model_name="fake-embed", path=None)
+    MemoryTry._store = None
+    MemoryTry._lexical = None
+    MemoryTry._lifecycle = None
+    MemoryTry._chat = fake
+
+    step = [0]
+
+    def turn(text):  # alterne mémorisation / rappel / réponse avec mémoire
+        i = step[0]
+        step[0] += 1
+        if i % 3 == 0:
+            MemoryTry.handle(f"Souviens-toi de : {text}")
+        elif i % 3 == 1:
+            MemoryTry.handle(f"Rappelle-moi : {text}")
+        else:
+            MemoryTry.answer_with_mem(text, text)
+
+    result = run_turns(fake, turns, turn, per_turn=per_turn)
+    result["embed_calls"] = emb.calls
+    result["embed_texts"] = emb.texts
+    return result
+
+
+CASES = {"lab4": bench_lab4, "lab5": bench_lab5, "lab6": bench_lab6, "lab6_hier": bench_lab6_hier,
+         "memory": bench_memory}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors-ligne des agents à mémoire (modèles factices).")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"liste parmi {','.join(CASES)}")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latence simulée par appel LLM")
+    parser.add_argument("--output-tokens", type=int, default=40, help="longueur des réponses simulées")
+    parser.add_argument("--per-turn", action="store_true", help="inclut le détail de chaque tour")
+    parser.add_argument("--out", help="fichier JSON de sortie (sinon stdout)")
+    args = parser.parse_args()
+
+    turns = synthetic_dialogue(args.turns, seed=args.seed)
+    report = {"meta": {"turns": args.turns, "seed": args.seed, "latency_ms": args.latency_ms,
+                       "output_tokens": args.output_tokens, "python": platform.python_version()},
+              "cases": {}}
+    for name in args.cases.split(","):
+        workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+        try:
+            fake = FakeChatModel(latency_s=args.latency_ms / 1000, output_tokens=args.output_tokens)
+            report["cases"][name] = CASES[name](turns, fake, workdir, args.per_turn)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# context_packing.py — Choix des souvenirs collés dans le prompt de MemoryTry.answer_with_mem
+# Au lieu des 3 premiers résultats tels quels : on sur-échantillonne la recherche hybride, puis
+#   1) score = cosinus(question, souvenir), calculé avec les embeddings en cache (pas d'appel au modèle
+#      dans le cas courant : les souvenirs sont embeddés à l'ajout, la question par la recherche) ;
+#      si la recherche a pris le chemin rapide lexical (ranked=True), la question n'a pas d'embedding :
+#      le score vient du rang BM25, sans seuil (tous les mots de la question sont dans le premier souvenir) ;
+#   2) seuil : les souvenirs sous MEMO_PACK_MIN_SCORE sont écartés, sauf le premier résultat de la
+#      recherche (un cosinus absolu faible ne veut pas dire hors sujet : « Qu'aime André ? ») ;
+#   3) MMR : à chaque pas on prend le souvenir qui maximise
+#         λ * pertinence - (1 - λ) * similarité max avec les souvenirs déjà retenus,
+#      et on écarte ceux qui répètent un souvenir retenu (similarité >= MEMO_PACK_REDUNDANCY) ;
+#   4) budget : on remplit jusqu'à MEMO_PACK_BUDGET tokens estimés (un souvenir trop long est sauté,
+#      un plus court peut encore entrer).
+# Les statistiques (span `memory.pack`) donnent les tokens collés et ceux économisés par rapport à
+# l'ancien top-3 (négatif si le budget laisse entrer plus de faits distincts).
+#
+# Variables d'environnement :
+#   MEMO_PACK               on/off (off = ancien comportement, top-3 sans filtre)
+#   MEMO_PACK_CANDIDATES    candidats demandés à la recherche (défaut 12)
+#   MEMO_PACK_BUDGET        tokens max du CONTEXTE_MEMOIRE (défaut 300)
+#   MEMO_PACK_MIN_SCORE     cosinus minimal avec la question (défaut 0.3)
+#   MEMO_PACK_LAMBDA        poids pertinence / diversité du MMR (défaut 0.7)
+#   MEMO_PACK_REDUNDANCY    cosinus à partir duquel un souvenir répète un souvenir retenu (défaut 0.9)
+
+import math
+import os
+from typing import Dict, List, Tuple
+
+from token_budget import estimate_tokens
+from tracing import span
+
+MEMO_PACK = os.getenv("MEMO_PACK", "on").lower() not in ("0", "off", "false", "no")
+MEMO_PACK_CANDIDATES = int(os.getenv("MEMO_PACK_CANDIDATES", "12"))
+MEMO_PACK_BUDGET = int(os.getenv("MEMO_PACK_BUDGET", "300"))
+MEMO_PACK_MIN_SCORE = float(os.getenv("MEMO_PACK_MIN_SCORE", "0.3"))
+MEMO_PACK_LAMBDA = float(os.getenv("MEMO_PACK_LAMBDA", "0.7"))
+MEMO_PACK_REDUNDANCY = float(os.getenv("MEMO_PACK_REDUNDANCY", "0.9"))
+BASELINE_K = 3  # ancien answer_with_mem : top-3 collé tel quel
+
+
+def _unit(v: List[float]) -> List[float]:
+    n = math.sqrt(sum(x * x for x in v))
+    return [x / n for x in v] if n else list(v)
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def pack_context(query: str, docs: List, embeddings, budget: int = MEMO_PACK_BUDGET,
+                 min_score: float = MEMO_PACK_MIN_SCORE, lam: float = MEMO_PACK_LAMBDA,
+                 redundancy: float = MEMO_PACK_REDUNDANCY, ranked: bool = False) -> Tuple[List, Dict]:
+    """
+    docs : candidats dans l'ordre de la recherche. ranked=True : ordre du chemin rapide lexical, réutilisé
+    tel quel (pas d'embedding de la question). Renvoie (souvenirs retenus, du plus utile au moins
+    utile ; statistiques).
+    """
+    stats = {"candidates": len(docs), "kept": 0, "below_threshold": 0, "redundant": 0,
+             "over_budget": 0, "tokens": 0, "baseline_tokens": 0, "saved_tokens": 0}
+    if not docs:
+        return [], stats
+    with span("memory.pack", candidates=len(docs), budget=budget) as sp:
+        texts = [d.page_content for d in docs]
+        cost = [estimate_tokens(t) + 1 for t in texts]  # + saut de ligne
+        vecs = [_unit(v) for v in embeddings.embed_documents(texts)]
+        if ranked:
+            relevance = [1.0 - i / len(docs) for i in range(len(docs))]
+            min_score = float("-inf")
+        else:
+            qvec = _unit(embeddings.embed_query(query))
+            relevance = [_dot(qvec, v) for v in vecs]
+
+        pool = [i for i in range(len(docs)) if i == 0 or relevance[i] >= min_score]
+        stats["below_threshold"] = len(docs) - len(pool)
+        closest = {i: 0.0 for i in pool}  # similarité max avec un souvenir déjà retenu
+        chosen: List[int] = []
+        used = 0
+        while pool:
+            best = max(pool, key=lambda i: lam * relevance[i] - (1 - lam) * closest[i])
+            pool.remove(best)
+            if closest[best] >= redundancy:
+                stats["redundant"] += 1
+                continue
+            if used + cost[best] > budget:
+                stats["over_budget"] += 1
+                continue
+            chosen.append(best)
+            used += cost[best]
+            for i in pool:
+                closest[i] = max(closest[i], _dot(vecs[i], vecs[best]))
+
+        stats["kept"] = len(chosen)
+        stats["tokens"] = used
+        stats["baseline_tokens"] = sum(cost[:BASELINE_K])
+        stats["saved_tokens"] = stats["baseline_tokens"] - used
+        sp.set(lexical_only=int(ranked), **{k: v for k, v in stats.items() if k not in ("candidates",)})
+    return [docs[i] for i in chosen], stats
@@ -0,0 +1,148 @@
+# embedding_batcher.py — Regroupement (micro-batching) des appels d'embedding concurrents
+# Sous charge, chaque remember / recall de MemoryTry demande ses propres vecteurs : autant
+# d'allers-retours vers Ollama, chacun payant le même surcoût fixe. CoalescingEmbeddings met
+# ces demandes en file ; un thread d'envoi les regroupe (fenêtre courte ou taille max atteinte),
+# fait UN appel au modèle et redistribue les vecteurs aux appelants.
+# Pendant qu'un lot est en cours, les demandes suivantes s'accumulent : plus il y a d'appelants,
+# plus les lots sont gros (le débit suit la concurrence au lieu du surcoût par requête).
+#
+# Placé derrière le cache (CachedEmbeddings -> CoalescingEmbeddings -> OllamaEmbeddings) :
+# seuls les textes absents du cache sont regroupés.
+#
+# Variables d'environnement :
+#   EMBED_BATCH_WINDOW_MS   attente max pour compléter un lot (défaut 5 ms)
+#   EMBED_BATCH_MAX         textes max par lot (défaut 64 ; une demande plus grosse part seule)
+#   EMBED_COALESCE          on | off | auto (défaut) : auto = regroupement seulement avec MEMO_EMBED_API=embed ;
+#                           avec /api/embeddings un lot reste un texte par requête, envoyées l'une après
+#                           l'autre, ce qui est plus lent que des appels directs concurrents
+#   MEMO_EMBED_API          transport pour OllamaEmbeddings :
+#                             "embeddings" (défaut) : /api/embeddings, un texte par requête HTTP,
+#                                                     vecteurs identiques à ceux déjà stockés
+#                             "embed"               : /api/embed, tout le lot en une requête HTTP ;
+#                                                     vecteurs normalisés par Ollama (sans effet sur
+#                                                     le store NumPy, cosinus) -> ré-indexer une
+#                                                     collection Chroma existante
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from tracing import span
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))
+MEMO_EMBED_API = os.getenv("MEMO_EMBED_API", "embeddings")
+_COALESCE = os.getenv("EMBED_COALESCE", "auto").lower()
+EMBED_COALESCE = _COALESCE not in ("0", "off", "false", "no") and (_COALESCE != "auto" or MEMO_EMBED_API == "embed")
+
+Request = Tuple[str, List[str], Future]  # (type "query"/"doc", textes, résultat)
+
+
+class CoalescingEmbeddings(Embeddings):
+    def __init__(self, base: Embeddings, window_ms: float = EMBED_BATCH_WINDOW_MS,
+                 max_batch: int = EMBED_BATCH_MAX, api: str = MEMO_EMBED_API):
+        self.base = base
+        self.window_s = window_ms / 1000
+        self.max_batch = max_batch
+        self.api = api
+        self._queue: "queue.Queue[Request]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._http = None
+        self.queued = 0  # textes en attente d'un lot (jauge)
+        self.counters = {"requests": 0, "texts": 0, "batches": 0, "max_batch": 0, "max_queue_depth": 0}
+
+    # --- interface Embeddings ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._submit("doc", list(texts)) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit("query", [text])[0]
+
+    def _submit(self, kind: str, texts: List[str]) -> List[List[float]]:
+        fut: Future = Future()
+        with self._lock:
+            self.queued += len(texts)
+            self.counters["requests"] += 1
+            self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], self.queued)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+                self._thread.start()
+        self._queue.put((kind, texts, fut))
+        return fut.result()
+
+    # --- thread d'envoi ---
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][1])
+            deadline = time.monotonic() + self.window_s
+            while size < self.max_batch:
+                try:
+                    # ce qui attend déjà part tout de suite ; sinon on attend la fin de la fenêtre
+                    req = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(req)
+                size += len(req[1])
+            self._run(batch, size)
+
+    def _run(self, batch: List[Request], size: int):
+        with self._lock:
+            depth = self.queued
+            self.queued -= size
+        try:
+            with span("embed.batch", texts=size, requests=len(batch), queue_depth=depth):
+                vectors = self._embed_batch([(kind, t) for kind, texts, _ in batch for t in texts])
+        except Exception as e:
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        with self._lock:
+            self.counters["batches"] += 1
+            self.counters["texts"] += size
+            self.counters["max_batch"] = max(self.counters["max_batch"], size)
+        i = 0
+        for _, texts, fut in batch:
+            fut.set_result(vectors[i:i + len(texts)])
+            i += len(texts)
+
+    # --- appel au modèle ---
+    def _embed_batch(self, items: List[Tuple[str, str]]) -> List[List[float]]:
+        base = self.base
+        if hasattr(base, "query_instruction") and hasattr(base, "_embed"):
+            # OllamaEmbeddings : requêtes et documents ne diffèrent que par le préfixe -> un seul appel
+            prompts = [(base.query_instruction if kind == "query" else base.embed_instruction) + t
+                       for kind, t in items]
+            return self._ollama_embed(prompts) if self.api == "embed" else base._embed(prompts)
+        # autre Embeddings : un appel par type, dans l'ordre d'origine
+        out: List[Optional[List[float]]] = [None] * len(items)
+        docs = [i for i, (kind, _) in enumerate(items) if kind == "doc"]
+        if docs:
+            for i, v in zip(docs, base.embed_documents([items[i][1] for i in docs])):
+                out[i] = v
+        for i, (kind, t) in enumerate(items):
+            if kind == "query":
+                out[i] = base.embed_query(t)
+        return out
+
+    def _ollama_embed(self, prompts: List[str]) -> List[List[float]]:
+        import requests
+        if self._http is None:
+            self._http = requests.Session()  # une connexion keep-alive pour tous les lots
+        r = self._http.post(f"{self.base.base_url}/api/embed",
+                            json={"model": self.base.model, "input": prompts}, timeout=120)
+        if r.status_code != 200:
+            raise ValueError(f"Ollama /api/embed a répondu {r.status_code} : {r.text}")
+        return r.json()["embeddings"]
+
+    def stats(self) -> Dict:
+        c = dict(self.counters)
+        c["queue_depth"] = self.queued
+        c["mean_batch"] = round(c["texts"] / c["batches"], 2) if c["batches"] else 0.0
+        return c
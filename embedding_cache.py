@@ -0,0 +1,136 @@
+# embedding_cache.py — Cache d'embeddings à deux niveaux (LRU mémoire + SQLite disque)
+# Enveloppe n'importe quel objet Embeddings de LangChain (ex: OllamaEmbeddings) :
+#   clé = (modèle d'embedding[@variante], type "query"/"doc", sha256 du texte)
+# Le type fait partie de la clé car OllamaEmbeddings préfixe différemment
+# les requêtes ("query: ") et les documents ("passage: ").
+# La variante distingue les transports qui ne renvoient pas les mêmes vecteurs pour un même modèle
+# (ex: "embed" = /api/embed, vecteurs normalisés) : ils ne partagent jamais une entrée du cache.
+#
+# Variables d'environnement :
+#   EMBED_CACHE_PATH   fichier SQLite (défaut ./memo_db/embed_cache.sqlite)
+#   EMBED_CACHE_MEM    nombre de vecteurs gardés en RAM (défaut 4096)
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(".", "memo_db", "embed_cache.sqlite"))
+EMBED_CACHE_MEM = int(os.getenv("EMBED_CACHE_MEM", "4096"))
+
+Key = Tuple[str, str]  # (type, sha256)
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, base: Embeddings, model_name: str, path: Optional[str] = EMBED_CACHE_PATH,
+                 max_memory: int = EMBED_CACHE_MEM, variant: str = ""):
+        self.base = base
+        self.model_name = model_name  # modèle enregistré dans la collection (check_embedding_model)
+        self.cache_model = f"{model_name}@{variant}" if variant else model_name  # colonne `model` du disque
+        self.path = path  # None -> cache mémoire uniquement
+        self.max_memory = max_memory
+        self._mem: "OrderedDict[Key, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.counters = {"mem_hits": 0, "disk_hits": 0, "misses": 0, "base_calls": 0}
+
+    # --- niveau disque ---
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors ("
+                " model TEXT, kind TEXT, hash TEXT, vec BLOB,"
+                " PRIMARY KEY (model, kind, hash))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _disk_get(self, keys: List[Key]) -> Dict[Key, List[float]]:
+        db = self._db()
+        found: Dict[Key, List[float]] = {}
+        if db is None or not keys:
+            return found
+        for kind, h in keys:
+            row = db.execute(
+                "SELECT vec FROM vectors WHERE model = ? AND kind = ? AND hash = ?",
+                (self.cache_model, kind, h),
+            ).fetchone()
+            if row is not None:
+                found[(kind, h)] = array("d", row[0]).tolist()
+        return found
+
+    def _disk_put(self, items: Dict[Key, List[float]]):
+        db = self._db()
+        if db is None or not items:
+            return
+        db.executemany(
+            "INSERT OR REPLACE INTO vectors (model, kind, hash, vec) VALUES (?, ?, ?, ?)",
+            [(self.cache_model, kind, h, array("d", v).tobytes()) for (kind, h), v in items.items()],
+        )
+        db.commit()
+
+    # --- niveau mémoire ---
+    def _mem_put(self, key: Key, vec: List[float]):
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory:
+            self._mem.popitem(last=False)
+
+    def _lookup(self, kind: str, texts: List[str], compute) -> List[List[float]]:
+        keys = [(kind, _text_hash(t)) for t in texts]
+        result: Dict[Key, List[float]] = {}
+        with self._lock:
+            for k in keys:
+                if k in self._mem:
+                    self._mem.move_to_end(k)
+                    result[k] = self._mem[k]
+                    self.counters["mem_hits"] += 1
+            on_disk = self._disk_get([k for k in dict.fromkeys(keys) if k not in result])
+            for k, v in on_disk.items():
+                self._mem_put(k, v)
+                result[k] = v
+            self.counters["disk_hits"] += len(on_disk)
+
+        # textes manquants : un seul appel groupé au modèle (hors verrou)
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in result:
+                missing.setdefault(k, t)
+        if missing:
+            vectors = compute(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self.counters["misses"] += len(fresh)
+                self.counters["base_calls"] += 1
+                for k, v in fresh.items():
+                    self._mem_put(k, v)
+                self._disk_put(fresh)
+            result.update(fresh)
+        return [result[k] for k in keys]
+
+    # --- interface Embeddings ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._lookup("doc", texts, self.base.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._lookup("query", [text], lambda ts: [self.base.embed_query(ts[0])])[0]
+
+    def stats(self) -> Dict:
+        c = dict(self.counters)
+        lookups = c["mem_hits"] + c["disk_hits"] + c["misses"]
+        c["hit_rate"] = round((c["mem_hits"] + c["disk_hits"]) / lookups, 3) if lookups else 0.0
+        c["mem_size"] = len(self._mem)
+        return c
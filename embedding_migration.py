@@ -0,0 +1,286 @@
+# embedding_migration.py — Modèle d'embedding de la collection `memo` et migration vers un autre modèle
+# Chaque collection enregistre le modèle et la dimension de ses vecteurs (métadonnées Chroma,
+# <collection>.info.json pour le store NumPy). MemoryTry refuse d'écrire avec un autre modèle
+# (EmbeddingModelMismatch) au lieu de mélanger des vecteurs incompatibles.
+#
+# Collection active : memo_db/memo.active.json  {"collection", "embedding_model", "dim"}
+# (absent = collection `memo`). Migration :
+#   1) ré-embedding de toute la collection active, par lots en parallèle, dans une collection
+#      fantôme memo__<modèle> (mêmes ids, textes et métadonnées) ;
+#   2) point de reprise memo_db/<fantôme>.migration.json après chaque lot terminé dans l'ordre :
+#      relancer la même commande reprend où elle s'était arrêtée ;
+#   3) rattrapage sur la source relue depuis le disque : souvenirs ajoutés pendant la migration copiés,
+#      souvenirs oubliés ou évincés entre-temps retirés de la cible ; puis bascule atomique du pointeur
+#      (os.replace). L'ancienne collection reste sur disque (retour arrière : --switch <nom>).
+# Les process déjà lancés gardent l'ancienne collection jusqu'à leur redémarrage.
+#
+#   python embedding_migration.py --model mxbai-embed-large --workers 4 --batch-size 64
+#   python embedding_migration.py --status
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+MIGRATION_WORKERS = int(os.getenv("MIGRATION_WORKERS", "4"))
+MIGRATION_BATCH = int(os.getenv("MIGRATION_BATCH", "64"))
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    """La collection a été construite avec un autre modèle d'embedding (ou une autre dimension)."""
+
+
+# --------- Pointeur de collection active ----------
+def pointer_path(persist_dir: str, base: str = "memo") -> str:
+    return os.path.join(persist_dir, f"{base}.active.json")
+
+
+def read_pointer(persist_dir: str, base: str = "memo") -> Dict:
+    path = pointer_path(persist_dir, base)
+    if not os.path.exists(path):
+        return {"collection": base}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_pointer(persist_dir: str, pointer: Dict, base: str = "memo"):
+    """Bascule atomique : les lecteurs voient l'ancien ou le nouveau pointeur, jamais un fichier partiel."""
+    path = pointer_path(persist_dir, base)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**pointer, "switched_at": time.time()}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def shadow_name(base: str, model: str) -> str:
+    """Nom de collection valide pour Chroma (lettres, chiffres, _ ; 3 à 63 caractères)."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", model).strip("_")
+    return f"{base}__{slug}"[:63]
+
+
+# --------- Métadonnées de collection (Chroma / NumPy) ----------
+def collection_info(store) -> Dict:
+    if hasattr(store, "set_info"):
+        return dict(store.info)
+    return dict(store._collection.metadata or {})
+
+
+def set_collection_info(store, **info):
+    merged = {**collection_info(store), **{k: v for k, v in info.items() if v is not None}}
+    if hasattr(store, "set_info"):
+        store.set_info(merged)
+    else:
+        # les paramètres hnsw:* sont fixés à la création ; Chroma refuse de les « modifier »
+        store._collection.modify(metadata={k: v for k, v in merged.items() if not k.startswith("hnsw:")})
+
+
+def stored_dim(store) -> Optional[int]:
+    page = store.get(include=["embeddings"], limit=1)
+    vectors = page.get("embeddings")
+    return len(vectors[0]) if vectors is not None and len(vectors) else None
+
+
+def check_embedding_model(store, model: str) -> Dict:
+    """
+    Vérifie que la collection a été construite avec `model` ; une collection sans métadonnées
+    (d'avant ce contrôle) est supposée construite avec lui et l'enregistre. Renvoie les métadonnées.
+    """
+    info = collection_info(store)
+    recorded = info.get("embedding_model")
+    if recorded is None:
+        set_collection_info(store, embedding_model=model, dim=stored_dim(store))
+        return collection_info(store)
+    if recorded != model:
+        raise EmbeddingModelMismatch(
+            f"la mémoire a été construite avec « {recorded} » mais OLLAMA_EMBED vaut « {model} » : "
+            f"retirer OLLAMA_EMBED, ou migrer avec `python embedding_migration.py --model {model}`"
+        )
+    if info.get("dim") is None:
+        dim = stored_dim(store)
+        if dim is not None:
+            set_collection_info(store, dim=dim)
+            info["dim"] = dim
+    return info
+
+
+# --------- Migration ----------
+class Migration:
+    """
+    open_store(nom, embeddings) -> store (voir MemoryTry.open_store) ; embeddings : le NOUVEAU modèle.
+    """
+    def __init__(self, persist_dir: str, model: str, embeddings, open_store, base: str = "memo",
+                 workers: int = MIGRATION_WORKERS, batch_size: int = MIGRATION_BATCH):
+        self.persist_dir = persist_dir
+        self.model = model
+        self.embeddings = embeddings
+        self.open_store = open_store
+        self.base = base
+        self.workers = workers
+        self.batch_size = batch_size
+        self.pointer = read_pointer(persist_dir, base)
+        self.source_name = self.pointer["collection"]
+        self.target_name = shadow_name(base, model)
+        if self.target_name == self.source_name:
+            raise ValueError(f"la collection active utilise déjà « {model} »")
+        self.checkpoint_path = os.path.join(persist_dir, f"{self.target_name}.migration.json")
+
+    # --- point de reprise ---
+    def load_checkpoint(self) -> Dict:
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                cp = json.load(f)
+            if cp.get("source") == self.source_name:
+                return cp
+        return {"source": self.source_name, "target": self.target_name, "model": self.model,
+                "offset": 0, "copied": 0, "dim": None}
+
+    def save_checkpoint(self, cp: Dict):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cp, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # --- copie ---
+    def _pages(self, source, offset: int) -> Iterator[Dict]:
+        while True:
+            page = source.get(include=["documents", "metadatas"], limit=self.batch_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+
+    def _copy(self, target, pages: Iterator[Dict], cp: Optional[Dict] = None,
+              progress=None) -> int:
+        """Embeddings calculés en parallèle, écritures dans l'ordre des pages (point de reprise contigu)."""
+        copied = 0
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="reembed") as pool:
+            window: List = []
+            for page in pages:
+                window.append((page, pool.submit(self.embeddings.embed_documents, page["documents"])))
+                if len(window) >= 2 * self.workers:
+                    copied += self._write(target, *window.pop(0), cp, progress)
+            for page, fut in window:
+                copied += self._write(target, page, fut, cp, progress)
+        return copied
+
+    def _write(self, target, page: Dict, fut, cp: Optional[Dict], progress) -> int:
+        vectors = fut.result()
+        metadatas = [m or {} for m in page["metadatas"]]
+        if hasattr(target, "add_vectors"):
+            target.add_vectors(vectors, page["documents"], metadatas, page["ids"])
+        else:
+            target._collection.upsert(ids=page["ids"], embeddings=vectors, documents=page["documents"],
+                                      metadatas=[m or None for m in metadatas])
+        n = len(page["ids"])
+        if cp is not None:
+            cp["offset"] += n
+            cp["copied"] += n
+            cp["dim"] = cp["dim"] or (len(vectors[0]) if vectors else None)
+            self.save_checkpoint(cp)
+        if progress:
+            progress(n)
+        return n
+
+    def _missing(self, source, target) -> Iterator[Dict]:
+        """Souvenirs de la source absents de la cible (ajoutés pendant la migration)."""
+        offset = 0
+        while True:
+            page = source.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+            if not page["ids"]:
+                return
+            offset += len(page["ids"])
+            present = set(target.get(ids=page["ids"])["ids"])
+            rows = [i for i, doc_id in enumerate(page["ids"]) if doc_id not in present]
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                yield {key: [page[key][i] for i in chunk] for key in ("ids", "documents", "metadatas")}
+
+    def _ids(self, store) -> List[str]:
+        ids: List[str] = []
+        while True:
+            page = store.get(include=[], limit=1000, offset=len(ids))
+            if not page["ids"]:
+                return ids
+            ids.extend(page["ids"])
+
+    def _sync_deletes(self, source, target) -> int:
+        """Retire de la cible les souvenirs supprimés de la source pendant la migration."""
+        gone = sorted(set(self._ids(target)) - set(self._ids(source)))
+        for start in range(0, len(gone), 1000):
+            target.delete(ids=gone[start:start + 1000])
+        return len(gone)
+
+    def run(self, progress=None) -> Dict:
+        source = self.open_store(self.source_name, None)
+        target = self.open_store(self.target_name, self.embeddings)
+        cp = self.load_checkpoint()
+        resumed_from = cp["offset"]
+        t0 = time.perf_counter()
+        self._copy(target, self._pages(source, cp["offset"]), cp, progress)
+        # source rouverte : le store NumPy ne relit pas le disque après l'ouverture, et les autres
+        # process ont pu ajouter, oublier ou évincer des souvenirs pendant la copie
+        source = self.open_store(self.source_name, None)
+        caught_up = self._copy(target, self._missing(source, target), None, progress)
+        removed = self._sync_deletes(source, target)
+        dim = cp["dim"] or stored_dim(target)
+        set_collection_info(target, embedding_model=self.model, dim=dim)
+        write_pointer(self.persist_dir, {"collection": self.target_name, "embedding_model": self.model,
+                                         "dim": dim, "previous": self.source_name}, self.base)
+        os.remove(self.checkpoint_path)
+        return {"source": self.source_name, "target": self.target_name, "model": self.model, "dim": dim,
+                "copied": cp["copied"] + caught_up, "removed": removed, "resumed_from": resumed_from,
+                "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def main():
+    import MemoryTry
+
+    parser = argparse.ArgumentParser(description="Ré-embedding de la mémoire long terme vers un autre modèle.")
+    parser.add_argument("--model", help="nouveau modèle d'embedding Ollama (ex: mxbai-embed-large)")
+    parser.add_argument("--workers", type=int, default=MIGRATION_WORKERS, help="lots embeddés en parallèle")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH, help="souvenirs par lot")
+    parser.add_argument("--status", action="store_true", help="collection active et migrations en cours")
+    parser.add_argument("--switch", metavar="COLLECTION", help="rebascule sur une collection existante")
+    args = parser.parse_args()
+    persist_dir = MemoryTry.PERSIST_DIR
+
+    if args.status:
+        print(json.dumps(read_pointer(persist_dir), ensure_ascii=False, indent=2))
+        for name in sorted(os.listdir(persist_dir) if os.path.isdir(persist_dir) else []):
+            if name.endswith(".migration.json"):
+                with open(os.path.join(persist_dir, name), "r", encoding="utf-8") as f:
+                    print(f"migration interrompue : {json.load(f)}")
+        return
+
+    if args.switch:
+        info = collection_info(MemoryTry.open_store(args.switch, None))
+        if not info.get("embedding_model"):
+            raise SystemExit(f"la collection « {args.switch} » n'enregistre pas son modèle d'embedding")
+        write_pointer(persist_dir, {"collection": args.switch, "embedding_model": info["embedding_model"],
+                                    "dim": info.get("dim"), "previous": read_pointer(persist_dir)["collection"]})
+        print(f"Collection active : {args.switch} ({info['embedding_model']}).")
+        return
+
+    if not args.model:
+        parser.error("--model, --status ou --switch attendu")
+    migration = Migration(persist_dir, args.model, MemoryTry.build_embeddings(args.model),
+                          MemoryTry.open_store, workers=args.workers, batch_size=args.batch_size)
+    done = [0]
+
+    def progress(n: int):
+        done[0] += n
+        print(f"\r{done[0]} souvenirs ré-embeddés", end="", flush=True)
+
+    stats = migration.run(progress)
+    print(f"\nBascule sur {stats['target']} ({stats['model']}, dim {stats['dim']}) : {stats['copied']} souvenirs "
+          f"en {stats['seconds']} s (repris à {stats['resumed_from']}, {stats['removed']} oubliés entre-temps). "
+          f"Ancienne collection : {stats['source']}.")
+
+
+if __name__ == "__main__":
+    main()
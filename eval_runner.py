@@ -0,0 +1,169 @@
+# eval_runner.py — Évaluation en parallèle des agents à mémoire (extension du Labo 5)
+# Charge des scénarios Recall / Update / Forget depuis des fichiers JSON ou YAML,
+# les exécute en parallèle (un HybridAgent isolé par scénario et par modèle) et écrit
+# précision + percentiles de latence en JSON / CSV.
+#
+# Format d'un fichier (JSON ou YAML) : {"scenarios": [...]} ou directement la liste
+#   {"name": "rappel", "turns": [
+#       {"user": "Mon nom est André."},
+#       {"user": "Quel est mon nom ?", "expect": ["André"], "reject": ["Marc"]}]}
+#   expect : textes qui doivent tous apparaître dans la réponse (casse ignorée)
+#   reject : textes qui ne doivent pas apparaître
+#
+# Exemples :
+#   python eval_runner.py scenarios/ --models gemma3,mistral --concurrency 8 --out-json eval.json --out-csv eval.csv
+#   python eval_runner.py scenarios/lab5_memory.json --fake      # à blanc, sans Ollama
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from lab5Module2 import MODEL_NAME
+
+
+def load_scenarios(paths: List[str]) -> List[Dict]:
+    """Fichiers .json / .yaml / .yml, ou dossiers qui en contiennent."""
+    files: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p)
+                            if f.endswith((".json", ".yaml", ".yml")))
+        else:
+            files.append(p)
+    scenarios: List[Dict] = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise SystemExit(f"{path} : installe PyYAML (pip install pyyaml) pour lire du YAML.")
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        items = data.get("scenarios", []) if isinstance(data, dict) else data
+        for i, sc in enumerate(items):
+            sc.setdefault("name", f"{os.path.basename(path)}#{i}")
+            sc["source"] = path
+            scenarios.append(sc)
+    return scenarios
+
+
+def check(answer: str, turn: Dict) -> bool:
+    low = answer.casefold()
+    return (all(e.casefold() in low for e in turn.get("expect", []))
+            and not any(r.casefold() in low for r in turn.get("reject", [])))
+
+
+def run_scenario(scenario: Dict, model: str, use_cache: bool = True, fake: bool = False) -> Dict:
+    """Un agent neuf par scénario : aucune mémoire partagée entre scénarios."""
+    from lab5Module2 import HybridAgent
+
+    if fake:
+        from fake_models import FakeChatModel
+        agent = HybridAgent(model_name=model, llm=FakeChatModel(model=model))
+    elif use_cache:
+        agent = HybridAgent(model_name=model)
+    else:
+        from langchain_community.chat_models import ChatOllama
+        agent = HybridAgent(model_name=model, llm=ChatOllama(model=model))
+
+    checks, latencies = [], []
+    error = None
+    try:
+        for i, turn in enumerate(scenario["turns"]):
+            t0 = time.perf_counter()
+            answer = agent.respond(turn["user"])
+            latencies.append(time.perf_counter() - t0)
+            if "expect" in turn or "reject" in turn:
+                checks.append({"turn": i, "user": turn["user"], "answer": answer, "ok": check(answer, turn),
+                               "latency_s": round(latencies[-1], 4)})
+        agent.summary_mem.flush()
+    except Exception as e:  # un scénario en erreur ne doit pas arrêter toute la campagne
+        error = f"{type(e).__name__}: {e}"
+    return {"scenario": scenario["name"], "source": scenario.get("source", ""), "model": model,
+            "checks": checks, "latencies_s": latencies, "error": error,
+            "passed": error is None and all(c["ok"] for c in checks)}
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(round(q * (len(s) - 1))))], 4)
+
+
+def summarize(results: List[Dict], wall_s: float) -> Dict:
+    by_model: Dict[str, Dict] = {}
+    for r in results:
+        m = by_model.setdefault(r["model"], {"scenarios": 0, "scenarios_passed": 0, "checks": 0,
+                                             "checks_passed": 0, "errors": 0, "_lat": []})
+        m["scenarios"] += 1
+        m["scenarios_passed"] += r["passed"]
+        m["checks"] += len(r["checks"])
+        m["checks_passed"] += sum(c["ok"] for c in r["checks"])
+        m["errors"] += r["error"] is not None
+        m["_lat"] += r["latencies_s"]
+    for m in by_model.values():
+        lat = m.pop("_lat")
+        m["accuracy"] = round(m["checks_passed"] / m["checks"], 3) if m["checks"] else 0.0
+        m["latency_s"] = {"p50": _pct(lat, 0.50), "p90": _pct(lat, 0.90), "p99": _pct(lat, 0.99),
+                          "turns": len(lat)}
+    return {"wall_s": round(wall_s, 3), "models": by_model}
+
+
+def run_all(scenarios: List[Dict], models: List[str], concurrency: int = 4, executor: str = "thread",
+            use_cache: bool = True, fake: bool = False) -> Dict:
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    results: List[Dict] = []
+    t0 = time.perf_counter()
+    with pool_cls(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_scenario, sc, m, use_cache, fake) for m in models for sc in scenarios]
+        for fut in as_completed(futures):
+            r = fut.result()
+            results.append(r)
+            print(f"[{'OK' if r['passed'] else 'KO'}] {r['model']:<12} {r['scenario']}"
+                  + (f"  ({r['error']})" if r["error"] else ""))
+    results.sort(key=lambda r: (r["model"], r["source"], r["scenario"]))
+    return {"summary": summarize(results, time.perf_counter() - t0), "results": results}
+
+
+def write_csv(report: Dict, path: str):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["model", "scenario", "turn", "user", "answer", "ok", "latency_s"])
+        for r in report["results"]:
+            for c in r["checks"]:
+                w.writerow([r["model"], r["scenario"], c["turn"], c["user"], c["answer"], c["ok"], c["latency_s"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation parallèle Recall / Update / Forget.")
+    parser.add_argument("paths", nargs="+", help="fichiers ou dossiers de scénarios (JSON / YAML)")
+    parser.add_argument("--models", default=MODEL_NAME, help="modèles Ollama séparés par des virgules")
+    parser.add_argument("--concurrency", type=int, default=4, help="scénarios exécutés en même temps")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--no-cache", action="store_true", help="ne pas utiliser le cache des réponses LLM")
+    parser.add_argument("--fake", action="store_true", help="modèle factice (vérifie la mécanique, sans Ollama)")
+    parser.add_argument("--out-json", help="rapport complet (JSON)")
+    parser.add_argument("--out-csv", help="une ligne par vérification (CSV)")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.paths)
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    report = run_all(scenarios, models, args.concurrency, args.executor, not args.no_cache, args.fake)
+
+    print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+    if args.out_json:
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.out_csv:
+        write_csv(report, args.out_csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# fact_extractor.py — Extraction déterministe de faits (slots) depuis les messages utilisateur
+# Une seule expression régulière compilée (toutes les règles en alternatives nommées) : un seul
+# passage sur le texte, quel que soit le nombre de slots.
+#   name   « je m'appelle X », « mon nom est X », « mon prénom est X », « appelle-moi X », « moi c'est X »
+#          (X en majuscule et en fin de proposition : « pour moi c'est important » n'est pas un nom)
+#   city   « j'habite à X », « je vis à X », « ma ville est X » (nom en minuscules : un seul mot, remis en
+#          majuscule ; « j'habite à côté », « en banlieue »... ne sont pas des villes)
+#   job    « je travaille comme X », « je suis de profession X », « mon métier est X »
+#   age    « j'ai 25 ans »
+#   likes  « j'aime X », « j'adore X » (s'ajoutent) ; « je n'aime plus X », « j'aime pas X » (retire)
+#   oubli  « oublie mon nom / ma ville / mes goûts ... » (un slot) ; « oublie » en début de phrase ou de
+#          proposition (« Je suis à Paris, oublie ça »), « oublie tout / ça / cela » (tout) — jamais
+#          « j'oublie ... » (constat) ni « n'oublie pas » (le contraire d'une commande)
+# Une question (« Est-ce que j'aime le chocolat ? ») n'enregistre, ne modifie ni ne retire aucun slot ;
+# seules les commandes d'oubli y restent valables.
+# Les faits stables restent ainsi dans SlotMemory (gratuit) au lieu de passer par les résumés LLM.
+#
+# Rattrapage sur d'anciennes conversations :
+#   python fact_extractor.py memory.json            # fichier du Labo 6 (buffer de SummaryMemory)
+#   python fact_extractor.py transcript.jsonl       # {"role": "user", "content": ...} par ligne
+
+import json
+import re
+import sys
+from typing import Dict, Iterable, List, Tuple, Union
+
+Update = Tuple[str, str, str]  # (op, slot, valeur) ; op : set | add | remove | forget | forget_all
+
+_WORD = r"[A-Za-zÀ-ÖØ-öø-ÿ][A-Za-zÀ-ÖØ-öø-ÿ\-']*"
+# Saint-Étienne, Aix en Provence, Bourg-en-Bresse ; « lyon » (minuscules : un seul mot)
+_PLACE = (r"[A-ZÀ-Ö][\w\-']*(?:[ \-](?:(?:sur|en|de|la|le)[ \-])*[A-ZÀ-Ö][\w\-']*)*"
+          r"|[a-zß-öø-ÿ][\w\-']*")
+_CLAUSE = r"[^.,;!?\n]{2,60}"
+_END = r"(?=\s*(?:[.,;!?\n]|$))"
+_BOUNDARY = re.compile(r"[.,;!?\n]")
+_QUESTION_START = re.compile(r"est-ce qu", re.IGNORECASE)
+
+# (slot, op, déclencheur insensible à la casse, valeur)
+RULES: List[Tuple[str, str, str, str]] = [
+    ("name", "set", r"\bje m'?appelle\s+", _WORD),
+    ("name", "set", r"\bmon (?:pré)?nom (?:est|c'est)\s+", _WORD),
+    ("name", "set", r"\bappelle[- ]moi\s+", _WORD),
+    ("name", "set", r"\bmoi,? c'est\s+", r"[A-ZÀ-Ö][A-Za-zÀ-ÖØ-öø-ÿ\-']*" + _END),
+    ("city", "set", r"\bj'?habite (?:à|a|au|en)\s+", _PLACE),
+    ("city", "set", r"\bje vis (?:à|a|au|en)\s+", _PLACE),
+    ("city", "set", r"\bma ville (?:est|c'est)\s+", _PLACE),
+    ("job", "set", r"\bje travaille comme\s+(?:une?\s+)?", _CLAUSE),
+    ("job", "set", r"\bje suis de profession\s+", _CLAUSE),
+    ("job", "set", r"\bmon (?:métier|travail|job) (?:est|c'est)\s+(?:une?\s+)?", _CLAUSE),
+    ("age", "set", r"\bj'?ai\s+", r"\d{1,3}(?= ans\b)"),
+    ("likes", "remove", r"\bje n'?aime (?:plus|pas)\s+(?:trop\s+)?", _CLAUSE),
+    ("likes", "remove", r"\bj'?aime (?:plus|pas)\s+(?:trop\s+)?", _CLAUSE),  # « j'aime pas » (oral)
+    ("likes", "add", r"\bj'?(?:aime|adore)\s+(?!(?:plus|pas)\b)(?:bien\s+|beaucoup\s+)?", _CLAUSE),
+    # « j'oublie », « n'oublie pas » : l'apostrophe exclut les formes non impératives
+    ("forget", "forget", r"(?<!')\boublie\s+(?:mon|ma|mes)\s+", r"prénom|nom|ville|métier|travail|job|âge|age|goûts|préférences"),
+    ("all", "forget_all", r"(?:^|(?<=[.!?;,]))\s*oublie\b(?!\s+(?:mon|ma|mes)\b)", r"(?:\s+tout)?"),
+    ("all", "forget_all", r"(?<!')\boublie\s+", r"(?:tout|ça|ca|cela)\b"),
+]
+
+FORGET_SLOTS = {"prénom": "name", "nom": "name", "ville": "city", "métier": "job", "travail": "job",
+                "job": "job", "âge": "age", "age": "age", "goûts": "likes", "préférences": "likes"}
+LIST_SEPARATOR = ", "
+# mots captés après « je m'appelle » qui ne sont pas des prénoms (« comment je m'appelle déjà ? »)
+NOT_NAMES = frozenset({"déjà", "comment", "quoi", "pas", "plus", "vraiment", "aussi", "comme"})
+# mots en minuscules captés après « j'habite à / en / au » qui ne sont pas des villes
+NOT_PLACES = frozenset({"côté", "proximité", "deux", "peine", "présent", "nouveau", "moment", "banlieue",
+                        "campagne", "bord", "centre", "nord", "sud", "est", "ouest", "ville", "maison",
+                        "la", "le", "les", "l", "un", "une", "quelques", "fond", "coin", "étage", "rez"})
+
+
+def _in_question(text: str, start: int, end: int) -> bool:
+    """La proposition autour de text[start:end] est-elle une question (« ... ? », « est-ce que ... ») ?"""
+    begin = max((b.end() for b in _BOUNDARY.finditer(text, 0, start)), default=0)
+    stop = _BOUNDARY.search(text, end)
+    return ((stop is not None and stop.group() == "?")
+            or _QUESTION_START.search(text, begin, start) is not None)
+
+
+class FactExtractor:
+    def __init__(self, rules: List[Tuple[str, str, str, str]] = RULES):
+        self._rules = rules
+        # une alternative par règle ; le groupe nommé r<i> porte la valeur -> m.lastgroup = règle déclenchée
+        self._pattern = re.compile("|".join(
+            f"(?i:{trigger})(?P<r{i}>{value})" for i, (_, _, trigger, value) in enumerate(rules)
+        ))
+
+    def extract(self, text: str) -> List[Update]:
+        """Mises à jour dans l'ordre du texte (la dernière l'emporte pour un même slot)."""
+        text = text.replace("’", "'")
+        updates: List[Update] = []
+        for m in self._pattern.finditer(text):
+            slot, op, _, _ = self._rules[int(m.lastgroup[1:])]
+            value = m.group(m.lastgroup).strip(" \"'")
+            if op in ("set", "add", "remove") and _in_question(text, m.start(), m.end()):
+                continue
+            if op == "forget":
+                updates.append(("forget", FORGET_SLOTS[value.lower()], ""))
+            elif op == "forget_all":
+                updates.append(("forget_all", "", ""))
+            elif slot == "city" and value.islower():
+                if value not in NOT_PLACES:
+                    updates.append((op, slot, value.title()))
+            elif value and not (slot == "name" and value.lower() in NOT_NAMES):
+                updates.append((op, slot, value))
+        return updates
+
+    @staticmethod
+    def apply(updates: List[Update], slots) -> bool:
+        """Applique à un SlotMemory (set / get / delete / clear). True si tout doit être oublié."""
+        forget_all = False
+        for op, slot, value in updates:
+            if op == "set":
+                slots.set(slot, value)
+            elif op == "add":
+                items = [v for v in slots.get(slot).split(LIST_SEPARATOR) if v]
+                if value.lower() not in (v.lower() for v in items):
+                    slots.set(slot, LIST_SEPARATOR.join(items + [value]))
+            elif op == "remove":
+                items = [v for v in slots.get(slot).split(LIST_SEPARATOR) if v]
+                kept = [v for v in items if v.lower() != value.lower()]
+                if kept and len(kept) != len(items):
+                    slots.set(slot, LIST_SEPARATOR.join(kept))
+                elif items and not kept:
+                    slots.delete(slot)
+            elif op == "forget":
+                slots.delete(slot)
+            elif op == "forget_all":
+                slots.clear()
+                forget_all = True
+        return forget_all
+
+    def ingest(self, text: str, slots) -> bool:
+        return self.apply(self.extract(text), slots)
+
+    def backfill(self, turns: Iterable[Union[str, Dict]]) -> Dict[str, str]:
+        """Rejoue d'anciens messages (chaînes ou tours {"role", "content"}) et renvoie les slots obtenus."""
+        slots = _DictSlots()
+        for turn in turns:
+            if isinstance(turn, dict):
+                if turn.get("role") not in ("user", "human"):
+                    continue
+                turn = turn.get("content", "")
+            self.ingest(turn, slots)
+        return slots.data
+
+
+class _DictSlots:
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+
+    def set(self, k: str, v: str):
+        self.data[k] = v
+
+    def get(self, k: str, default: str = "") -> str:
+        return self.data.get(k, default)
+
+    def delete(self, k: str):
+        self.data.pop(k, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+EXTRACTOR = FactExtractor()
+
+
+def _read_turns(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data.get("summary_mem", {}).get("buffer", []) if isinstance(data, dict) else data
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage : python fact_extractor.py memory.json|transcript.jsonl [...]")
+    turns: List[Dict] = []
+    for p in sys.argv[1:]:
+        turns += _read_turns(p)
+    print(json.dumps(EXTRACTOR.backfill(turns), ensure_ascii=False, indent=2))
@@ -0,0 +1,108 @@
+# fake_models.py — Modèles factices déterministes (chat + embeddings) pour tests et benchmarks
+# Même interface que ChatOllama / OllamaEmbeddings pour ce que les labs utilisent
+# (invoke, stream, embed_query, embed_documents), sans serveur Ollama.
+# Latence et longueur de sortie configurables ; chaque appel est journalisé (thread, taille, durée)
+# pour séparer le temps « modèle » du coût propre au code des agents.
+# Le cache de préfixe d'Ollama est simulé : seuls les tokens après le préfixe commun avec le
+# prompt précédent sont « évalués » (prompt_eval_count, comme le renvoie le serveur).
+
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from token_budget import estimate_tokens
+
+FILLER = ("d'accord", "je", "note", "cela", "et", "la", "mémoire", "reste", "cohérente", "pour", "la", "suite")
+
+
+def _content(m) -> str:
+    return m["content"] if isinstance(m, dict) else m.content
+
+
+class FakeChatModel:
+    def __init__(self, latency_s: float = 0.0, output_tokens: int = 40, model: str = "fake-chat"):
+        self.latency_s = latency_s
+        self.output_tokens = output_tokens
+        self.model = model
+        self.calls = 0
+        self.summary_calls = 0
+        self.log: List[Dict] = []  # un dict par appel : thread, kind, prompt_chars, prompt_tokens, prompt_eval_tokens, seconds
+        self._last_prompt = ""     # un seul emplacement de cache KV, comme Ollama avec OLLAMA_NUM_PARALLEL=1
+        self._lock = threading.Lock()
+
+    def _record(self, messages: List) -> Dict:
+        text = "\n".join(_content(m) for m in messages)
+        # les prompts de résumé des labs commencent par « Tu es un assistant qui résume »
+        kind = "summary" if messages and "résume" in _content(messages[0]) else "chat"
+        entry = {"thread": threading.get_ident(), "kind": kind, "prompt_chars": len(text),
+                 "prompt_tokens": estimate_tokens(text), "seconds": self.latency_s}
+        with self._lock:
+            self.calls += 1
+            self.summary_calls += kind == "summary"
+            entry["n"] = self.calls
+            shared = len(os.path.commonprefix([self._last_prompt, text]))
+            entry["prompt_eval_tokens"] = estimate_tokens(text[shared:])
+            self._last_prompt = text
+            self.log.append(entry)
+        return entry
+
+    def _answer(self, n: int) -> str:
+        words = [f"réponse{n}"] + [FILLER[i % len(FILLER)] for i in range(self.output_tokens - 1)]
+        return " ".join(words) + "."
+
+    def invoke(self, messages: List, **kwargs) -> AIMessage:
+        entry = self._record(messages)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return AIMessage(content=self._answer(entry["n"]),
+                         response_metadata={"prompt_eval_count": entry["prompt_eval_tokens"]})
+
+    def stream(self, messages: List, **kwargs) -> Iterator[AIMessageChunk]:
+        entry = self._record(messages)
+        words = self._answer(entry["n"]).split(" ")
+        step = self.latency_s / len(words)
+        for i, w in enumerate(words):
+            if step:
+                time.sleep(step)
+            yield AIMessageChunk(content=w if i == 0 else " " + w)
+
+    def model_seconds(self, thread: int, since: int = 0) -> float:
+        """Temps passé « dans le modèle » par un thread depuis l'appel numéro `since`."""
+        return sum(e["seconds"] for e in self.log[since:] if e["thread"] == thread)
+
+
+class FakeEmbeddings:
+    """Vecteurs pseudo-aléatoires stables dérivés du texte (même texte -> même vecteur)."""
+    def __init__(self, dim: int = 64, latency_s: float = 0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _vec(self, text: str) -> List[float]:
+        out: List[float] = []
+        counter = 0
+        while len(out) < self.dim:
+            digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+            out.extend(b / 127.5 - 1.0 for b in digest)
+            counter += 1
+        v = out[: self.dim]
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
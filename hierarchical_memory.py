@@ -0,0 +1,305 @@
+# hierarchical_memory.py — Mémoire résumée hiérarchique à coût borné + archive brute des tours (Labo 6)
+# SummaryMemory réinjecte tout le résumé courant + tout le buffer à chaque résumé et jette les tours.
+# Ici, trois niveaux dont chaque appel au modèle a une entrée bornée :
+#   chunk    : les HIER_CHUNK_TURNS plus anciens tours du buffer (au plus HIER_CHUNK_TOKENS) -> 3-4 lignes
+#   section  : HIER_FANOUT résumés de chunks -> un résumé de section
+#   session  : résumé de session + HIER_FANOUT sections -> nouveau résumé de session (5-8 lignes)
+# Les tours résumés ne sont pas perdus : TranscriptArchive les garde sur disque, compressés par chunk
+# et indexés par numéro de tour ; relevant_turns() ramène dans le contexte les tours d'un chunk
+# passé proche de la question, sans nouveau résumé.
+#
+# Journal (compatible avec SummaryMemory) : "turn" et "clear_summary" inchangés ; un ancien
+# {"op": "summary"} devient le résumé de session. Nouveaux enregistrements :
+#   {"op": "chunk", "summary", "consumed", "first"}        chunk résumé (tours first..first+consumed-1)
+#   {"op": "rollup", "level": "section"|"session", "summary", "count"}
+#
+# Variables d'environnement :
+#   HIER_CHUNK_TURNS    tours par chunk (défaut 8)
+#   HIER_CHUNK_TOKENS   tokens estimés max par chunk (défaut 800)
+#   HIER_FANOUT         résumés regroupés par niveau (défaut 4)
+#   HIER_RECALL_TOKENS  budget des tours ramenés depuis l'archive (défaut 400, 0 = jamais)
+
+import json
+import os
+import threading
+import zlib
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from lab6module2 import CONTEXT_BUDGET, SummaryMemory
+from lexical_index import tokenize
+from token_budget import estimate_messages_tokens, estimate_tokens
+from tracing import span
+
+HIER_CHUNK_TURNS = int(os.getenv("HIER_CHUNK_TURNS", "8"))
+HIER_CHUNK_TOKENS = int(os.getenv("HIER_CHUNK_TOKENS", "800"))
+HIER_FANOUT = int(os.getenv("HIER_FANOUT", "4"))
+HIER_RECALL_TOKENS = int(os.getenv("HIER_RECALL_TOKENS", "400"))
+
+Block = Dict  # {"first", "n", "offset", "length", "summary"}
+
+
+# --------- Archive des tours bruts ----------
+class TranscriptArchive:
+    """
+    <path>            blocs zlib concaténés (un bloc = les tours d'un chunk, en JSON)
+    <path>.idx.jsonl  une ligne par bloc : premier tour, nombre de tours, position, taille, résumé du chunk
+    path=None : archive en RAM (sessions sans fichier).
+    """
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.blocks: List[Block] = []
+        self._firsts: List[int] = []
+        self._mem: List[bytes] = []  # blocs compressés si path=None
+        self._lock = threading.Lock()
+        if path and os.path.exists(path + ".idx.jsonl"):
+            with open(path + ".idx.jsonl", "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except ValueError:
+                        break  # dernière ligne tronquée : le bloc sera ré-archivé au rejeu du journal
+
+    def _index(self, block: Block):
+        self.blocks.append(block)
+        self._firsts.append(block["first"])
+
+    @property
+    def next_turn(self) -> int:
+        """Premier numéro de tour pas encore archivé."""
+        return self.blocks[-1]["first"] + self.blocks[-1]["n"] if self.blocks else 0
+
+    def append(self, first: int, turns: List[Dict], summary: str):
+        """Archive un chunk ; ignoré s'il l'est déjà (rejeu après un arrêt brutal)."""
+        with self._lock:
+            if first < self.next_turn:
+                return
+            data = zlib.compress(json.dumps(turns, ensure_ascii=False).encode("utf-8"), 6)
+            block = {"first": first, "n": len(turns), "length": len(data), "summary": summary}
+            if self.path is None:
+                block["offset"] = len(self._mem)
+                self._mem.append(data)
+            else:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "ab") as f:
+                    block["offset"] = f.tell()
+                    f.write(data)
+                # l'index est écrit après les données : une entrée d'index pointe toujours sur un bloc complet
+                with open(self.path + ".idx.jsonl", "a", encoding="utf-8") as f:
+                    f.write(json.dumps(block, ensure_ascii=False) + "\n")
+            self._index(block)
+
+    def _read(self, block: Block) -> List[Dict]:
+        if self.path is None:
+            data = self._mem[block["offset"]]
+        else:
+            with open(self.path, "rb") as f:
+                f.seek(block["offset"])
+                data = f.read(block["length"])
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def turns(self, first: int, last: int) -> List[Dict]:
+        """Tours first..last (inclus) déjà archivés, chacun avec son numéro ("id")."""
+        out: List[Dict] = []
+        i = max(0, bisect_right(self._firsts, first) - 1)
+        while i < len(self.blocks) and self.blocks[i]["first"] <= last:
+            block = self.blocks[i]
+            for j, t in enumerate(self._read(block)):
+                if first <= block["first"] + j <= last:
+                    out.append({"id": block["first"] + j, **t})
+            i += 1
+        return out
+
+    def best_block(self, query: str) -> Optional[Block]:
+        """Bloc dont le résumé partage le plus de mots avec la question (au moins 2, ou tous s'il y en a moins)."""
+        terms = set(tokenize(query))
+        best, best_score = None, min(2, len(terms)) - 1
+        for block in self.blocks:
+            score = len(terms & set(tokenize(block["summary"])))
+            if score > best_score:
+                best, best_score = block, score
+        return best
+
+    def clear(self):
+        with self._lock:
+            self.blocks, self._firsts, self._mem = [], [], []
+            if self.path is not None:
+                for p in (self.path, self.path + ".idx.jsonl"):
+                    if os.path.exists(p):
+                        os.remove(p)
+
+
+# --------- Mémoire hiérarchique ----------
+def _dialogue(turns: List[Dict]) -> str:
+    return "".join(f"{'Utilisateur' if t['role'] == 'user' else 'Assistant'}: {t['content']}\n" for t in turns)
+
+
+def _span_label(entry: Dict) -> str:
+    return f"[tours {entry['first']}–{entry['last']}] {entry['summary']}"
+
+
+class HierarchicalSummaryMemory(SummaryMemory):
+    """
+    Remplace SummaryMemory dans l'Agent du Labo 6 (Agent(memory="hier")).
+    `summary` reste le texte injecté dans le prompt : session, puis sections, puis chunks récents.
+    """
+    def __init__(self, llm, context_budget: int = CONTEXT_BUDGET, archive_path: Optional[str] = None,
+                 chunk_turns: int = HIER_CHUNK_TURNS, chunk_tokens: int = HIER_CHUNK_TOKENS,
+                 fanout: int = HIER_FANOUT, recall_tokens: int = HIER_RECALL_TOKENS,
+                 background: bool = False):
+        self.chunk_turns = chunk_turns
+        self.chunk_tokens = chunk_tokens
+        self.fanout = fanout
+        self.recall_tokens = recall_tokens
+        self.archive = TranscriptArchive(archive_path)
+        self.session = ""
+        self.sections: List[Dict] = []  # {"first", "last", "summary"}
+        self.chunks: List[Dict] = []
+        self.first_turn = 0             # numéro du premier tour du buffer
+        super().__init__(llm, context_budget=context_budget, background=background)
+
+    def _compose(self):
+        parts = [self.session] if self.session else []
+        parts += [_span_label(e) for e in self.sections + self.chunks]
+        self.summary = "\n".join(parts)
+
+    # --- sérialisation ---
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"summary": self.summary, "buffer": list(self.buffer), "session": self.session,
+                    "sections": list(self.sections), "chunks": list(self.chunks), "first_turn": self.first_turn}
+
+    def load_dict(self, data: Dict):
+        with self._lock:
+            super().load_dict(data)
+            # snapshot d'une SummaryMemory plate : son résumé devient le résumé de session
+            self.session = data.get("session", data.get("summary", ""))
+            self.sections = list(data.get("sections", []))
+            self.chunks = list(data.get("chunks", []))
+            self.first_turn = data.get("first_turn", 0)
+            self._compose()
+
+    def clear(self):
+        with self._lock:
+            self.archive.clear()
+            super().clear()
+
+    def apply_record(self, rec: Dict):
+        with self._lock:
+            op = rec["op"]
+            if op == "chunk":
+                self._consume(rec["first"], rec["consumed"], rec["summary"])
+            elif op == "rollup":
+                self._rollup(rec["level"], rec["count"], rec["summary"])
+            elif op == "summary":  # journal écrit par SummaryMemory
+                self._consume(self.first_turn, rec["consumed"], None)
+                self.session = rec["summary"]
+                self._compose()
+            elif op == "clear_summary":
+                # comme clear() : les numéros de tour repartent de 0, les chunks d'avant ne doivent ni
+                # rester dans l'archive ni empêcher d'y remettre ceux d'après (rejoués ensuite)
+                self.archive.clear()
+                super().apply_record(rec)
+            else:
+                super().apply_record(rec)
+
+    # --- mutations (sous verrou) ---
+    def _consume(self, first: int, n: int, summary: Optional[str]):
+        turns = self.buffer[:n]
+        if summary is not None:
+            self.archive.append(first, turns, summary)
+            self.chunks.append({"first": first, "last": first + n - 1, "summary": summary})
+        self.buffer = self.buffer[n:]
+        self._buffer_tokens -= estimate_messages_tokens(t["content"] for t in turns)
+        self.first_turn = first + n
+        self._compose()
+
+    def _rollup(self, level: str, count: int, summary: str):
+        if level == "section":
+            merged, self.chunks = self.chunks[:count], self.chunks[count:]
+            self.sections.append({"first": merged[0]["first"], "last": merged[-1]["last"], "summary": summary})
+        else:
+            self.sections = self.sections[count:]
+            self.session = summary
+        self._compose()
+
+    # --- résumés (entrée bornée) ---
+    def _ask(self, instruction: str, content: str, level: str, n: int) -> str:
+        messages = [
+            SystemMessage(content=(
+                "Tu es un assistant qui résume des dialogues de façon concise et factuelle. "
+                "Conserve les informations stables (noms, objectifs, préférences)."
+            )),
+            HumanMessage(content=f"{content}\n\n{instruction}"),
+        ]
+        with span("memory.summarize", level=level, turns=n):
+            return self.llm.invoke(messages).content.strip()
+
+    def _chunk_size(self, turns: List[Dict]) -> int:
+        n, tokens = 0, 0
+        for t in turns[:self.chunk_turns]:
+            tokens += estimate_messages_tokens([t["content"]])
+            if n >= 2 and tokens > self.chunk_tokens:
+                break
+            n += 1
+        return n
+
+    def _summarize(self):
+        with self._lock:
+            n = self._chunk_size(self.buffer)
+            turns = self.buffer[:n]
+            first = self.first_turn
+            generation = self._generation
+        if not turns:
+            return
+        summary = self._ask("Résume cet extrait en 3–4 lignes.", f"Extrait de conversation:\n{_dialogue(turns)}",
+                            "chunk", len(turns))
+        with self._lock:
+            if generation != self._generation:
+                return  # mémoire effacée/rechargée entre-temps : résumé obsolète
+            self._consume(first, len(turns), summary)
+            self._emit({"op": "chunk", "summary": summary, "consumed": len(turns), "first": first})
+        self._roll_up(generation)
+
+    def _roll_up(self, generation: int):
+        """Regroupe les chunks en section, puis les sections dans le résumé de session (entrées bornées)."""
+        for level, source in (("section", "chunks"), ("session", "sections")):
+            with self._lock:
+                items = getattr(self, source)[:self.fanout]
+                if len(getattr(self, source)) < self.fanout or generation != self._generation:
+                    continue
+                session = self.session
+            content = "\n".join(_span_label(e) for e in items)
+            if level == "section":
+                summary = self._ask("Fusionne ces résumés en un seul (4–6 lignes).",
+                                    f"Résumés successifs:\n{content}", level, len(items))
+            else:
+                summary = self._ask("Produis un NOUVEAU résumé unique (5–8 lignes max).",
+                                    f"Résumé courant:\n{session or 'Aucun'}\n\nNouvelles sections à intégrer:\n{content}",
+                                    level, len(items))
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._rollup(level, len(items), summary)
+                self._emit({"op": "rollup", "level": level, "summary": summary, "count": len(items)})
+
+    # --- rappel de tours archivés ---
+    def recall(self, first: int, last: int) -> List[Dict]:
+        return self.archive.turns(first, last)
+
+    def relevant_turns(self, query: str) -> List[Dict]:
+        """Tours du chunk archivé le plus proche de la question, dans la limite de recall_tokens."""
+        if not self.recall_tokens:
+            return []
+        block = self.archive.best_block(query)
+        if block is None:
+            return []
+        out, budget = [], self.recall_tokens
+        for t in self.archive.turns(block["first"], block["first"] + block["n"] - 1):
+            budget -= estimate_tokens(t["content"])
+            if budget < 0:
+                break
+            out.append(t)
+        return out
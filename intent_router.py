@@ -0,0 +1,109 @@
+# intent_router.py — Réponses déterministes avant le LLM (questions sur les slots, commandes)
+# « Quel est mon nom ? » se répond depuis SlotMemory en quelques microsecondes : inutile de
+# construire un prompt et d'attendre le modèle. Le routeur essaie, dans l'ordre :
+#   1) les commandes enregistrées (préfixes, ex: « Souviens-toi de : ... » dans MemoryTry)
+#   2) les questions sur un slot connu (nom, ville, métier, âge, goûts)
+# et renvoie None sinon -> l'appelant interroge le LLM.
+#
+# Confiance d'une question = part du message couverte par la question reconnue :
+# « Quel est mon nom ? » -> 1.0 ; « Quel est mon nom et raconte-moi une blague » -> 0.4 (LLM).
+#
+# Variables d'environnement :
+#   ROUTER_THRESHOLD   confiance minimale pour répondre sans LLM (défaut 0.6)
+#   ROUTER=off         désactive le routage des questions (tout passe par le LLM)
+
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tracing import span
+
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", "0.6"))
+ROUTER_ENABLED = os.getenv("ROUTER", "on").lower() not in ("0", "off", "false", "no")
+
+# (slot, question) sur le texte normalisé (minuscules, sans ponctuation)
+QUESTIONS: List[Tuple[str, str]] = [
+    ("name", r"(?:quel est|c'est quoi|rappelle moi|tu connais|tu te souviens de) mon (?:pré)?nom"),
+    ("name", r"comment (?:je m'appelle|est ce que je m'appelle|m'appelle je)"),
+    ("name", r"qui suis je"),
+    ("city", r"(?:où|dans quelle ville) (?:est ce que )?(?:j'habite|je vis|habite je|vis je)"),
+    ("city", r"(?:quelle est|c'est quoi) ma ville"),
+    ("job", r"(?:quel est|c'est quoi) mon (?:métier|travail|job)"),
+    ("job", r"qu'est ce que je fais (?:comme|dans la vie)(?: travail| métier)?"),
+    ("age", r"(?:quel âge (?:j'ai|ai je|est ce que j'ai)|quel est mon âge)"),
+    ("likes", r"(?:qu'est ce que j'aime|qu'est ce que j'adore|quels sont mes goûts|(?:quelles sont )?mes préférences)"),
+]
+
+ANSWERS: Dict[str, str] = {
+    "name": "Tu t'appelles {}.",
+    "city": "Tu habites à {}.",
+    "job": "Tu travailles comme {}.",
+    "age": "Tu as {} ans.",
+    "likes": "Tu aimes : {}.",
+}
+
+_PUNCT = re.compile(r"[^\w'\s]+")
+
+
+def normalize(text: str) -> str:
+    text = text.replace("’", "'").casefold().replace("-", " ")
+    return " ".join(_PUNCT.sub(" ", text).split())
+
+
+class IntentRouter:
+    def __init__(self, threshold: float = ROUTER_THRESHOLD, questions: List[Tuple[str, str]] = QUESTIONS):
+        self.threshold = threshold
+        self._slots = [slot for slot, _ in questions]
+        self._pattern = re.compile("|".join(f"(?P<q{i}>{q})" for i, (_, q) in enumerate(questions)))
+        self._commands: List[Tuple[str, bool, Callable[[str], str]]] = []
+        self._lock = threading.Lock()
+        self.stats = {"direct": 0, "commands": 0, "slot_answers": 0, "fallback": 0}
+
+    def add_command(self, prefix: str, handler: Callable[[str], str], exact: bool = False):
+        """handler(message complet) -> réponse ; exact=True : le message doit être exactement le préfixe."""
+        self._commands.append((prefix.lower(), exact, handler))
+
+    def _count(self, *keys: str):
+        with self._lock:
+            for k in keys:
+                self.stats[k] += 1
+
+    def match_slot(self, text: str) -> Optional[Tuple[str, float]]:
+        """(slot, confiance) de la question reconnue, ou None."""
+        norm = normalize(text)
+        m = self._pattern.search(norm)
+        if m is None:
+            return None
+        return self._slots[int(m.lastgroup[1:])], len(m.group(0)) / len(norm)
+
+    def route(self, text: str, slots=None) -> Optional[str]:
+        """Réponse directe, ou None s'il faut appeler le LLM."""
+        with span("router.route") as sp:
+            low = text.lower().strip()
+            for prefix, exact, handler in self._commands:
+                if low == prefix if exact else low.startswith(prefix):
+                    self._count("direct", "commands")
+                    sp.set(routed=1)
+                    return handler(text)
+            if slots is not None and ROUTER_ENABLED:
+                hit = self.match_slot(text)
+                if hit is not None:
+                    slot, confidence = hit
+                    sp.set(confidence=confidence)
+                    value = slots.get(slot)
+                    if value and confidence >= self.threshold:
+                        self._count("direct", "slot_answers")
+                        sp.set(routed=1)
+                        return ANSWERS[slot].format(value)
+            self._count("fallback")
+            sp.set(routed=0)
+            return None
+
+    def served_without_model(self) -> float:
+        total = self.stats["direct"] + self.stats["fallback"]
+        return self.stats["direct"] / total if total else 0.0
+
+
+# routeur partagé par les agents des labs 5 et 6 (compteurs communs)
+ROUTER = IntentRouter()
@@ -5,6 +5,9 @@ from typing import List, Dict
 from langchain_community.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from llm_cache import cached
+from tracing import span, start as start_tracing
+
 MODEL_NAME = "gemma3"
 
 class SummaryMemory:
@@ -40,7 +43,8 @@ class SummaryMemory:
             ))
         ]
 
-        resp = self.llm.invoke(messages)   # ✅ utilise invoke()
+        with span("memory.summarize", turns=len(self.buffer)):
+            resp = self.llm.invoke(messages)   # ✅ utilise invoke()
         self.summary = resp.content.strip()
         self.buffer = []  # on vide le buffer (on a condensé)
 
@@ -64,7 +68,8 @@ class SummaryMemory:
 
 
 def main():
-    llm = ChatOllama(model=MODEL_NAME)
+    start_tracing()  # endpoint Prometheus si AGENT_METRICS_PORT
+    llm = cached(ChatOllama(model=MODEL_NAME))  # réponses identiques servies par le cache
     mem = SummaryMemory(llm=llm, max_buffer_turns=3)
 
     def ask(user_text: str):
@@ -86,6 +91,8 @@ def main():
     mem._summarize()
     print("\n--- Résumé interne de la mémoire ---")
     print(mem.summary)
+    print("\n--- Cache LLM ---")
+    print(llm.cache.stats())
 
 if __name__ == "__main__":
     main()
@@ -4,38 +4,70 @@
 #   2) ollama pull gemma3
 #   3) pip install "langchain>=0.2" "langchain-community>=0.2"
 
-from typing import List, Dict, Tuple
-import re
+from typing import List, Dict, Tuple, Optional
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from textwrap import shorten
 
 from langchain_community.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from fact_extractor import EXTRACTOR
+from intent_router import ROUTER
+from llm_cache import cached
+from token_budget import estimate_tokens, estimate_messages_tokens
+from tracing import span, start as start_tracing
+
 MODEL_NAME = "gemma3"
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # modèle + cache KV gardés chargés entre deux tours
+CONTEXT_BUDGET = 1500  # tokens estimés (résumé + buffer) avant de déclencher un résumé
 
 # ---------- Mémoire résumée (comme Labo 4, simplifiée) ----------
 class SummaryMemory:
-    def __init__(self, llm: ChatOllama, max_buffer_turns: int = 3):
+    def __init__(self, llm: ChatOllama, context_budget: int = CONTEXT_BUDGET,
+                 max_buffer_turns: Optional[int] = None, background: bool = False):
         self.llm = llm
+        # Déclencheur principal : budget de tokens estimés ; max_buffer_turns reste un plafond optionnel
+        self.context_budget = context_budget
         self.max_buffer_turns = max_buffer_turns
+        self._buffer_tokens = 0  # somme des tokens estimés des tours du buffer
         self.buffer: List[Dict[str, str]] = []  # [{role: "user"/"ai", "content": "..."}]
         self.summary: str = ""
+        # Mode arrière-plan : le résumé tourne dans un thread pendant que le tour suivant est servi
+        self.background = background
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary") if background else None
+        self._pending: Optional[Future] = None
+        self._generation = 0  # incrémenté par clear()/load : invalide un résumé en cours
 
     def add_user(self, text: str):
-        self.buffer.append({"role": "user", "content": text})
+        with self._lock:
+            self.buffer.append({"role": "user", "content": text})
+            self._buffer_tokens += estimate_messages_tokens([text])
 
     def add_ai(self, text: str):
-        self.buffer.append({"role": "ai", "content": text})
+        with self._lock:
+            self.buffer.append({"role": "ai", "content": text})
+            self._buffer_tokens += estimate_messages_tokens([text])
 
     def clear(self):
-        self.buffer.clear()
-        self.summary = ""
+        with self._lock:
+            self._generation += 1
+            self.buffer = []
+            self.summary = ""
+            self._buffer_tokens = 0
 
     def _summarize(self):
-        if not self.buffer:
+        # instantané : les tours ajoutés pendant l'appel LLM restent dans le buffer
+        with self._lock:
+            turns = list(self.buffer)
+            summary = self.summary
+            generation = self._generation
+        if not turns:
             return
         convo_text = ""
-        for turn in self.buffer:
+        for turn in turns:
             prefix = "Utilisateur" if turn["role"] == "user" else "Assistant"
             convo_text += f"{prefix}: {turn['content']}\n"
 
@@ -45,18 +77,46 @@ class SummaryMemory:
                 "Conserve les informations stables (noms, objectifs, préférences)."
             )),
             HumanMessage(content=(
-                f"Résumé courant:\n{self.summary or 'Aucun'}\n\n"
+                f"Résumé courant:\n{summary or 'Aucun'}\n\n"
                 f"Nouvelle conversation à intégrer:\n{convo_text}\n\n"
                 "Produis un NOUVEAU résumé unique (5–8 lignes max)."
             )),
         ]
-        resp = self.llm.invoke(messages)
-        self.summary = resp.content.strip()
-        self.buffer = []
+        with span("memory.summarize", turns=len(turns)):
+            resp = self.llm.invoke(messages)
+        with self._lock:
+            if generation != self._generation:
+                return  # mémoire effacée/rechargée entre-temps : résumé obsolète
+            self.summary = resp.content.strip()
+            self.buffer = self.buffer[len(turns):]
+            self._buffer_tokens -= estimate_messages_tokens(t["content"] for t in turns)
+
+    def context_tokens(self) -> int:
+        """Taille estimée (tokens) du contexte mémoire envoyé au modèle : résumé + buffer."""
+        return estimate_tokens(self.summary) + self._buffer_tokens
+
+    def _over_budget(self) -> bool:
+        if not self.buffer:
+            return False
+        if self.context_tokens() >= self.context_budget:
+            return True
+        return self.max_buffer_turns is not None and len(self.buffer) >= 2 * self.max_buffer_turns
 
     def maybe_summarize(self):
-        if len(self.buffer) >= 2 * self.max_buffer_turns:
+        if not self._over_budget():
+            return
+        if not self.background:
             self._summarize()
+            return
+        if self._pending is not None and not self._pending.done():
+            return  # un résumé est déjà en cours ; les nouveaux tours attendront le suivant
+        self._pending = self._executor.submit(self._summarize)
+
+    def flush(self):
+        """Attend la fin d'un résumé en arrière-plan (avant save() ou à l'arrêt)."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
 
     def context_messages(self) -> List:
         msgs: List = []
@@ -83,6 +143,9 @@ class SlotMemory:
     def get(self, key: str, default: str = "") -> str:
         return self.slots.get(key, default)
 
+    def delete(self, key: str):
+        self.slots.pop(key, None)
+
     def clear(self):
         self.slots.clear()
 
@@ -93,27 +156,17 @@ class SlotMemory:
 
 # ---------- Agent hybride ----------
 class HybridAgent:
-    def __init__(self, model_name: str = MODEL_NAME):
-        self.llm = ChatOllama(model=model_name)
-        self.summary_mem = SummaryMemory(llm=self.llm, max_buffer_turns=3)
+    def __init__(self, model_name: str = MODEL_NAME, llm=None):
+        # llm : modèle injecté (tests, benchmarks) ; sinon ChatOllama derrière le cache partagé
+        self.llm = llm or cached(ChatOllama(model=model_name, keep_alive=KEEP_ALIVE))  # cache partagé (llm_cache.sqlite)
+        # résumé en arrière-plan : le tour suivant n'attend pas le second appel LLM
+        self.summary_mem = SummaryMemory(llm=self.llm, context_budget=CONTEXT_BUDGET, background=True)
         self.slots = SlotMemory()
 
-    # Règles de parsing simples pour capturer/mettre à jour le prénom
-    NAME_PATTERNS = [
-        re.compile(r"\bje m'?appelle\s+([A-Za-zÀ-ÖØ-öø-ÿ\-']+)\b", re.IGNORECASE),
-        re.compile(r"\ben fait[, ]*\s*je m'?appelle\s+([A-Za-zÀ-ÖØ-öø-ÿ\-']+)\b", re.IGNORECASE),
-    ]
-
     def ingest_user(self, text: str):
-        # capture/MAJ du prénom si trouvé
-        for pat in self.NAME_PATTERNS:
-            m = pat.search(text)
-            if m:
-                self.slots.set("name", m.group(1))
-        # "oublie" -> effacer la mémoire
-        if re.search(r"\boublie\b", text, re.IGNORECASE):
+        # slots (nom, ville, métier, goûts...) en un passage ; "oublie" seul -> effacer la mémoire
+        if EXTRACTOR.ingest(text, self.slots):
             self.summary_mem.clear()
-            self.slots.clear()
         # push dans la mémoire résumée
         self.summary_mem.add_user(text)
 
@@ -121,13 +174,22 @@ class HybridAgent:
         # alimenter mémoires
         self.ingest_user(user_text)
 
-        # Construire le contexte de réponse
+        # question sur un fait connu (« Quel est mon nom ? ») : réponse directe, sans LLM
+        answer = ROUTER.route(user_text, self.slots)
+        if answer is not None:
+            self.summary_mem.add_ai(answer)
+            self.summary_mem.maybe_summarize()
+            return answer
+
+        # Construire le contexte de réponse. Ordre stable pour le cache de préfixe d'Ollama :
+        # consignes fixes, résumé (ne change qu'à chaque résumé), faits structurés, tours récents
         system = (
             "Tu es un assistant utile, concis, exact.\n"
-            "Faits structurés (haute priorité, source de vérité):\n"
-            f"{self.slots.as_text()}\n"
             "Si la question est 'Quel est mon nom ?', réponds uniquement par le prénom le plus récent connu."
         )
+        if self.summary_mem.summary:
+            system += "\nMémoire résumée:\n" + self.summary_mem.summary
+        system += "\nFaits structurés (haute priorité, source de vérité):\n" + self.slots.as_text()
         msgs = [SystemMessage(content=system)] + self.summary_mem.context_messages()[1:]
         msgs.append(HumanMessage(content=user_text))
 
@@ -186,5 +248,6 @@ def run_tests() -> None:
     print("- Forget : après 'Oublie…', le prénom n’est plus restitué.")
 
 if __name__ == "__main__":
+    start_tracing()  # endpoint Prometheus si AGENT_METRICS_PORT
     print("=== Labo 5 : Évaluer l’efficacité de la mémoire (Ollama gemma3) ===")
     run_tests()
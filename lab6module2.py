@@ -14,39 +14,105 @@ import json
 import os
 import sys
 import tempfile
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 from langchain_community.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from fact_extractor import EXTRACTOR
+from intent_router import ROUTER
+from llm_cache import cached
+from token_budget import estimate_tokens, estimate_messages_tokens
+from tracing import span, start as start_tracing
+
 MODEL_NAME = "gemma3"
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # modèle + cache KV gardés chargés entre deux tours
+CONTEXT_BUDGET = 1500  # tokens estimés (résumé + buffer) avant de déclencher un résumé
 MEMORY_PATH = os.path.join(".", "memory.json")  # tu peux changer l’emplacement
+JOURNAL_FSYNC = os.getenv("MEMORY_FSYNC", "interval")  # "always" | "interval" | "never"
+JOURNAL_FSYNC_INTERVAL = 1.0  # secondes entre deux fsync en mode "interval"
+JOURNAL_COMPACT_EVERY = 200   # enregistrements avant compaction automatique dans memory.json
+MEMORY_MODE = os.getenv("MEMORY_MODE", "flat")  # "flat" (SummaryMemory) | "hier" (hierarchical_memory.py)
+
+Listener = Callable[[Dict], None]  # reçoit chaque changement de mémoire (journal)
 
 # --------- Mémoire résumée minimaliste (comme Labo 4) ----------
 class SummaryMemory:
-    def __init__(self, llm: ChatOllama, max_buffer_turns: int = 3):
+    def __init__(self, llm: ChatOllama, context_budget: int = CONTEXT_BUDGET,
+                 max_buffer_turns: Optional[int] = None, background: bool = False):
         self.llm = llm
+        # Déclencheur principal : budget de tokens estimés ; max_buffer_turns reste un plafond optionnel
+        self.context_budget = context_budget
         self.max_buffer_turns = max_buffer_turns
+        self._buffer_tokens = 0  # somme des tokens estimés des tours du buffer
         self.buffer: List[Dict[str, str]] = []
         self.summary: str = ""
+        # Mode arrière-plan : le résumé tourne dans un thread pendant que le tour suivant est servi
+        self.background = background
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary") if background else None
+        self._pending: Optional[Future] = None
+        self._generation = 0  # incrémenté par clear()/load : invalide un résumé en cours
+        self.listener: Optional[Listener] = None  # appelé (sous verrou) à chaque changement
+
+    def _emit(self, record: Dict):
+        if self.listener is not None:
+            self.listener(record)
+
+    def _append_turn(self, role: str, text: str):
+        with self._lock:
+            self.buffer.append({"role": role, "content": text})
+            self._buffer_tokens += estimate_messages_tokens([text])
+            self._emit({"op": "turn", "role": role, "content": text})
 
     def add_user(self, text: str):
-        self.buffer.append({"role": "user", "content": text})
+        self._append_turn("user", text)
 
     def add_ai(self, text: str):
-        self.buffer.append({"role": "ai", "content": text})
+        self._append_turn("ai", text)
 
     def to_dict(self) -> Dict:
-        return {"summary": self.summary, "buffer": self.buffer}
+        with self._lock:
+            return {"summary": self.summary, "buffer": list(self.buffer)}
 
     def load_dict(self, data: Dict):
-        self.summary = data.get("summary", "")
-        self.buffer = data.get("buffer", [])
+        with self._lock:
+            self._generation += 1
+            self.summary = data.get("summary", "")
+            self.buffer = data.get("buffer", [])
+            self._buffer_tokens = estimate_messages_tokens(t["content"] for t in self.buffer)
+
+    def clear(self):
+        with self._lock:
+            self.load_dict({})
+            self._emit({"op": "clear_summary"})
+
+    def apply_record(self, rec: Dict):
+        """Rejoue un enregistrement du journal (sans le ré-émettre)."""
+        with self._lock:
+            if rec["op"] == "turn":
+                self.buffer.append({"role": rec["role"], "content": rec["content"]})
+                self._buffer_tokens += estimate_messages_tokens([rec["content"]])
+            elif rec["op"] == "summary":
+                consumed = self.buffer[:rec["consumed"]]
+                self.summary = rec["summary"]
+                self.buffer = self.buffer[rec["consumed"]:]
+                self._buffer_tokens -= estimate_messages_tokens(t["content"] for t in consumed)
+            elif rec["op"] == "clear_summary":
+                self.load_dict({})
 
     def _summarize(self):
-        if not self.buffer:
+        # instantané : les tours ajoutés pendant l'appel LLM restent dans le buffer
+        with self._lock:
+            turns = list(self.buffer)
+            summary = self.summary
+            generation = self._generation
+        if not turns:
             return
         convo_text = ""
-        for turn in self.buffer:
+        for turn in turns:
             who = "Utilisateur" if turn["role"] == "user" else "Assistant"
             convo_text += f"{who}: {turn['content']}\n"
 
@@ -56,18 +122,55 @@ class SummaryMemory:
                 "Conserve les informations stables (noms, objectifs, préférences)."
             )),
             HumanMessage(content=(
-                f"Résumé courant:\n{self.summary or 'Aucun'}\n\n"
+                f"Résumé courant:\n{summary or 'Aucun'}\n\n"
                 f"Nouvel historique à intégrer:\n{convo_text}\n\n"
                 "Produis un NOUVEAU résumé unique (5–8 lignes max)."
             )),
         ]
-        resp = self.llm.invoke(messages)
-        self.summary = resp.content.strip()
-        self.buffer = []
+        with span("memory.summarize", turns=len(turns)):
+            resp = self.llm.invoke(messages)
+        with self._lock:
+            if generation != self._generation:
+                return  # mémoire effacée/rechargée entre-temps : résumé obsolète
+            self.summary = resp.content.strip()
+            self.buffer = self.buffer[len(turns):]
+            self._buffer_tokens -= estimate_messages_tokens(t["content"] for t in turns)
+            self._emit({"op": "summary", "summary": self.summary, "consumed": len(turns)})
+
+    def context_tokens(self) -> int:
+        """Taille estimée (tokens) du contexte mémoire envoyé au modèle : résumé + buffer."""
+        return estimate_tokens(self.summary) + self._buffer_tokens
+
+    def _over_budget(self) -> bool:
+        if not self.buffer:
+            return False
+        if self.context_tokens() >= self.context_budget:
+            return True
+        return self.max_buffer_turns is not None and len(self.buffer) >= 2 * self.max_buffer_turns
 
     def maybe_summarize(self):
-        if len(self.buffer) >= 2 * self.max_buffer_turns:
+        if not self._over_budget():
+            return
+        if not self.background:
             self._summarize()
+            return
+        if self._pending is not None and not self._pending.done():
+            return  # un résumé est déjà en cours ; les nouveaux tours attendront le suivant
+        self._pending = self._executor.submit(self._summarize)
+
+    def busy(self) -> bool:
+        """Un résumé en arrière-plan est-il en cours ?"""
+        return self._pending is not None and not self._pending.done()
+
+    def flush(self):
+        """Attend la fin d'un résumé en arrière-plan (avant save() ou à l'arrêt)."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
+
+    def relevant_turns(self, query: str) -> List[Dict]:
+        """Tours passés à rappeler pour cette question (aucun : les tours résumés sont perdus)."""
+        return []
 
     def context_messages(self) -> List:
         msgs: List = []
@@ -86,15 +189,32 @@ class SummaryMemory:
 class SlotMemory:
     def __init__(self):
         self.slots: Dict[str, str] = {}
+        self.listener: Optional[Listener] = None
 
     def set(self, k: str, v: str):
         self.slots[k] = v
+        if self.listener is not None:
+            self.listener({"op": "slot", "k": k, "v": v})
 
     def get(self, k: str, default: str = "") -> str:
         return self.slots.get(k, default)
 
+    def delete(self, k: str):
+        if self.slots.pop(k, None) is not None and self.listener is not None:
+            self.listener({"op": "slot_del", "k": k})
+
     def clear(self):
         self.slots.clear()
+        if self.listener is not None:
+            self.listener({"op": "slots_clear"})
+
+    def apply_record(self, rec: Dict):
+        if rec["op"] == "slot":
+            self.slots[rec["k"]] = rec["v"]
+        elif rec["op"] == "slot_del":
+            self.slots.pop(rec["k"], None)
+        elif rec["op"] == "slots_clear":
+            self.slots.clear()
 
     def to_dict(self) -> Dict:
         return dict(self.slots)
@@ -113,19 +233,21 @@ class PersistenceManager:
         self.path = path
 
     def save(self, payload: Dict):
-        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
-        tmp_fd, tmp_path = tempfile.mkstemp(prefix="mem_", suffix=".json", dir=os.path.dirname(self.path) or ".")
-        try:
-            with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-            # écriture atomique
-            os.replace(tmp_path, self.path)
-        except Exception:
+        with span("persist.save") as sp:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_fd, tmp_path = tempfile.mkstemp(prefix="mem_", suffix=".json", dir=os.path.dirname(self.path) or ".")
             try:
-                os.remove(tmp_path)
+                with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=2)
+                    sp.set(bytes=f.tell())
+                # écriture atomique
+                os.replace(tmp_path, self.path)
             except Exception:
-                pass
-            raise
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+                raise
 
     def load(self) -> Dict:
         if not os.path.exists(self.path):
@@ -137,66 +259,251 @@ class PersistenceManager:
         if os.path.exists(self.path):
             os.remove(self.path)
 
+# --------- Journal append-only (autosave à chaque tour) ----------
+class Journal:
+    """
+    Une ligne JSON compacte par changement (tour, slot, résumé) avec un numéro de séquence.
+    Coût par tour : O(tour) au lieu de réécrire toute la mémoire.
+    fsync : "always" (chaque ligne), "interval" (au plus toutes les N s), "never" (laissé à l'OS).
+    """
+    def __init__(self, path: str, fsync: str = JOURNAL_FSYNC, fsync_interval: float = JOURNAL_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.seq = 0        # dernier numéro attribué
+        self.pending = 0    # enregistrements depuis la dernière compaction
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._f = None
+
+    def replay(self, after_seq: int = 0) -> Iterator[Dict]:
+        """
+        Enregistrements postérieurs au snapshot. Une ligne tronquée (crash) est ignorée sans arrêter
+        la relecture : les enregistrements écrits après le redémarrage restent pris en compte.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                self.seq = max(self.seq, rec["seq"])
+                if rec["seq"] > after_seq:
+                    self.pending += 1
+                    yield rec
+
+    def append(self, rec: Dict):
+        with self._lock:
+            if self._f is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._f = open(self.path, "a", encoding="utf-8")
+                if not self._ends_with_newline():
+                    self._f.write("\n")  # dernière ligne tronquée (crash) : le prochain enregistrement sur sa propre ligne
+            self.seq += 1
+            self.pending += 1
+            self._f.write(json.dumps({"seq": self.seq, **rec}, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._f.flush()
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+                os.fsync(self._f.fileno())
+                self._last_sync = now
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def last_seq(self) -> int:
+        with self._lock:
+            return self.seq
+
+    def truncate(self, upto_seq: int):
+        """Après un snapshot : ne garde que les enregistrements de numéro > upto_seq."""
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+            keep = [r for r in self.replay(upto_seq)] if upto_seq < self.seq else []
+            # réécriture atomique (comme le snapshot) : un crash pendant la compaction laisse l'ancien journal
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for r in keep:
+                    f.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.pending = len(keep)
+
+    def delete(self):
+        self.truncate(self.seq)
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
 # --------- Agent hybride + persistance ----------
 class Agent:
-    def __init__(self, model_name: str = MODEL_NAME, memory_path: str = MEMORY_PATH):
-        self.llm = ChatOllama(model=model_name)
-        self.summary_mem = SummaryMemory(llm=self.llm, max_buffer_turns=3)
+    """
+    memory_path=None : pas de fichier (la mémoire est sauvée par l'appelant, ex: session_store).
+    llm : modèle partagé entre plusieurs agents (sinon un ChatOllama par agent).
+    memory : "flat" (un résumé unique) ou "hier" (chunks / sections / session + archive des tours bruts).
+    """
+    def __init__(self, model_name: str = MODEL_NAME, memory_path: Optional[str] = MEMORY_PATH,
+                 journal: bool = True, compact_every: int = JOURNAL_COMPACT_EVERY, llm=None,
+                 memory: str = MEMORY_MODE):
+        self.llm = llm or cached(ChatOllama(model=model_name, keep_alive=KEEP_ALIVE))  # cache partagé (llm_cache.sqlite)
+        # résumé en arrière-plan : le tour suivant n'attend pas le second appel LLM
+        if memory == "hier":
+            from hierarchical_memory import HierarchicalSummaryMemory
+            archive = memory_path + ".archive" if memory_path else None
+            self.summary_mem = HierarchicalSummaryMemory(llm=self.llm, context_budget=CONTEXT_BUDGET,
+                                                         archive_path=archive, background=True)
+        else:
+            self.summary_mem = SummaryMemory(llm=self.llm, context_budget=CONTEXT_BUDGET, background=True)
         self.slots = SlotMemory()
-        self.store = PersistenceManager(memory_path)
+        self._staged: Optional[Tuple] = None  # (message, mises à jour, slots du tour, tout oublier) jusqu'au commit
+        self.store = PersistenceManager(memory_path) if memory_path else None
 
         # au démarrage, tenter de charger
-        data = self.store.load()
+        data = self.store.load() if self.store else {}
+        self.restore(data)
+
+        # puis rejouer le journal (tours non encore compactés dans le snapshot)
+        self.journal: Optional[Journal] = None
+        self.compact_every = compact_every
+        if journal and memory_path:
+            self.journal = Journal(memory_path + ".journal")
+            self.journal.seq = data.get("journal_seq", 0)
+            for rec in self.journal.replay(after_seq=self.journal.seq):
+                self._apply_record(rec)
+            self.summary_mem.listener = self.journal.append
+            self.slots.listener = self.journal.append
+
+    def _apply_record(self, rec: Dict):
+        if rec["op"] in ("slot", "slot_del", "slots_clear"):
+            self.slots.apply_record(rec)
+        else:
+            self.summary_mem.apply_record(rec)
+
+    def snapshot(self, wait: bool = True) -> Dict:
+        """État sérialisable ; wait=True attend la fin d'un résumé en cours."""
+        if wait:
+            self.summary_mem.flush()  # ne pas sauver un buffer en cours de résumé
+        return {
+            "summary_mem": self.summary_mem.to_dict(),
+            "slots": self.slots.to_dict(),
+        }
+
+    def restore(self, data: Dict):
+        self._staged = None
         self.summary_mem.load_dict(data.get("summary_mem", {}))
         self.slots.load_dict(data.get("slots", {}))
 
     def save(self):
-        payload = {
-            "summary_mem": self.summary_mem.to_dict(),
-            "slots": self.slots.to_dict(),
-        }
-        self.store.save(payload)
+        self.summary_mem.flush()
+        # snapshot et numéro de séquence pris ensemble : un résumé en arrière-plan modifie la mémoire et
+        # écrit son enregistrement sous le verrou de summary_mem, il est donc dans les deux ou dans aucun
+        with self.summary_mem._lock:
+            payload = self.snapshot(wait=False)
+            if self.journal is not None:
+                payload["journal_seq"] = self.journal.last_seq()
+        if self.store is not None:
+            self.store.save(payload)
+        if self.journal is not None:
+            # compaction : le snapshot contient tout jusqu'à journal_seq
+            self.journal.truncate(payload["journal_seq"])
         return payload
 
+    def busy(self) -> bool:
+        return self.summary_mem.busy()
+
     def reset(self):
-        self.summary_mem.summary = ""
-        self.summary_mem.buffer = []
+        self._staged = None
+        self.summary_mem.clear()
         self.slots.clear()
-        self.store.delete()
-
-    def respond(self, user_text: str) -> str:
-        # capter un prénom si l’utilisateur dit “Je m’appelle X”
-        low = user_text.lower()
-        if "je m'appelle" in low or "je mappelle" in low:
-            try:
-                # dernier token comme prénom (simple pour la démo)
-                name = user_text.split()[-1].strip(" .,!?:;\"'()[]")
-                if name:
-                    self.slots.set("name", name)
-            except Exception:
-                pass
-
-        # construire contexte
-        system = (
-            "Tu es un assistant concis et exact.\n"
-            "Faits structurés (source de vérité prioritaire) :\n"
-            f"{self.slots.as_text()}"
-        )
-        msgs = [SystemMessage(content=system)] + self.summary_mem.context_messages()[1:]
+        if self.store is not None:
+            self.store.delete()
+        if self.journal is not None:
+            self.journal.delete()
+
+    def route(self, user_text: str) -> Optional[str]:
+        """
+        Lit les faits du message, puis renvoie une réponse directe (sans LLM) si c'est une question
+        sur un fait connu ; None sinon (-> prepare + LLM). Les slots ne changent qu'au commit().
+        """
+        _, view, _ = self._stage(user_text)
+        return ROUTER.route(user_text, view)
+
+    def _stage(self, user_text: str) -> Tuple[List, SlotMemory, bool]:
+        """
+        Faits du message appliqués à une copie des slots : (mises à jour, slots vus par ce tour,
+        tout oublier ?). Un tour qui échoue (LLM en erreur, 503...) ne laisse ainsi aucune trace.
+        """
+        if self._staged is None or self._staged[0] != user_text:
+            updates = EXTRACTOR.extract(user_text)
+            view, forget_all = self.slots, False
+            if updates:
+                view = SlotMemory()
+                view.load_dict(self.slots.to_dict())
+                forget_all = EXTRACTOR.apply(updates, view)
+            self._staged = (user_text, updates, view, forget_all)
+        return self._staged[1:]
+
+    def prepare(self, user_text: str) -> List:
+        """Construit les messages à envoyer au modèle (après route())."""
+        # construire contexte. Ordre stable pour le cache de préfixe d'Ollama : consignes fixes,
+        # résumé (ne change qu'à chaque résumé), faits structurés, puis tours récents
+        _, view, forget_all = self._stage(user_text)
+        system = "Tu es un assistant concis et exact."
+        if self.summary_mem.summary and not forget_all:
+            system += "\nMémoire résumée:\n" + self.summary_mem.summary
+        system += "\nFaits structurés (source de vérité prioritaire) :\n" + view.as_text()
+        # « oublie » : la mémoire sera effacée au commit, ce tour ne la voit déjà plus
+        msgs = [SystemMessage(content=system)] + ([] if forget_all else self.summary_mem.context_messages()[1:])
+        # tours archivés liés à la question : après les tours récents pour ne pas casser le préfixe
+        recalled = [] if forget_all else self.summary_mem.relevant_turns(user_text)
+        if recalled:
+            excerpt = "\n".join(f"{'Utilisateur' if t['role'] == 'user' else 'Assistant'}: {t['content']}"
+                                 for t in recalled)
+            msgs.append(SystemMessage(content=(
+                f"Extrait de la conversation passée (tours {recalled[0]['id']}–{recalled[-1]['id']}) :\n{excerpt}")))
         msgs.append(HumanMessage(content=user_text))
+        return msgs
 
-        # réponse
-        resp = self.llm.invoke(msgs)
-        answer = resp.content.strip()
-
-        # maj mémoire
+    def commit(self, user_text: str, answer: str):
+        """Enregistre le tour terminé dans la mémoire : slots, puis tours (résumé / journal si besoin)."""
+        updates, _, _ = self._stage(user_text)
+        self._staged = None
+        # faits structurés (nom, ville, métier, goûts...) ; « oublie » seul -> tout effacer
+        if EXTRACTOR.apply(updates, self.slots):
+            self.summary_mem.clear()
         self.summary_mem.add_user(user_text)
         self.summary_mem.add_ai(answer)
         self.summary_mem.maybe_summarize()
+        if self.journal is not None and self.journal.pending >= self.compact_every:
+            self.save()
+
+    def respond(self, user_text: str) -> str:
+        answer = self.route(user_text)
+        if answer is None:
+            msgs = self.prepare(user_text)
 
+            # réponse
+            resp = self.llm.invoke(msgs)
+            answer = resp.content.strip()
+
+        # maj mémoire
+        self.commit(user_text, answer)
         return answer
 
 def main():
+    start_tracing()  # endpoint Prometheus si AGENT_METRICS_PORT
     agent = Agent()
     print("=== Labo 6 : Persistance JSON (gemma3 @ Ollama) ===")
     print(f"(Fichier mémoire : {MEMORY_PATH})")
@@ -211,8 +518,8 @@ def main():
 
     print("\nCommandes utiles :")
     print("- Tape du texte libre (ex: \"Je m'appelle André.\")")
-    print("- save   -> écrit la mémoire dans memory.json et l’affiche")
-    print("- reset  -> efface la mémoire + supprime le fichier JSON")
+    print("- save   -> écrit la mémoire dans memory.json et l’affiche (chaque tour est déjà journalisé)")
+    print("- reset  -> efface la mémoire + supprime le fichier JSON et son journal")
     print("- exit   -> quitte")
 
     try:
@@ -235,6 +542,10 @@ def main():
 
     except (KeyboardInterrupt, EOFError):
         print("\nAu revoir !")
+    finally:
+        agent.summary_mem.flush()  # laisser finir un résumé en cours avant de quitter
+        if agent.journal is not None:
+            agent.journal.close()
 
 if __name__ == "__main__":
     main()
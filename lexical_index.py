@@ -0,0 +1,206 @@
+# lexical_index.py — Index inversé BM25 en process pour MemoryTry (recherche par mots-clés)
+# Complète la recherche vectorielle : « Qu'aime André ? » retrouve « André aime les agents d'IA »
+# sans appel d'embedding. Mis à jour à chaque ajout, en même temps que la collection `memo`.
+#
+# Stockage : <collection>.bm25.jsonl dans le dossier de persistance (memo_db), journal append-only
+#   {"op": "add", "id": ..., "text": ...}   ajout ou remplacement
+#   {"op": "del", "id": ...}                suppression
+# Les listes inversées sont reconstruites en RAM au chargement (tokenisation seule : rapide).
+#
+# Variables d'environnement :
+#   BM25_K1, BM25_B   paramètres BM25 (défauts 1.5 / 0.75)
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_WORDS = re.compile(r"\w+")
+# mots trop fréquents pour discriminer un souvenir (déjà sans accents)
+STOPWORDS = frozenset("""
+a ai as au aux avec c ce ces cette d de des du elle elles en est et etre il ils j je l la le les leur
+lui m ma me mes moi mon n ne nous on ou par pas pour qu que quel quelle qui quoi s sa se ses son
+sur t ta te tes toi ton tu un une vous y
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Minuscules, accents retirés, mots vides ignorés, pluriel simple (s/x final) retiré."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    out = []
+    for w in _WORDS.findall(text):
+        if w in STOPWORDS:
+            continue
+        if len(w) > 3 and w[-1] in "sx":
+            w = w[:-1]
+        out.append(w)
+    return out
+
+
+class LexicalIndex:
+    def __init__(self, persist_directory: Optional[str], collection_name: str = "memo",
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.path = (os.path.join(persist_directory, f"{collection_name}.bm25.jsonl")
+                     if persist_directory else None)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._texts: Dict[str, str] = {}
+        self._tf: Dict[str, Counter] = {}           # id -> fréquences des termes
+        self._lens: Dict[str, int] = {}             # id -> nombre de termes
+        self._postings: Dict[str, Set[str]] = {}    # terme -> ids
+        self._total_len = 0
+        self._records = 0                           # lignes du journal (pour la compaction)
+        self.exists = bool(self.path and os.path.exists(self.path))
+        if self.exists:
+            self._load()
+
+    # --- chargement / persistance ---
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # dernière ligne tronquée (arrêt brutal)
+                self._records += 1
+                if rec["op"] == "add":
+                    self._index(rec["id"], rec["text"])
+                else:
+                    self._unindex(rec["id"])
+        if self._records > 2 * len(self._texts) + 100:
+            self.compact()
+
+    def _append(self, records: List[Dict]):
+        if self.path is None or not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._records += len(records)
+        self.exists = True
+
+    def compact(self):
+        """Réécrit le journal avec les seuls documents vivants (écriture atomique)."""
+        if self.path is None:
+            return
+        with self._lock:
+            if self.exists and self._records == len(self._texts):
+                return  # rien de mort dans le journal
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for doc_id, text in self._texts.items():
+                    f.write(json.dumps({"op": "add", "id": doc_id, "text": text}, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            self._records = len(self._texts)
+            self.exists = True
+
+    # --- index en RAM ---
+    def _index(self, doc_id: str, text: str):
+        self._unindex(doc_id)
+        tf = Counter(tokenize(text))
+        self._texts[doc_id] = text
+        self._tf[doc_id] = tf
+        self._lens[doc_id] = sum(tf.values())
+        self._total_len += self._lens[doc_id]
+        for term in tf:
+            self._postings.setdefault(term, set()).add(doc_id)
+
+    def _unindex(self, doc_id: str):
+        tf = self._tf.pop(doc_id, None)
+        if tf is None:
+            return
+        del self._texts[doc_id]
+        self._total_len -= self._lens.pop(doc_id)
+        for term in tf:
+            ids = self._postings[term]
+            ids.discard(doc_id)
+            if not ids:
+                del self._postings[term]
+
+    # --- API ---
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        """Ajoute (ou remplace) des documents ; même id que dans la collection vectorielle."""
+        with self._lock:
+            records = []
+            for doc_id, text in zip(ids, texts):
+                self._index(doc_id, text)
+                records.append({"op": "add", "id": doc_id, "text": text})
+            self._append(records)
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            records = []
+            for doc_id in ids:
+                if doc_id in self._texts:
+                    self._unindex(doc_id)
+                    records.append({"op": "del", "id": doc_id})
+            self._append(records)
+
+    def clear(self):
+        """Vide l'index et son journal (un rechargement ne rejoue plus les anciens documents)."""
+        with self._lock:
+            self._texts.clear()
+            self._tf.clear()
+            self._lens.clear()
+            self._postings.clear()
+            self._total_len = 0
+            self._records = 0
+            if self.path is not None and self.exists:
+                tmp = self.path + ".tmp"
+                open(tmp, "w", encoding="utf-8").close()
+                os.replace(tmp, self.path)
+
+    def text(self, doc_id: str) -> str:
+        return self._texts[doc_id]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (id, score BM25), meilleurs d'abord ; seuls les documents partageant un terme sont notés."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._texts)
+            if not n or not terms:
+                return []
+            avg_len = self._total_len / n or 1.0
+            scores: Dict[str, float] = {}
+            for term in terms:
+                ids = self._postings.get(term)
+                if not ids:
+                    continue
+                idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+                for doc_id in ids:
+                    f = self._tf[doc_id][term]
+                    norm = self.k1 * (1 - self.b + self.b * self._lens[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * f * (self.k1 + 1) / (f + norm)
+            return sorted(scores.items(), key=lambda kv: -kv[1])[:k]
+
+    def coverage(self, query: str, doc_id: str) -> float:
+        """Part des termes de la requête présents dans le document (1.0 = tous)."""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        with self._lock:
+            tf = self._tf.get(doc_id) or {}
+            return sum(t in tf for t in terms) / len(terms)
+
+
+def rrf(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal Rank Fusion : somme de 1 / (k + rang) sur chaque classement."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
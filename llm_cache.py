@@ -0,0 +1,205 @@
+# llm_cache.py — Cache persistant des réponses LLM (SQLite, adressé par contenu)
+# Partagé par SummaryMemory, HybridAgent (lab5) et Agent (lab6) :
+#   clé = sha256(modèle + messages normalisés + paramètres d'échantillonnage)
+#   -> un tour identique coûte une lecture SQLite au lieu d'une génération complète.
+#
+# Variables d'environnement :
+#   LLM_CACHE_PATH   fichier SQLite (défaut ./llm_cache.sqlite)
+#   LLM_CACHE_MAX    nombre max d'entrées avant éviction LRU (défaut 5000)
+#   LLM_CACHE=off    désactive le cache (bypass complet)
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from tracing import span
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".", "llm_cache.sqlite"))
+LLM_CACHE_MAX = int(os.getenv("LLM_CACHE_MAX", "5000"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+# Paramètres de ChatOllama qui changent la sortie -> font partie de la clé
+SAMPLING_PARAMS = ("temperature", "top_p", "top_k", "seed", "num_predict",
+                   "num_ctx", "repeat_penalty", "mirostat", "stop", "format")
+
+
+def _normalize_messages(messages: List) -> List[List[str]]:
+    """Messages LangChain (ou dicts role/content) -> [[role, contenu]] stable."""
+    out = []
+    for m in messages:
+        if isinstance(m, dict):
+            role, content = m.get("role", ""), m.get("content", "")
+        else:
+            role, content = m.type, m.content
+        out.append([role, str(content).replace("\r\n", "\n").strip()])
+    return out
+
+
+def sampling_params(llm) -> Dict:
+    return {p: getattr(llm, p) for p in SAMPLING_PARAMS if getattr(llm, p, None) is not None}
+
+
+class LLMCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX,
+                 enabled: bool = LLM_CACHE_ENABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # ouverture paresseuse : pas de fichier créé si le cache n'est jamais utilisé
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, content TEXT,"
+                " created REAL, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lru ON responses(last_access)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, messages: List, params: Optional[Dict] = None) -> str:
+        blob = json.dumps(
+            {"model": model, "messages": _normalize_messages(messages), "params": params or {}},
+            ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, content: str):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            # éviction LRU au-delà de max_entries
+            (count,) = db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            extra = count - self.max_entries
+            if extra > 0:
+                db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (extra,),
+                )
+                self.evictions += extra
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM responses")
+            self._db().commit()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_default_cache: Optional[LLMCache] = None
+
+
+def get_default_cache() -> LLMCache:
+    """Instance unique par process : tous les agents partagent le même fichier."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache()
+    return _default_cache
+
+
+class CachedChatModel:
+    """
+    Enveloppe un modèle de chat LangChain : invoke() et stream() passent d'abord par le cache.
+    Les autres attributs (model, ...) sont délégués au modèle d'origine.
+    """
+    def __init__(self, llm, cache: Optional[LLMCache] = None):
+        self.llm = llm
+        self.cache = cache or get_default_cache()
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def invoke(self, messages: List, use_cache: bool = True, **kwargs):
+        with span("llm.invoke", model=getattr(self.llm, "model", "")) as sp:
+            sp.set_prompt(messages)
+            resp = self._invoke(messages, use_cache, **kwargs)
+            meta = resp.response_metadata
+            sp.set(cache_hit=int(bool(meta.get("cache_hit"))))
+            if "prompt_eval_count" in meta:  # tokens réévalués par Ollama (hors préfixe en cache)
+                sp.set(prompt_eval_tokens=meta["prompt_eval_count"])
+            sp.set_output(resp.content)
+            return resp
+
+    def stream(self, messages: List, use_cache: bool = True, **kwargs):
+        """Morceaux de la réponse ; un succès de cache arrive en un seul morceau."""
+        model = getattr(self.llm, "model", "")
+        key = None
+        if use_cache and self.cache.enabled and not kwargs:
+            key = self.cache.make_key(model, messages, sampling_params(self.llm))
+        with span("llm.stream", model=model) as sp:
+            sp.set_prompt(messages)
+            content = self.cache.get(key) if key else None
+            if content is not None:
+                sp.first_token()
+                sp.set(cache_hit=1)
+                sp.set_output(content)
+                yield AIMessageChunk(content=content, response_metadata={"cache_hit": True})
+                return
+            parts = []
+            for chunk in self.llm.stream(messages, **kwargs):
+                sp.first_token()
+                parts.append(chunk.content)
+                yield chunk
+            text = "".join(parts)
+            if key:
+                self.cache.put(key, model, text)
+            sp.set(cache_hit=0)
+            sp.set_output(text)
+
+    def _invoke(self, messages: List, use_cache: bool, **kwargs):
+        if not (use_cache and self.cache.enabled) or kwargs:
+            return self.llm.invoke(messages, **kwargs)
+        model = getattr(self.llm, "model", "")
+        key = self.cache.make_key(model, messages, sampling_params(self.llm))
+        content = self.cache.get(key)
+        if content is not None:
+            return AIMessage(content=content, response_metadata={"cache_hit": True})
+        resp = self.llm.invoke(messages)
+        self.cache.put(key, model, resp.content)
+        return resp
+
+
+def cached(llm, cache: Optional[LLMCache] = None) -> CachedChatModel:
+    return CachedChatModel(llm, cache)
@@ -0,0 +1,255 @@
+# memory_lifecycle.py — Cycle de vie de la mémoire long terme (collection `memo` de MemoryTry)
+#   - quasi-doublons détectés à l'insertion (cosinus >= MEMO_DEDUP_THRESHOLD)
+#   - métadonnées : created_at, last_access, access_count (accès groupés, écrits par flush_access)
+#   - éviction : TTL depuis le dernier accès + taille max (on retire les scores de rétention les plus bas)
+#   - oubli explicite par requête (« Oublie : ... »)
+#   - maintenance en arrière-plan : accès, éviction, compaction du store NumPy et de l'index BM25
+#
+# Score de rétention : (1 + access_count) * 0.5 ** (âge depuis le dernier accès / demi-vie)
+#
+# Variables d'environnement :
+#   MEMO_MAX_FACTS         taille max de la collection (défaut 10000)
+#   MEMO_TTL_DAYS          oubli après N jours sans accès (défaut 0 = jamais)
+#   MEMO_HALF_LIFE_DAYS    demi-vie du score de rétention (défaut 30)
+#   MEMO_DEDUP_THRESHOLD   similarité à partir de laquelle un fait est un doublon (défaut 0.95)
+#   MEMO_FORGET_THRESHOLD  similarité minimale pour qu'un souvenir soit oublié par requête (défaut 0.8)
+#   MEMO_MAINTENANCE_S     intervalle de la maintenance en arrière-plan (défaut 600 s)
+
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tracing import span
+
+MEMO_MAX_FACTS = int(os.getenv("MEMO_MAX_FACTS", "10000"))
+MEMO_TTL_DAYS = float(os.getenv("MEMO_TTL_DAYS", "0"))
+MEMO_HALF_LIFE_DAYS = float(os.getenv("MEMO_HALF_LIFE_DAYS", "30"))
+MEMO_DEDUP_THRESHOLD = float(os.getenv("MEMO_DEDUP_THRESHOLD", "0.95"))
+MEMO_FORGET_THRESHOLD = float(os.getenv("MEMO_FORGET_THRESHOLD", "0.8"))
+MEMO_MAINTENANCE_S = float(os.getenv("MEMO_MAINTENANCE_S", "600"))
+
+DAY = 86400.0
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def new_metadata(h: str, now: Optional[float] = None) -> Dict:
+    now = time.time() if now is None else now
+    return {"type": "memory", "hash": h, "created_at": now, "last_access": now, "access_count": 0}
+
+
+class MemoryLifecycle:
+    """
+    store    : Chroma ou NumpyVectorStore (get / delete / similarity_search_by_vector)
+    lexical  : LexicalIndex gardé synchronisé (mêmes clés que `key`)
+    key      : texte -> clé du souvenir (fact_hash de MemoryTry)
+    """
+    def __init__(self, store, lexical, embeddings, key: Callable[[str], str],
+                 max_facts: int = MEMO_MAX_FACTS, ttl_days: float = MEMO_TTL_DAYS,
+                 half_life_days: float = MEMO_HALF_LIFE_DAYS,
+                 dedup_threshold: float = MEMO_DEDUP_THRESHOLD,
+                 forget_threshold: float = MEMO_FORGET_THRESHOLD):
+        self.store = store
+        self.lexical = lexical
+        self.embeddings = embeddings
+        self.key = key
+        self.max_facts = max_facts
+        self.ttl_days = ttl_days
+        self.half_life_days = half_life_days
+        self.dedup_threshold = dedup_threshold
+        self.forget_threshold = forget_threshold
+        self.stats = {"near_duplicates": 0, "evicted": 0, "forgotten": 0, "maintenance_runs": 0}
+        self._touches: Dict[str, Tuple[int, float]] = {}  # clé -> (accès en attente, dernier accès)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- accès au store (Chroma / NumPy) ---
+    def _doc_key(self, doc) -> str:
+        return doc.metadata.get("hash") or self.key(doc.page_content)
+
+    def _pages(self, page_size: int = 1000):
+        offset = 0
+        while True:
+            page = self.store.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+
+    def _update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        if hasattr(self.store, "update_metadata"):
+            self.store.update_metadata(ids, metadatas)
+        else:
+            self.store._collection.update(ids=ids, metadatas=metadatas)
+
+    def _store_ids(self, keys: List[str]) -> Dict[str, str]:
+        """clé -> id dans le store (les souvenirs d'avant les ids hachés ont un uuid)."""
+        found = {i: i for i in self.store.get(ids=list(keys))["ids"]}
+        missing = set(keys) - set(found)
+        if missing:
+            for page in self._pages():
+                for doc_id, text in zip(page["ids"], page["documents"]):
+                    k = self.key(text)
+                    if k in missing:
+                        found[k] = doc_id
+        return found
+
+    def delete(self, keys: List[str]) -> int:
+        ids = self._store_ids(keys)
+        if ids:
+            self.store.delete(ids=list(ids.values()))
+        self.lexical.remove(keys)
+        with self._lock:
+            for k in keys:
+                self._touches.pop(k, None)
+        return len(ids)
+
+    # --- insertion ---
+    def find_near_duplicate(self, vector: List[float]) -> Optional[str]:
+        """Clé du souvenir existant le plus proche si sa similarité dépasse le seuil."""
+        docs = self.store.similarity_search_by_vector(vector, k=1)
+        if not docs:
+            return None
+        # vecteur du candidat via le cache d'embeddings (pas de nouvel appel au modèle en général)
+        candidate = self.embeddings.embed_documents([docs[0].page_content])[0]
+        if _cosine(vector, candidate) < self.dedup_threshold:
+            return None
+        key = self._doc_key(docs[0])
+        self.stats["near_duplicates"] += 1
+        self.touch([key])
+        return key
+
+    # --- accès ---
+    def touch(self, keys: List[str], now: Optional[float] = None):
+        """Note des accès (recherche, doublon) ; écrits dans le store par flush_access()."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for k in keys:
+                count, _ = self._touches.get(k, (0, now))
+                self._touches[k] = (count + 1, now)
+
+    def flush_access(self) -> int:
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if not touches:
+            return 0
+        # clé -> id du store : les souvenirs d'avant les ids hachés ont un uuid (comme dans delete)
+        key_of = {doc_id: k for k, doc_id in self._store_ids(list(touches)).items()}
+        if not key_of:
+            return 0
+        page = self.store.get(ids=list(key_of), include=["metadatas"])
+        ids, metas = [], []
+        for doc_id, meta in zip(page["ids"], page["metadatas"]):
+            count, last = touches[key_of[doc_id]]
+            meta = dict(meta or {})
+            meta["access_count"] = meta.get("access_count", 0) + count
+            meta["last_access"] = max(meta.get("last_access", 0), last)
+            ids.append(doc_id)
+            metas.append(meta)
+        if ids:
+            self._update_metadata(ids, metas)
+        return len(ids)
+
+    # --- éviction ---
+    def retention(self, meta: Dict, now: float) -> float:
+        last = meta.get("last_access") or meta.get("created_at") or now  # anciens souvenirs : « neufs »
+        age_days = max(0.0, now - last) / DAY
+        return (1 + meta.get("access_count", 0)) * 0.5 ** (age_days / self.half_life_days)
+
+    def evict(self, now: Optional[float] = None, protect: Iterable[str] = ()) -> int:
+        """
+        Retire les souvenirs expirés (TTL), puis les moins utiles au-delà de max_facts.
+        protect : clés à garder (le souvenir qu'on vient d'ajouter n'a encore aucun accès et
+        perdrait contre tous les autres).
+        """
+        now = time.time() if now is None else now
+        protect = set(protect)
+        self.flush_access()
+        with span("memory.evict") as sp:
+            expired, scored, kept = [], [], 0
+            for page in self._pages():
+                for text, meta in zip(page["documents"], page["metadatas"]):
+                    meta = meta or {}
+                    key = meta.get("hash") or self.key(text)
+                    last = meta.get("last_access") or meta.get("created_at") or now
+                    if key in protect:
+                        kept += 1
+                    elif self.ttl_days and now - last > self.ttl_days * DAY:
+                        expired.append(key)
+                    else:
+                        scored.append((self.retention(meta, now), key))
+            victims = expired
+            over = kept + len(scored) - self.max_facts
+            if over > 0:
+                scored.sort()
+                victims += [key for _, key in scored[:over]]
+            if victims:
+                self.delete(victims)
+            self.stats["evicted"] += len(victims)
+            sp.set(evicted=len(victims), expired=len(expired))
+        return len(victims)
+
+    def over_capacity(self) -> bool:
+        return len(self.lexical) > self.max_facts
+
+    # --- oubli explicite ---
+    def forget(self, query: str, docs: List) -> List[str]:
+        """
+        Oublie, parmi les résultats d'une recherche, ceux qui correspondent vraiment à la requête :
+        tous ses mots présents (BM25) ou similarité >= forget_threshold. Renvoie les textes oubliés.
+        """
+        if not docs:
+            return []
+        qvec = self.embeddings.embed_query(query)
+        vecs = self.embeddings.embed_documents([d.page_content for d in docs])
+        keys, texts = [], []
+        for d, v in zip(docs, vecs):
+            key = self._doc_key(d)
+            if self.lexical.coverage(query, key) >= 1.0 or _cosine(qvec, v) >= self.forget_threshold:
+                keys.append(key)
+                texts.append(d.page_content)
+        if keys:
+            self.delete(keys)
+            self.stats["forgotten"] += len(keys)
+        return texts
+
+    # --- maintenance ---
+    def maintain(self):
+        """Accès en attente -> store, éviction, puis compaction (store NumPy + index BM25)."""
+        with span("memory.maintain"):
+            self.evict()
+            if hasattr(self.store, "compact"):
+                self.store.compact()
+            self.lexical.compact()
+            self.stats["maintenance_runs"] += 1
+
+    def start(self, interval_s: float = MEMO_MAINTENANCE_S):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.maintain()
+                except Exception as e:  # la maintenance ne doit jamais arrêter l'application
+                    print(f"[mémoire] maintenance en échec : {e}", flush=True)
+
+        self._thread = threading.Thread(target=loop, name="memo-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête la tâche de fond et écrit les accès en attente."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush_access()
@@ -0,0 +1,297 @@
+# numpy_store.py — Index vectoriel en process (NumPy) : alternative légère à Chroma
+# Stockage sur disque (dans le même dossier que Chroma) :
+#   <collection>.npy          matrice float32 (n, dim) de vecteurs normalisés, ouverte en mmap
+#   <collection>.meta.jsonl   une ligne par ajout/mise à jour : id, texte, métadonnées, norme
+#                             (suppression : {"id": ..., "deleted": true} ; compact() réécrit les deux fichiers)
+#   <collection>.info.json    métadonnées de la collection (modèle d'embedding, dimension)
+# Recherche exacte top-k en cosinus : un produit matrice-vecteur + argpartition.
+# Démarrage quasi instantané : la matrice n'est pas lue, seulement mappée.
+#
+# Import / export depuis la collection Chroma existante (vecteurs copiés, pas de ré-embedding) :
+#   python numpy_store.py import   # Chroma -> NumPy
+#   python numpy_store.py export   # NumPy  -> Chroma
+
+import argparse
+import io
+import json
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+def _append_rows(path: str, rows: np.ndarray):
+    """Ajoute des lignes à un .npy existant : réécrit l'en-tête en place si possible."""
+    if not os.path.exists(path):
+        np.save(path, rows)
+        return
+    with open(path, "r+b") as f:
+        fmt = np.lib.format
+        v1 = fmt.read_magic(f) == (1, 0)
+        shape, fortran, dtype = (fmt.read_array_header_1_0 if v1 else fmt.read_array_header_2_0)(f)
+        data_offset = f.tell()
+        header = io.BytesIO()
+        (fmt.write_array_header_1_0 if v1 else fmt.write_array_header_2_0)(header, {
+            "descr": fmt.dtype_to_descr(dtype),
+            "fortran_order": fortran,
+            "shape": (shape[0] + rows.shape[0], shape[1]),
+        })
+        if header.tell() == data_offset:
+            # en-tête de même taille (numpy réserve de la place pour grandir) : ajout en fin
+            f.seek(0)
+            f.write(header.getvalue())
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+            return
+    # cas rare : l'en-tête ne tient plus -> réécriture complète
+    np.save(path, np.vstack([np.load(path), rows]))
+
+
+class NumpyVectorStore:
+    def __init__(self, embedding_function: Embeddings, persist_directory: str,
+                 collection_name: str = "memo"):
+        self.embeddings = embedding_function
+        self.dir = persist_directory
+        self.name = collection_name
+        self.matrix_path = os.path.join(persist_directory, f"{collection_name}.npy")
+        self.meta_path = os.path.join(persist_directory, f"{collection_name}.meta.jsonl")
+        self.info_path = os.path.join(persist_directory, f"{collection_name}.info.json")
+        self.info: Dict = {}
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: List[Dict] = []          # ligne -> {"id", "text", "metadata", "norm"}
+        self._index: Dict[str, int] = {}     # id -> ligne
+        self._torn_meta = False              # dernière ligne des métadonnées tronquée (arrêt brutal)
+        os.makedirs(persist_directory, exist_ok=True)
+        self._load()
+
+    # --- chargement ---
+    def _load(self):
+        if os.path.exists(self.info_path):
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                self.info = json.load(f)
+        if os.path.exists(self.matrix_path):
+            self._matrix = np.load(self.matrix_path, mmap_mode="r")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                line = ""
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # ligne tronquée par un arrêt brutal pendant un ajout
+                    self._apply_meta(rec)
+                self._torn_meta = bool(line) and not line.endswith("\n")
+
+    def _apply_meta(self, rec: Dict):
+        if rec.get("deleted"):
+            row = self._index.pop(rec["id"], None)
+            if row is not None:
+                self._rows[row] = {}
+            return
+        row = rec["row"]
+        while len(self._rows) <= row:
+            self._rows.append({})
+        self._rows[row] = rec
+        self._index[rec["id"]] = row
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def set_info(self, info: Dict):
+        """Remplace les métadonnées de la collection (écriture atomique)."""
+        with self._lock:
+            tmp = self.info_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(info, f, ensure_ascii=False)
+            os.replace(tmp, self.info_path)
+            self.info = dict(info)
+
+    # --- écriture ---
+    def add_vectors(self, vectors: List[List[float]], texts: List[str],
+                    metadatas: Optional[List[Dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vecs = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1)
+        vecs = vecs / np.where(norms == 0, 1.0, norms)[:, None]
+        with self._lock:
+            fresh_rows, updates, records = [], [], []
+            # les lignes de la matrice sans métadonnées (écriture interrompue) restent mortes
+            next_row = max(len(self._rows), 0 if self._matrix is None else self._matrix.shape[0])
+            for i, doc_id in enumerate(ids):
+                row = self._index.get(doc_id)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    fresh_rows.append(vecs[i])
+                else:
+                    updates.append((row, vecs[i]))
+                records.append({"row": row, "id": doc_id, "text": texts[i],
+                                "metadata": metadatas[i] or {}, "norm": float(norms[i])})
+            if updates:
+                # mise à jour d'un id existant : on réécrit sa ligne en place
+                mm = np.load(self.matrix_path, mmap_mode="r+")
+                for row, v in updates:
+                    mm[row] = v
+                mm.flush()
+                del mm
+            if fresh_rows:
+                _append_rows(self.matrix_path, np.vstack(fresh_rows))
+            self._write_meta(records)
+            self._matrix = np.load(self.matrix_path, mmap_mode="r")
+        return ids
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self.embeddings.embed_documents(texts), texts, metadatas, ids)
+
+    def _write_meta(self, records: List[Dict]):
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            if self._torn_meta:  # la ligne tronquée reste seule, l'ajout commence une nouvelle ligne
+                f.write("\n")
+                self._torn_meta = False
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                self._apply_meta(rec)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Remplace les métadonnées (le vecteur et le texte ne changent pas)."""
+        with self._lock:
+            self._write_meta([{**self._rows[self._index[i]], "metadata": m}
+                              for i, m in zip(ids, metadatas) if i in self._index])
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs):
+        """Supprime des ids : la ligne de la matrice reste (morte) jusqu'au prochain compact()."""
+        with self._lock:
+            self._write_meta([{"id": i, "deleted": True} for i in ids or [] if i in self._index])
+
+    def dead_rows(self) -> int:
+        return (0 if self._matrix is None else self._matrix.shape[0]) - len(self._index)
+
+    def compact(self):
+        """Réécrit matrice + métadonnées avec les seules lignes vivantes."""
+        with self._lock:
+            if not self.dead_rows():
+                return
+            rows = sorted(self._index.values())
+            records = [{**self._rows[r], "row": new} for new, r in enumerate(rows)]
+            matrix = np.asarray(self._matrix[rows], dtype=np.float32)  # (n_vivantes, dim)
+            tmp_matrix, tmp_meta = self.matrix_path + ".tmp.npy", self.meta_path + ".tmp"
+            np.save(tmp_matrix, matrix)
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._matrix = None  # libère le mmap avant de remplacer le fichier
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_meta, self.meta_path)
+            self._torn_meta = False
+            self._rows, self._index = [], {}
+            for rec in records:
+                self._apply_meta(rec)
+            self._matrix = np.load(self.matrix_path, mmap_mode="r")
+
+    # --- lecture ---
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None,
+            limit: Optional[int] = None, offset: int = 0, **kwargs) -> Dict:
+        """Même forme de retour que Chroma.get : {"ids", "documents", "metadatas"}."""
+        with self._lock:
+            if ids is not None:
+                rows = [self._index[i] for i in ids if i in self._index]
+            else:
+                rows = sorted(self._index.values())
+            rows = rows[offset: offset + limit if limit is not None else None]
+            recs = [self._rows[r] for r in rows]
+            out = {"ids": [r["id"] for r in recs],
+                   "documents": [r["text"] for r in recs],
+                   "metadatas": [r["metadata"] for r in recs]}
+            if include and "embeddings" in include:
+                out["embeddings"] = [(self._matrix[r] * self._rows[r]["norm"]).tolist() for r in rows]
+            return out
+
+    def similarity_search_by_vector_with_score(self, vector: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        with self._lock:
+            if self._matrix is None or not self._index:
+                return []
+            q = np.asarray(vector, dtype=np.float32)
+            q /= (np.linalg.norm(q) or 1.0)
+            n_rows = self._matrix.shape[0]
+            scores = np.asarray(self._matrix @ q)
+            if len(self._index) < n_rows:
+                # lignes sans métadonnées (écriture interrompue) : exclues
+                live = np.zeros(n_rows, dtype=bool)
+                live[list(self._index.values())] = True
+                scores = np.where(live, scores, -np.inf)
+            k = min(k, len(self._index))
+            top = np.argpartition(-scores, k - 1)[:k] if k < n_rows else np.arange(n_rows)
+            top = top[np.argsort(-scores[top])][:k]
+            return [
+                (Document(page_content=self._rows[r]["text"], metadata=self._rows[r]["metadata"]), float(scores[r]))
+                for r in top
+            ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [d for d, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        """Score = similarité cosinus (plus grand = plus proche, contrairement à la distance Chroma)."""
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k)]
+
+
+# --------- Passerelles avec Chroma ----------
+def import_from_chroma(chroma_store, np_store: NumpyVectorStore, page_size: int = 1000) -> int:
+    """Copie la collection Chroma (vecteurs compris) dans l'index NumPy."""
+    copied, offset = 0, 0
+    while True:
+        page = chroma_store._collection.get(include=["embeddings", "documents", "metadatas"],
+                                            limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            return copied
+        np_store.add_vectors(page["embeddings"], page["documents"],
+                             [m or {} for m in page["metadatas"]], page["ids"])
+        copied += len(page["ids"])
+        offset += len(page["ids"])
+
+
+def export_to_chroma(np_store: NumpyVectorStore, chroma_store, page_size: int = 1000) -> int:
+    """Recopie l'index NumPy dans la collection Chroma (upsert, vecteurs dé-normalisés)."""
+    copied = 0
+    while True:
+        page = np_store.get(include=["embeddings"], limit=page_size, offset=copied)
+        if not page["ids"]:
+            return copied
+        chroma_store._collection.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                                        documents=page["documents"],
+                                        metadatas=[m or None for m in page["metadatas"]])
+        copied += len(page["ids"])
+
+
+if __name__ == "__main__":
+    from langchain_community.vectorstores import Chroma
+
+    parser = argparse.ArgumentParser(description="Import/export entre Chroma et l'index NumPy.")
+    parser.add_argument("direction", choices=["import", "export"],
+                        help="import : Chroma -> NumPy ; export : NumPy -> Chroma")
+    parser.add_argument("--dir", default="./memo_db", help="dossier de persistance (défaut ./memo_db)")
+    parser.add_argument("--collection", default="memo")
+    args = parser.parse_args()
+
+    chroma = Chroma(collection_name=args.collection, persist_directory=args.dir)
+    np_store = NumpyVectorStore(None, args.dir, args.collection)
+    if args.direction == "import":
+        n = import_from_chroma(chroma, np_store)
+    else:
+        n = export_to_chroma(np_store, chroma)
+    print(f"{n} souvenirs copiés ({args.direction}).")
@@ -0,0 +1,176 @@
+# session_store.py — Mémoire multi-utilisateurs : un process, plusieurs sessions durables
+# Chaque session (id libre : utilisateur, onglet Streamlit, ...) a son propre état
+# SummaryMemory + SlotMemory (un Agent du Labo 6 sans fichier memory.json).
+#   - SessionStore   : SQLite en mode WAL (lecteurs concurrents, un écrivain), une ligne par session
+#   - SessionManager : LRU des sessions « chaudes » en RAM, verrou par session,
+#                      éviction des sessions inactives (déjà sur disque : écriture à chaque tour)
+#
+# Variables d'environnement :
+#   SESSIONS_DB        fichier SQLite (défaut ./sessions.sqlite)
+#   SESSIONS_MAX_HOT   sessions gardées en RAM (défaut 64)
+#   SESSIONS_IDLE_S    inactivité avant éviction (défaut 900 s)
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+SESSIONS_DB = os.getenv("SESSIONS_DB", os.path.join(".", "sessions.sqlite"))
+SESSIONS_MAX_HOT = int(os.getenv("SESSIONS_MAX_HOT", "64"))
+SESSIONS_IDLE_S = float(os.getenv("SESSIONS_IDLE_S", "900"))
+
+
+class SessionStore:
+    """Persistance des sessions : une connexion SQLite par thread (Streamlit exécute chaque script dans son thread)."""
+    def __init__(self, path: str = SESSIONS_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, payload TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        db.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> Dict:
+        row = self._db().execute(
+            "SELECT payload FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save(self, session_id: str, payload: Dict):
+        db = self._db()
+        db.execute(
+            "INSERT INTO sessions (session_id, payload, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET payload = excluded.payload, updated = excluded.updated",
+            (session_id, json.dumps(payload, ensure_ascii=False, separators=(",", ":")), time.time()),
+        )
+        db.commit()
+
+    def delete(self, session_id: str):
+        db = self._db()
+        db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        db.commit()
+
+    def session_ids(self) -> List[str]:
+        return [r[0] for r in self._db().execute("SELECT session_id FROM sessions ORDER BY updated DESC")]
+
+
+class _Hot:
+    __slots__ = ("agent", "lock", "last_used", "users")
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.lock = threading.RLock()  # sérialise les tours d'une même session
+        self.last_used = time.monotonic()
+        self.users = 0                 # threads en train d'utiliser la session (pas d'éviction)
+
+
+class SessionManager:
+    """
+    Exemple :
+        sessions = SessionManager(lambda: Agent(memory_path=None, llm=shared_llm))
+        with sessions.session("alice") as agent:
+            agent.respond("Je m'appelle Alice.")
+    La session est écrite dans SQLite à la sortie du bloc (write-through), puis reste en RAM
+    jusqu'à ce qu'elle soit inactive depuis idle_s ou chassée par le LRU.
+    """
+    def __init__(self, factory: Callable[[], object], store: Optional[SessionStore] = None,
+                 max_hot: int = SESSIONS_MAX_HOT, idle_s: float = SESSIONS_IDLE_S):
+        self.factory = factory
+        self.store = store or SessionStore()
+        self.max_hot = max_hot
+        self.idle_s = idle_s
+        self._hot: "OrderedDict[str, _Hot]" = OrderedDict()
+        self._lock = threading.Lock()  # protège _hot (jamais tenu pendant un appel LLM ; écritures SQLite seulement)
+
+    def _acquire(self, session_id: str) -> _Hot:
+        with self._lock:
+            hot = self._hot.get(session_id)
+            if hot is None:
+                hot = _Hot(None)
+                self._hot[session_id] = hot
+            self._hot.move_to_end(session_id)
+            hot.users += 1
+        hot.lock.acquire()
+        if hot.agent is None:
+            # chargement depuis le disque, hors du verrou global
+            try:
+                agent = self.factory()
+                agent.restore(self.store.load(session_id))
+            except Exception:
+                hot.lock.release()
+                with self._lock:
+                    hot.users -= 1
+                raise
+            hot.agent = agent
+        return hot
+
+    def _release(self, session_id: str, hot: _Hot, save: bool):
+        try:
+            if save:
+                # write-through sans attendre un résumé en cours : les tours sont sur disque,
+                # le nouveau résumé le sera au tour suivant (ou à l'éviction)
+                self.store.save(session_id, hot.agent.snapshot(wait=False))
+        finally:
+            hot.last_used = time.monotonic()
+            hot.lock.release()
+            with self._lock:
+                hot.users -= 1
+            self.evict()
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[object]:
+        """Accès exclusif à l'agent de la session (chargé depuis SQLite si besoin)."""
+        hot = self._acquire(session_id)
+        ok = False
+        try:
+            yield hot.agent
+            ok = True
+        finally:
+            self._release(session_id, hot, save=ok)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """
+        Retire de la RAM les sessions inactives et celles au-delà de max_hot (LRU).
+        Une session dont le résumé tourne encore en arrière-plan est gardée jusqu'au prochain passage :
+        l'éviction (appelée à la fin de chaque tour) n'attend jamais un appel LLM.
+        """
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        with self._lock:
+            over = len(self._hot) - self.max_hot
+            for sid, hot in list(self._hot.items()):  # du moins récent au plus récent
+                idle = now - hot.last_used >= self.idle_s
+                busy = getattr(hot.agent, "busy", None)
+                if hot.users == 0 and (idle or over > 0) and not (busy and busy()):
+                    # dernier enregistrement (résumé terminé inclus) avant qu'un _acquire ne relise le disque
+                    if hot.agent is not None:
+                        self.store.save(sid, hot.agent.snapshot(wait=False))
+                    del self._hot[sid]
+                    evicted += 1
+                    over -= 1
+        return evicted
+
+    def drop(self, session_id: str):
+        """Efface la session (RAM + disque)."""
+        with self._lock:
+            self._hot.pop(session_id, None)
+        self.store.delete(session_id)
+
+    def hot_count(self) -> int:
+        return len(self._hot)
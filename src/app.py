@@ -1,6 +1,25 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
 import streamlit as st
-import subprocess
 
+from ollama_client import OLLAMA_KEEP_ALIVE, OllamaClient, OllamaError
+from transcript_store import TranscriptStore
+from warmup import OLLAMA_LLM, WARMUP_WAIT_S, wait_ready
+
+# modules de mémoire (lab6module2, session_store, ...) à la racine du dépôt
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lab6module2 import Agent  # noqa: E402
+from session_store import SessionManager  # noqa: E402
+from tracing import span, start as start_tracing  # noqa: E402
+
+
+start_tracing()  # endpoint Prometheus si AGENT_METRICS_PORT (une fois par process)
+
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "30"))  # messages récents affichés en bulles
+CHAT_PAGE = int(os.getenv("CHAT_PAGE", "30"))      # messages par page « plus anciens »
 
 st.set_page_config(page_title="Chat Ollama", page_icon="🤖")
 st.title("Assistant IA (Ollama) 🤖")
@@ -8,37 +27,114 @@ st.caption("Modèles locaux via Ollama — ex: mistral, gemma2:2b, llama3.1")
 
 # --- Sidebar : paramètres ---
 with st.sidebar:
-    model =  "gemma3"
-    st.markdown("le model c est gemma3")
+    model = OLLAMA_LLM  # le modèle préchargé par warmup.py
+    st.markdown(f"le model c est {model}")
     st.divider()
 
-# --- Mémoire de chat ---
+# --- Attente du warm-up (conteneur) : le premier message ne paie pas le chargement du modèle ---
+if not st.session_state.get("backend_ready"):
+    with st.spinner("Chargement du modèle…"):
+        status = wait_ready(WARMUP_WAIT_S)
+    if status is not None and "error" in status:
+        st.warning(f"Préchargement du modèle en échec : {status['error']}")
+    elif status is not None and not status.get("ready"):
+        st.warning("Le modèle est encore en cours de chargement : la première réponse sera plus lente.")
+    st.session_state.backend_ready = True
+
+@st.cache_resource
+def get_client() -> OllamaClient:
+    """Client HTTP partagé entre les reruns (connexions keep-alive réutilisées)."""
+    return OllamaClient()
+
+@st.cache_resource
+def get_sessions() -> SessionManager:
+    """Mémoires par session (résumé + slots), partagées par tous les utilisateurs du process."""
+    from langchain_community.chat_models import ChatOllama
+    from llm_cache import cached
+    llm = cached(ChatOllama(model=model, keep_alive=OLLAMA_KEEP_ALIVE))  # un seul modèle pour résumer toutes les sessions
+    return SessionManager(lambda: Agent(memory_path=None, llm=llm))
+
+@st.cache_resource
+def get_transcripts() -> TranscriptStore:
+    return TranscriptStore()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_page(sid: str, before: int) -> tuple:
+    """Page de messages antérieurs à `before`, déjà rendue en un seul bloc markdown (fichier append-only :
+    une page ne change jamais). Renvoie (markdown, position du plus ancien message)."""
+    msgs = get_transcripts().tail(sid, CHAT_PAGE, before=before)
+    if not msgs:
+        return "", 0
+    block = "\n\n".join(f"**{'Vous' if m['role'] == 'user' else 'Assistant'}** : {m['content']}" for m in msgs)
+    return block, msgs[0]["offset"]
+
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+def to_chat_turns(msgs: list) -> list:
+    """Messages LangChain -> tours structurés pour /api/chat."""
+    return [{"role": ROLES[m.type], "content": m.content} for m in msgs]
+
+# --- Session : ?sid=... dans l'URL pour retrouver sa mémoire ---
+if "sid" not in st.session_state:
+    st.session_state.sid = st.query_params.get("sid") or uuid.uuid4().hex
+    st.query_params["sid"] = st.session_state.sid
+
+# --- Historique affiché : fenêtre des derniers messages, relue depuis la fin du fichier de la session ---
 if "messages" not in st.session_state:
-    st.session_state.messages = []  # [{"role":"user/assistant", "content": "..."}]
+    # [{"role": "user/assistant", "content": "...", "offset": position dans le transcript}]
+    st.session_state.messages = get_transcripts().tail(st.session_state.sid, CHAT_WINDOW)
+    st.session_state.pages = []  # blocs « plus anciens » chargés à la demande (du plus récent au plus ancien)
+    if not st.session_state.messages:
+        # session d'avant les transcripts : tours récents gardés par la mémoire de l'agent
+        with get_sessions().session(st.session_state.sid) as agent:
+            st.session_state.messages = [
+                {"role": "assistant" if t["role"] == "ai" else "user", "content": t["content"], "offset": 0}
+                for t in agent.summary_mem.to_dict()["buffer"]
+            ]
+
+def remember(role: str, content: str):
+    """Ajoute un message au transcript et à la fenêtre (les plus anciens en sortent, relisibles par page)."""
+    offset = get_transcripts().append(st.session_state.sid, role, content)
+    st.session_state.messages.append({"role": role, "content": content, "offset": offset})
+    if len(st.session_state.messages) > CHAT_WINDOW:
+        del st.session_state.messages[:-CHAT_WINDOW]
+        st.session_state.pages = []  # sinon trou entre les pages chargées et la fenêtre ; rechargeables
+
+def oldest_offset() -> int:
+    """Position du plus ancien message affiché (0 = début de la conversation)."""
+    if st.session_state.pages:
+        return st.session_state.pages[-1][1]
+    return st.session_state.messages[0]["offset"] if st.session_state.messages else 0
 
-def call_ollama(model_name: str, prompt: str) -> str:
-    """Appelle Ollama en CLI et retourne la réponse texte ou un message d'erreur."""
+def stream_ollama(model_name: str, messages: list, stats: dict):
+    """
+    Streame la réponse d'Ollama (/api/chat) ou un message d'erreur. En cas d'échec, même après des
+    morceaux déjà affichés, stats["error"] est renseigné : le tour ne doit pas être enregistré.
+    """
     try:
-        r = subprocess.run(
-            ["ollama", "run", model_name, prompt],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="ignore",
-            timeout=120,
-        )
-        if r.returncode != 0:
-            # Erreurs renvoyées par Ollama
-            return f"⚠️ Erreur Ollama ({r.returncode}) : {(r.stderr or r.stdout).strip()}"
-        return r.stdout.strip() or "(réponse vide)"
-    except FileNotFoundError:
-        return "⚠️ Ollama introuvable. Installe-le et vérifie que la commande `ollama` est accessible."
-    except subprocess.TimeoutExpired:
-        return "⏳ Délai dépassé lors de l'appel à Ollama."
+        with span("llm.stream", model=model_name) as sp:
+            sp.set_prompt(messages)
+            parts = []
+            for piece in get_client().chat_stream(model_name, messages, stats=stats):
+                sp.first_token()
+                parts.append(piece)
+                yield piece
+            sp.set_output("".join(parts))
+            if "prompt_eval_count" in stats:
+                sp.set(prompt_eval_tokens=stats["prompt_eval_count"])
+    except OllamaError as e:
+        stats["error"] = str(e)
+        yield f"⚠️ {e}"
     except Exception as e:
-        return f"⚠️ Exception: {e}"
+        stats["error"] = f"Exception: {e}"
+        yield f"⚠️ Exception: {e}"
 
-# --- Afficher l'historique ---
+# --- Afficher l'historique : pages anciennes (un bloc en cache chacune) puis fenêtre récente ---
+if oldest_offset() > 0 and st.button("⬆️ Charger les messages plus anciens"):
+    st.session_state.pages.append(load_page(st.session_state.sid, oldest_offset()))
+for block, _ in reversed(st.session_state.pages):
+    with st.container(border=True):
+        st.markdown(block)
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
@@ -47,20 +143,34 @@ for msg in st.session_state.messages:
 user_msg = st.chat_input("Vous :")
 if user_msg:
     # Affiche + stocke le message utilisateur
-    st.session_state.messages.append({"role": "user", "content": user_msg})
+    remember("user", user_msg)
     with st.chat_message("user"):
         st.markdown(user_msg)
 
-    # Réponse du modèle
-    with st.chat_message("assistant"):
-        with st.spinner("L'agent réfléchit..."):
-            reply = call_ollama(model, user_msg)
-        st.markdown(reply)
+    # Réponse du modèle (tokens affichés au fil de l'eau).
+    # Le verrou de session sérialise les tours d'un même utilisateur (plusieurs onglets).
+    with get_sessions().session(st.session_state.sid) as agent:
+        direct = agent.route(user_msg)  # réponse immédiate si question sur un fait connu (slots écrits au commit)
+        stats = {}
+        with st.chat_message("assistant"):
+            if direct is not None:
+                reply = direct
+                st.markdown(reply)
+            else:
+                turns = to_chat_turns(agent.prepare(user_msg))  # résumé + slots + tours récents
+                reply = st.write_stream(stream_ollama(model, turns, stats)) or "(réponse vide)"
+                if "prompt_eval_count" in stats:
+                    # faible et stable d'un tour à l'autre = préfixe du prompt réutilisé par Ollama
+                    st.caption(f"tokens de prompt évalués : {stats['prompt_eval_count']}")
+        failed = "error" in stats  # réponse partielle + erreur : ni mémoire, ni journal, ni transcript
+        if not failed:
+            agent.commit(user_msg, reply)
 
     # Analyse de la réponse     
     # prompt="Analyse moi cette reponse de la question precedente et donne moi une note de 1 a 5 en pertinence, exactitude, clarté, cohérence, style/ton. Reponds au format JSON { 'pertinence':X, 'exactitude':X, 'clarte':X, 'coherence':X, 'style_ton':X } ou X est la note correspondante. Justifie chaque note en une phrase courte apres le JSON. Voici la reponse a analyser : " + reply
-    # reply = call_ollama(model, prompt )
+    # reply = get_client().chat(model, [{"role": "user", "content": prompt}])
     # st.write(reply)
 
-    # Stocke la réponse
-    st.session_state.messages.append({"role": "assistant", "content": reply})
+    # Stocke la réponse (une erreur reste affichée pour ce rerun seulement)
+    if not failed:
+        remember("assistant", reply)
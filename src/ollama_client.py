@@ -0,0 +1,127 @@
+# ollama_client.py — Client HTTP Ollama (keep-alive + streaming) pour l'app Streamlit
+# Remplace le `ollama run <model> <prompt>` lancé à chaque message :
+#   - une seule session HTTP réutilisée (pool de connexions keep-alive)
+#   - /api/chat en streaming : les tokens sont rendus dès leur arrivée
+#   - l'historique est envoyé sous forme de tours structurés (role/content)
+#   - keep_alive : le modèle (et son cache KV) reste chargé entre deux messages ; comme le début
+#     du prompt ne change pas d'un tour à l'autre, Ollama n'évalue que les nouveaux tokens
+
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+CONNECT_TIMEOUT = 5      # secondes pour établir la connexion
+READ_TIMEOUT = 120       # secondes max entre deux morceaux de réponse
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # durée de maintien du modèle en mémoire
+# compteurs du dernier morceau (done=true) recopiés dans `stats`
+STATS_KEYS = ("prompt_eval_count", "eval_count", "prompt_eval_duration", "eval_duration", "total_duration")
+
+
+class OllamaError(RuntimeError):
+    """Erreur renvoyée par le serveur Ollama (ou serveur injoignable)."""
+
+
+class OllamaClient:
+    def __init__(self, base_url: str = OLLAMA_HOST, pool_size: int = 4, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path: str, payload: Dict, stream: bool = False) -> requests.Response:
+        try:
+            r = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                stream=stream,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+        except requests.ConnectionError as e:
+            raise OllamaError(f"serveur Ollama injoignable ({self.base_url})") from e
+        if r.status_code != 200:
+            try:
+                body = r.json()
+            except ValueError:
+                body = None
+            # corps {"error": "..."} d'Ollama ; sinon (proxy, JSON inattendu) le texte brut
+            detail = body.get("error", r.text) if isinstance(body, dict) else r.text
+            detail = detail if isinstance(detail, str) else json.dumps(detail, ensure_ascii=False)
+            r.close()
+            raise OllamaError(f"Erreur Ollama ({r.status_code}) : {detail.strip()}")
+        return r
+
+    def chat_stream(self, model: str, messages: List[Dict[str, str]],
+                    options: Optional[Dict] = None, stats: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Génère les morceaux de texte de la réponse au fil de l'eau.
+        stats : dict rempli à la fin avec les compteurs d'Ollama ; prompt_eval_count = tokens du
+        prompt réellement évalués (hors préfixe déjà en cache).
+        """
+        payload = {"model": model, "messages": messages, "stream": True, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        with self._post("/api/chat", payload, stream=True) as r:
+            # Ollama envoie un objet JSON par ligne (NDJSON)
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if not isinstance(chunk, dict):
+                    raise OllamaError(f"Réponse Ollama inattendue : {line[:200]!r}")
+                if "error" in chunk:
+                    raise OllamaError(f"Erreur Ollama : {chunk['error']}")
+                piece = chunk.get("message", {}).get("content", "")
+                if piece:
+                    yield piece
+                if chunk.get("done"):
+                    if stats is not None:
+                        stats.update({k: chunk[k] for k in STATS_KEYS if k in chunk})
+                    break
+
+    def chat(self, model: str, messages: List[Dict[str, str]],
+             options: Optional[Dict] = None) -> str:
+        """Variante bloquante : concatène le flux complet."""
+        return "".join(self.chat_stream(model, messages, options))
+
+    # --- démarrage (voir warmup.py) ---
+    def ping(self, timeout: float = 2.0) -> bool:
+        """Le serveur répond-il ? (GET /, sans lever d'exception)"""
+        try:
+            return self.session.get(f"{self.base_url}/", timeout=timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def list_models(self) -> List[str]:
+        try:
+            r = self.session.get(f"{self.base_url}/api/tags", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except requests.ConnectionError as e:
+            raise OllamaError(f"serveur Ollama injoignable ({self.base_url})") from e
+        return [m["name"] for m in r.json().get("models", [])]
+
+    def pull(self, model: str):
+        """Télécharge un modèle (bloquant, sans progression)."""
+        with self._post("/api/pull", {"model": model, "stream": False}):
+            pass
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None) -> Dict:
+        """/api/generate non streamé ; charge le modèle et le garde `keep_alive`."""
+        payload = {"model": model, "prompt": prompt, "stream": False, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        with self._post("/api/generate", payload) as r:
+            return r.json()
+
+    def embed(self, model: str, text: str) -> List[float]:
+        """/api/embeddings (l'API utilisée par OllamaEmbeddings de LangChain)."""
+        payload = {"model": model, "prompt": text, "keep_alive": self.keep_alive}
+        with self._post("/api/embeddings", payload) as r:
+            return r.json()["embedding"]
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,104 @@
+# transcript_store.py — Historique d'affichage de l'app Streamlit, un fichier append-only par session
+# <TRANSCRIPTS_DIR>/<session>-<hash>.jsonl : une ligne {"role", "content", "ts"} par message.
+# Le fichier n'est jamais réécrit : on relit seulement la fin (lecture à rebours par blocs),
+# et une page plus ancienne se désigne par la position (octets) de son dernier message + 1.
+# Le coût d'un rechargement dépend donc de la taille de la page, pas de la longueur de la conversation.
+#
+# Variables d'environnement :
+#   TRANSCRIPTS_DIR   dossier des historiques (défaut ./transcripts)
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+TRANSCRIPTS_DIR = os.getenv("TRANSCRIPTS_DIR", os.path.join(".", "transcripts"))
+READ_BLOCK = 64 * 1024  # octets lus à chaque pas de la lecture à rebours
+
+_SAFE_ID = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class TranscriptStore:
+    def __init__(self, directory: str = TRANSCRIPTS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, session_id: str) -> str:
+        # l'id vient de l'URL (?sid=...) : pas de séparateur de chemin dans le nom de fichier ;
+        # le hash de l'id brut sépare les ids que le nettoyage confond ("a/b" et "a_b")
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:12]
+        path = os.path.join(self.directory, f"{_SAFE_ID.sub('_', session_id)[:112]}-{digest}.jsonl")
+        legacy = os.path.join(self.directory, _SAFE_ID.sub("_", session_id)[:128] + ".jsonl")
+        if not os.path.exists(path) and os.path.exists(legacy):
+            with self._lock:  # ancien nom sans hash : renommé au premier accès
+                if not os.path.exists(path) and os.path.exists(legacy):
+                    os.replace(legacy, path)
+        return path
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        """Ajoute un message ; renvoie sa position dans le fichier."""
+        line = json.dumps({"role": role, "content": content, "ts": round(time.time(), 3)}, ensure_ascii=False)
+        path = self.path(session_id)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "a+b") as f:
+                offset = f.tell()
+                if offset:
+                    f.seek(offset - 1)
+                    if f.read(1) != b"\n":  # dernière ligne tronquée (arrêt brutal) : on la termine
+                        f.write(b"\n")
+                        offset += 1
+                f.write(line.encode("utf-8") + b"\n")
+        return offset
+
+    def tail(self, session_id: str, n: int, before: Optional[int] = None) -> List[Dict]:
+        """
+        Les n derniers messages situés avant la position `before` (fin du fichier par défaut),
+        du plus ancien au plus récent, chacun avec sa position ("offset").
+        """
+        path = self.path(session_id)
+        if n <= 0 or not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END) if before is None else before
+            pos, data = end, b""
+            # remonter bloc par bloc jusqu'à avoir n messages lisibles (ou le début du fichier) :
+            # une ligne tronquée par un arrêt brutal ne compte pas
+            while True:
+                out = self._parse(data, pos)
+                if len(out) >= n or pos == 0:
+                    return out[-n:]
+                step = min(READ_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+
+    @staticmethod
+    def _parse(data: bytes, pos: int) -> List[Dict]:
+        """Messages des lignes complètes de `data` (lu à partir de la position `pos`)."""
+        lines = data.split(b"\n")
+        offsets, o = [], pos
+        for line in lines:
+            offsets.append(o)
+            o += len(line) + 1
+        # première ligne incomplète si on n'est pas remonté au début ; dernière vide (ou tronquée)
+        start = 0 if pos == 0 else 1
+        out: List[Dict] = []
+        for line, offset in zip(lines[start:], offsets[start:]):
+            if not line.strip():
+                continue
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue  # ligne tronquée par un arrêt brutal
+            out.append({"role": msg["role"], "content": msg["content"], "offset": offset})
+        return out
+
+    def delete(self, session_id: str):
+        path = self.path(session_id)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(path)
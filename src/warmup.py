@@ -0,0 +1,175 @@
+# warmup.py — Démarrage du conteneur : attendre Ollama, charger les modèles, signaler « prêt »
+# Remplace le `ollama serve & sleep 3 && ollama pull gemma3` du Dockerfile :
+#   1) interroge le serveur (GET /) jusqu'à ce qu'il réponde (WARMUP_TIMEOUT_S) ;
+#   2) télécharge les modèles absents (/api/pull) ;
+#   3) appel de génération (OLLAMA_LLM) et d'embedding (modèle de MemoryTry : OLLAMA_EMBED, sinon celui
+#      de la collection active memo_db/memo.active.json, sinon nomic-embed-text) : le premier paie le chargement
+#      du modèle (froid), le second mesure la latence une fois chargé (chaud). Les deux envoient
+#      keep_alive = OLLAMA_KEEP_ALIVE (durée négative, ex: -1m : modèle gardé jusqu'à l'arrêt du serveur) ;
+#   4) écrit l'état dans WARMUP_READY_FILE : {"ready": false} au lancement, puis {"ready": true,
+#      "models": {<modèle>: {"cold_ms", "warm_ms"}}, ...} ou {"ready": false, "error": ...}.
+# L'app attend ce fichier (wait_ready) ; sans fichier (lancement local, pas de warm-up) elle n'attend pas.
+# `python src/warmup.py --check` : code retour 0 si prêt (HEALTHCHECK Docker).
+# `python src/warmup.py --pending` : écrit seulement {"ready": false} ; lancé avant l'app (Dockerfile) pour
+# qu'elle ne lise jamais l'état d'un démarrage précédent.
+#
+#   python src/warmup.py                                  # warm-up puis fin
+#   OLLAMA_HOST=http://localhost:11500 python src/warmup.py   # contre stub_ollama.py
+#
+# Variables d'environnement :
+#   OLLAMA_HOST, OLLAMA_LLM (défaut gemma3), OLLAMA_EMBED (voir 3), OLLAMA_KEEP_ALIVE
+#   WARMUP_EMBED       on/off : charger aussi le modèle d'embedding (défaut on)
+#   WARMUP_PULL        on/off : télécharger les modèles absents (défaut on)
+#   WARMUP_TIMEOUT_S   attente max du serveur Ollama (défaut 120)
+#   WARMUP_READY_FILE  fichier d'état (défaut /tmp/agent_ready.json)
+#   WARMUP_WAIT_S      attente max de l'app avant de démarrer quand même (défaut 600)
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ollama_client import OLLAMA_HOST, OLLAMA_KEEP_ALIVE, OllamaClient, OllamaError
+
+OLLAMA_LLM = os.getenv("OLLAMA_LLM", "gemma3")
+WARMUP_EMBED = os.getenv("WARMUP_EMBED", "on").lower() not in ("0", "off", "false", "no")
+WARMUP_PULL = os.getenv("WARMUP_PULL", "on").lower() not in ("0", "off", "false", "no")
+WARMUP_TIMEOUT_S = float(os.getenv("WARMUP_TIMEOUT_S", "120"))
+WARMUP_READY_FILE = os.getenv("WARMUP_READY_FILE", "/tmp/agent_ready.json")
+WARMUP_WAIT_S = float(os.getenv("WARMUP_WAIT_S", "600"))
+POLL_S = 0.5
+
+
+# --------- Fichier d'état ----------
+def write_status(status: Dict, path: str = WARMUP_READY_FILE):
+    """Écriture atomique : l'app lit l'ancien état ou le nouveau, jamais un fichier partiel."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**status, "updated_at": round(time.time(), 3)}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_status(path: str = WARMUP_READY_FILE) -> Optional[Dict]:
+    """None = pas de warm-up lancé (ou fichier illisible)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def wait_ready(timeout: float = WARMUP_WAIT_S, path: str = WARMUP_READY_FILE) -> Optional[Dict]:
+    """
+    Attend la fin du warm-up. Renvoie l'état final, celui du moment si `timeout` est dépassé,
+    ou None sans fichier d'état.
+    """
+    deadline = time.monotonic() + timeout
+    status = read_status(path)
+    while status is not None and not status.get("ready") and "error" not in status:
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(POLL_S)
+        status = read_status(path)
+    return status
+
+
+# --------- Warm-up ----------
+def embed_model() -> str:
+    """Le modèle que MemoryTry chargera (même résolution, pointeur de collection compris)."""
+    # MemoryTry est à la racine du dépôt ; son import ne charge rien de lourd
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import MemoryTry
+    return MemoryTry.embed_model()
+
+
+def wait_for_server(client: OllamaClient, timeout: float = WARMUP_TIMEOUT_S) -> float:
+    """Millisecondes avant la première réponse du serveur ; OllamaError au-delà de `timeout`."""
+    t0 = time.perf_counter()
+    while not client.ping():
+        if time.perf_counter() - t0 > timeout:
+            raise OllamaError(f"serveur Ollama injoignable après {timeout:.0f} s ({client.base_url})")
+        time.sleep(POLL_S)
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _installed(model: str, names: List[str]) -> bool:
+    # /api/tags renvoie « gemma3:latest » pour « gemma3 »
+    return model in names or f"{model}:latest" in names
+
+
+def _timed_ms(call) -> float:
+    t0 = time.perf_counter()
+    call()
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def warm_model(client: OllamaClient, model: str, kind: str) -> Dict:
+    """Deux appels minimaux : le premier charge le modèle (froid), le second est servi chaud."""
+    if kind == "embed":
+        call = lambda: client.embed(model, "warm-up")  # noqa: E731
+    else:
+        call = lambda: client.generate(model, "Bonjour", options={"num_predict": 1})  # noqa: E731
+    return {"kind": kind, "cold_ms": _timed_ms(call), "warm_ms": _timed_ms(call)}
+
+
+def run(client: Optional[OllamaClient] = None, llm: str = OLLAMA_LLM,
+        embed: Optional[str] = None,
+        pull: bool = WARMUP_PULL, timeout: float = WARMUP_TIMEOUT_S,
+        path: str = WARMUP_READY_FILE) -> Dict:
+    """embed : modèle d'embedding à charger (None : celui de MemoryTry si WARMUP_EMBED, "" : aucun)."""
+    client = client or OllamaClient()
+    if embed is None:
+        embed = embed_model() if WARMUP_EMBED else ""
+    started = time.time()
+    write_status({"ready": False, "started_at": round(started, 3)}, path)
+    try:
+        status = {"host": client.base_url, "keep_alive": client.keep_alive,
+                  "server_ms": wait_for_server(client, timeout), "pulled": [], "models": {}}
+        wanted = [(llm, "generate")] + ([(embed, "embed")] if embed else [])
+        if pull:
+            names = client.list_models()
+            for model, _ in wanted:
+                if not _installed(model, names):
+                    client.pull(model)
+                    status["pulled"].append(model)
+        for model, kind in wanted:
+            status["models"][model] = warm_model(client, model, kind)
+    except Exception as e:  # l'app doit savoir que le warm-up a échoué, pas attendre indéfiniment
+        status = {"ready": False, "error": str(e), "started_at": round(started, 3)}
+        write_status(status, path)
+        return status
+    status.update({"ready": True, "started_at": round(started, 3),
+                   "total_ms": round((time.time() - started) * 1000, 1)})
+    write_status(status, path)
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attend Ollama, charge les modèles et signale « prêt ».")
+    parser.add_argument("--check", action="store_true", help="code retour 0 si le warm-up est terminé")
+    parser.add_argument("--pending", action="store_true", help="écrit seulement l'état « pas prêt » et sort")
+    parser.add_argument("--host", default=OLLAMA_HOST)
+    parser.add_argument("--timeout", type=float, default=WARMUP_TIMEOUT_S, help="attente max du serveur (s)")
+    args = parser.parse_args()
+
+    if args.check:
+        status = read_status()
+        sys.exit(0 if status and status.get("ready") else 1)
+    if args.pending:
+        write_status({"ready": False, "started_at": round(time.time(), 3)})
+        return
+
+    status = run(OllamaClient(args.host, keep_alive=OLLAMA_KEEP_ALIVE), timeout=args.timeout)
+    if not status["ready"]:
+        print(f"Warm-up en échec : {status['error']}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Ollama prêt en {status['server_ms']} ms (modèles téléchargés : {status['pulled'] or 'aucun'}).")
+    for model, m in status["models"].items():
+        print(f"  {model} ({m['kind']}) : froid {m['cold_ms']} ms, chaud {m['warm_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# stub_ollama.py — Faux serveur Ollama pour les tests de charge (aucun modèle, aucune GPU)
+# Répond comme Ollama sur /api/chat (NDJSON en streaming ou JSON), /api/generate (non streamé),
+# /api/tags, /api/pull et / : délai avant le premier token puis un token toutes les STUB_TOKEN_MS ms.
+# Le premier appel à chaque modèle paie en plus STUB_LOAD_MS (chargement), sauf keep_alive=0 qui le décharge.
+# Embeddings : /api/embeddings (un texte) et /api/embed (liste), vecteurs stables dérivés du texte ;
+# chaque requête coûte STUB_EMBED_MS (surcoût fixe) + STUB_EMBED_TEXT_MS par texte, une à la fois.
+#
+#   python stub_ollama.py --port 11500 --first-token-ms 200 --token-ms 20 --tokens 40
+#   OLLAMA_HOST=http://localhost:11500 python agent_server.py
+#
+# Variables d'environnement (valeurs par défaut des options) :
+#   STUB_FIRST_TOKEN_MS, STUB_TOKEN_MS, STUB_TOKENS, STUB_EMBED_MS, STUB_EMBED_TEXT_MS, STUB_LOAD_MS
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+STUB_FIRST_TOKEN_MS = float(os.getenv("STUB_FIRST_TOKEN_MS", "100"))
+STUB_TOKEN_MS = float(os.getenv("STUB_TOKEN_MS", "10"))
+STUB_TOKENS = int(os.getenv("STUB_TOKENS", "30"))
+STUB_EMBED_MS = float(os.getenv("STUB_EMBED_MS", "20"))
+STUB_EMBED_TEXT_MS = float(os.getenv("STUB_EMBED_TEXT_MS", "1"))
+STUB_LOAD_MS = float(os.getenv("STUB_LOAD_MS", "0"))
+EMBED_DIM = 64
+
+FILLER = ("d'accord", "je", "note", "cela", "et", "la", "mémoire", "reste", "cohérente", "pour", "la", "suite")
+
+
+class StubState:
+    def __init__(self, first_token_ms: float, token_ms: float, tokens: int,
+                 embed_ms: float = STUB_EMBED_MS, embed_text_ms: float = STUB_EMBED_TEXT_MS,
+                 load_ms: float = STUB_LOAD_MS):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.embed_ms = embed_ms
+        self.embed_text_ms = embed_text_ms
+        self.load_ms = load_ms
+        self.loaded = set()  # modèles « en mémoire »
+        self.requests = 0
+        self.embed_requests = 0
+        self.embed_texts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._embed_lock = threading.Lock()  # un seul calcul d'embedding à la fois, comme un modèle chargé
+
+    def enter(self) -> int:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.requests
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def load(self, payload: Dict):
+        """Simule le chargement du modèle au premier appel ; keep_alive=0 le décharge après l'appel."""
+        model = payload.get("model") or "stub"
+        with self._lock:
+            cold = model not in self.loaded
+            self.loaded.add(model)
+            if payload.get("keep_alive") in (0, "0"):
+                self.loaded.discard(model)
+        if cold:
+            time.sleep(self.load_ms / 1000)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.embed_requests += 1
+            self.embed_texts += len(texts)
+        with self._embed_lock:
+            time.sleep((self.embed_ms + self.embed_text_ms * len(texts)) / 1000)
+        return [_vector(t) for t in texts]
+
+
+def _vector(text: str) -> List[float]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest() * (EMBED_DIM // 32)
+    v = [b / 127.5 - 1.0 for b in digest[:EMBED_DIM]]
+    norm = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norm for x in v]
+
+
+def _words(n: int, tokens: int) -> List[str]:
+    return [f"réponse{n}"] + [" " + FILLER[i % len(FILLER)] for i in range(tokens - 1)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # en-têtes et corps écrits séparément : pas d'attente d'ACK retardé
+    state: StubState = None  # fixé par make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, obj: Dict):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/tags":
+            self._json(200, {"models": [{"name": "stub:latest", "model": "stub:latest"}]})
+        elif self.path == "/stats":
+            s = self.state
+            self._json(200, {"requests": s.requests, "in_flight": s.in_flight, "max_in_flight": s.max_in_flight,
+                             "embed_requests": s.embed_requests, "embed_texts": s.embed_texts,
+                             "loaded": sorted(s.loaded)})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/pull":
+            self._json(200, {"status": "success"})
+            return
+        if self.path in ("/api/embeddings", "/api/embed", "/api/chat", "/api/generate"):
+            self.state.load(payload)
+        if self.path == "/api/embeddings":
+            self._json(200, {"embedding": self.state.embed([payload.get("prompt", "")])[0]})
+            return
+        if self.path == "/api/embed":
+            texts = payload.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self._json(200, {"model": payload.get("model"), "embeddings": self.state.embed(texts)})
+            return
+        if self.path not in ("/api/chat", "/api/generate"):
+            self._json(404, {"error": f"unsupported path {self.path}"})
+            return
+        s = self.state
+        n = s.enter()
+        try:
+            prompt = payload.get("prompt", "") + "".join(m.get("content", "") for m in payload.get("messages", []))
+            words = _words(n, min(s.tokens, payload.get("options", {}).get("num_predict") or s.tokens))
+            stats = {"done": True, "prompt_eval_count": len(prompt) // 4, "eval_count": len(words)}
+            time.sleep(s.first_token_ms / 1000)
+            if self.path == "/api/generate":
+                time.sleep(s.token_ms * len(words) / 1000)
+                self._json(200, {"model": payload.get("model"), "done_reason": "stop",
+                                 "response": "".join(words), **stats})
+                return
+            if not payload.get("stream", True):
+                time.sleep(s.token_ms * len(words) / 1000)
+                self._json(200, {"model": payload.get("model"), "done_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words)}, **stats})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, w in enumerate(words):
+                if i:
+                    time.sleep(s.token_ms / 1000)
+                self._chunk({"model": payload.get("model"), "message": {"role": "assistant", "content": w},
+                             "done": False})
+            self._chunk({"model": payload.get("model"), "message": {"role": "assistant", "content": ""},
+                         "done_reason": "stop", **stats})
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            s.leave()
+
+    def _chunk(self, obj: Dict):
+        line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 128  # connexions en attente (tests de charge)
+
+
+def make_server(port: int, host: str = "127.0.0.1", first_token_ms: float = STUB_FIRST_TOKEN_MS,
+                token_ms: float = STUB_TOKEN_MS, tokens: int = STUB_TOKENS,
+                embed_ms: float = STUB_EMBED_MS, load_ms: float = STUB_LOAD_MS) -> ThreadingHTTPServer:
+    state = StubState(first_token_ms, token_ms, tokens, embed_ms, load_ms=load_ms)
+    handler = type("Handler", (StubHandler,), {"state": state})
+    server = StubServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Ollama (chat + embeddings) pour tests de charge.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--first-token-ms", type=float, default=STUB_FIRST_TOKEN_MS)
+    parser.add_argument("--token-ms", type=float, default=STUB_TOKEN_MS)
+    parser.add_argument("--tokens", type=int, default=STUB_TOKENS)
+    parser.add_argument("--embed-ms", type=float, default=STUB_EMBED_MS)
+    parser.add_argument("--load-ms", type=float, default=STUB_LOAD_MS, help="chargement simulé au 1er appel d'un modèle")
+    args = parser.parse_args()
+    server = make_server(args.port, args.host, args.first_token_ms, args.token_ms, args.tokens, args.embed_ms,
+                         args.load_ms)
+    print(f"Stub Ollama sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
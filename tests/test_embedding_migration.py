@@ -0,0 +1,86 @@
+# Migration d'embedding (store NumPy) : reprise après interruption, rattrapage des ajouts et des oublis.
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from embedding_migration import Migration, read_pointer, set_collection_info  # noqa: E402
+from fake_models import FakeEmbeddings  # noqa: E402
+from numpy_store import NumpyVectorStore  # noqa: E402
+
+IDS = [f"id{i:02d}" for i in range(20)]
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """Échoue à partir du n-ième appel (coupure pendant la migration)."""
+    def __init__(self, fail_at: int):
+        super().__init__()
+        self.fail_at = fail_at
+        self.batches = 0
+        self.texts_seen = []
+
+    def embed_documents(self, texts):
+        self.batches += 1
+        if self.batches >= self.fail_at:
+            raise ConnectionError("Ollama arrêté")
+        self.texts_seen += texts
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def persist_dir(tmp_path):
+    source = NumpyVectorStore(FakeEmbeddings(), str(tmp_path))
+    source.add_texts([f"souvenir {i}" for i in range(len(IDS))], ids=IDS)
+    set_collection_info(source, embedding_model="old-embed", dim=64)
+    return str(tmp_path)
+
+
+def _opener(persist_dir):
+    return lambda name, emb: NumpyVectorStore(emb or FakeEmbeddings(), persist_dir, collection_name=name)
+
+
+def test_resume_after_interruption(persist_dir):
+    flaky = FlakyEmbeddings(fail_at=4)
+    with pytest.raises(ConnectionError):
+        Migration(persist_dir, "new-embed", flaky, _opener(persist_dir), workers=1, batch_size=3).run()
+    migration = Migration(persist_dir, "new-embed", FakeEmbeddings(), _opener(persist_dir),
+                          workers=1, batch_size=3)
+    with open(migration.checkpoint_path, "r", encoding="utf-8") as f:
+        offset = json.load(f)["offset"]
+    assert 0 < offset < len(IDS)
+
+    second = FlakyEmbeddings(fail_at=10 ** 6)
+    migration.embeddings = second
+    stats = migration.run()
+
+    assert stats["resumed_from"] == offset
+    assert len(second.texts_seen) == len(IDS) - offset  # rien n'est ré-embeddé deux fois
+    target = _opener(persist_dir)(stats["target"], None)
+    assert sorted(target.get()["ids"]) == IDS
+    assert read_pointer(persist_dir)["collection"] == stats["target"]
+    assert not Path(migration.checkpoint_path).exists()
+
+
+def test_changes_during_migration_are_replayed(persist_dir):
+    migration = Migration(persist_dir, "new-embed", FakeEmbeddings(), _opener(persist_dir),
+                          workers=1, batch_size=3)
+    done = []
+
+    def progress(n):
+        if not done:  # un autre process oublie et ajoute des souvenirs pendant la copie
+            other = _opener(persist_dir)("memo", None)
+            other.delete(ids=["id01", "id19"])
+            other.add_texts(["souvenir ajouté"], ids=["new"])
+        done.append(n)
+
+    stats = migration.run(progress)
+
+    target = _opener(persist_dir)(stats["target"], None)
+    expected = sorted(set(IDS) - {"id01", "id19"} | {"new"})
+    assert sorted(target.get()["ids"]) == expected
+    # la source ouverte au départ ne voit pas l'autre process : les deux ont été copiés, puis retirés
+    assert stats["removed"] == 2
@@ -0,0 +1,64 @@
+# Extracteur de faits : ce qui doit remplir / vider les slots, et ce qui ne doit pas.
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from fact_extractor import EXTRACTOR  # noqa: E402
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Je m'appelle Alice.", [("set", "name", "Alice")]),
+    ("Mon prénom est Marc", [("set", "name", "Marc")]),
+    ("Moi c'est Alice.", [("set", "name", "Alice")]),
+    ("Moi, c'est Alice, et toi ?", [("set", "name", "Alice")]),
+    ("Je m'appelle Alice, et toi ?", [("set", "name", "Alice")]),
+    ("J'habite à Saint-Étienne", [("set", "city", "Saint-Étienne")]),
+    ("J'habite à lyon et j'aime le jazz.", [("set", "city", "Lyon"), ("add", "likes", "le jazz")]),
+    ("J'ai 25 ans", [("set", "age", "25")]),
+    ("Je n'aime plus le café.", [("remove", "likes", "le café")]),
+    ("J'aime pas les épinards", [("remove", "likes", "les épinards")]),
+    ("Oublie ma ville", [("forget", "city", "")]),
+])
+def test_extracts(text, expected):
+    assert EXTRACTOR.extract(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Pour moi c'est important de bien dormir.",
+    "Pour moi c'est Paris qui compte le plus.",
+    "Est-ce que j'aime le chocolat ?",
+    "Est-ce que j'habite à Lyon",
+    "Qu'est-ce que j'aime, à ton avis ?",
+    "Tu crois que je n'aime plus le café ?",
+    "Comment je m'appelle déjà ?",
+    "J'habite à côté de la gare.",
+    "J'oublie toujours mes clés.",
+    "J'oublie ça tout le temps.",
+    "N'oublie pas mon rendez-vous.",
+    "Bon, n'oublie pas de m'appeler.",
+])
+def test_ignores(text):
+    assert EXTRACTOR.extract(text) == []
+
+
+@pytest.mark.parametrize("text", [
+    "Oublie ce que je viens de dire.",
+    "Oublie.",
+    "oublie tout",
+    "Je suis à Paris, oublie ça",
+    "Je suis à Paris. Oublie ça !",
+    "Tu peux tout effacer ; oublie.",
+    "S'il te plaît oublie cela",
+    "Bon, oublie tout ce que je t'ai dit.",
+])
+def test_forget_all(text):
+    assert ("forget_all", "", "") in EXTRACTOR.extract(text)
+
+
+def test_forget_all_clears_slots_set_earlier():
+    turns = ["Je m'appelle Alice.", "J'habite à Paris, oublie ça", "J'aime le jazz."]
+    assert EXTRACTOR.backfill(turns) == {"likes": "le jazz"}
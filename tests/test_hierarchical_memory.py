@@ -0,0 +1,50 @@
+# Mémoire hiérarchique : l'archive des tours reste cohérente après « oublie tout » et rejeu du journal.
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from fake_models import FakeChatModel  # noqa: E402
+from hierarchical_memory import HierarchicalSummaryMemory  # noqa: E402
+from lab6module2 import Journal  # noqa: E402
+
+
+def _memory(tmp_path, journal=None):
+    mem = HierarchicalSummaryMemory(FakeChatModel(), context_budget=1, chunk_turns=2,
+                                    archive_path=str(tmp_path / "memory.json.archive"))
+    if journal is not None:
+        for rec in journal.replay():
+            mem.apply_record(rec)
+        mem.listener = journal.append
+    return mem
+
+
+def _talk(mem, prefix, n):
+    for i in range(n):
+        mem.add_user(f"{prefix} question {i}")
+        mem.add_ai(f"{prefix} réponse {i}")
+        mem.maybe_summarize()
+
+
+def _archived(mem):
+    return [t["content"] for t in mem.archive.turns(0, 10 ** 6)]
+
+
+def test_replay_after_clear_rebuilds_archive_without_forgotten_turns(tmp_path):
+    journal = Journal(str(tmp_path / "memory.json.journal"), fsync="never")
+    mem = _memory(tmp_path, journal)
+    _talk(mem, "avant", 4)
+    assert any("avant" in t for t in _archived(mem))
+    mem.clear()  # « oublie tout »
+    _talk(mem, "après", 2)
+    live = _archived(mem)
+    assert live and all(t.startswith("après") for t in live)
+    journal.close()
+
+    # redémarrage sans snapshot : tout le journal est rejoué (chunks d'avant, clear, chunks d'après)
+    restored = _memory(tmp_path, Journal(journal.path))
+    assert _archived(restored) == live
+    assert restored.to_dict() == mem.to_dict()
+    for t in restored.relevant_turns("avant question réponse"):
+        assert not t["content"].startswith("avant")
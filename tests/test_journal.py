@@ -0,0 +1,82 @@
+# Journal du labo 6 : relecture après une ligne tronquée (crash) et après compaction.
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from fake_models import FakeChatModel  # noqa: E402
+from lab6module2 import Agent, Journal  # noqa: E402
+
+
+@pytest.fixture
+def memory_path(tmp_path):
+    return str(tmp_path / "memory.json")
+
+
+def _agent(memory_path):
+    return Agent(memory_path=memory_path, llm=FakeChatModel())
+
+
+def test_replay_skips_torn_line_and_keeps_later_records(tmp_path):
+    journal = Journal(str(tmp_path / "j.journal"), fsync="never")
+    journal.append({"op": "slot", "k": "name", "v": "Alice"})
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"seq":2,"op":"slot","k":"ci')  # crash au milieu d'une écriture
+
+    reopened = Journal(journal.path, fsync="never")
+    assert [r["v"] for r in reopened.replay()] == ["Alice"]
+    reopened.append({"op": "slot", "k": "city", "v": "Lyon"})
+    reopened.close()
+
+    # l'enregistrement écrit après le redémarrage est sur sa propre ligne : il n'est pas perdu
+    assert [r["v"] for r in Journal(journal.path).replay()] == ["Alice", "Lyon"]
+
+
+def test_agent_recovers_slots_after_torn_journal(memory_path):
+    agent = _agent(memory_path)
+    agent.respond("Je m'appelle Alice.")
+    agent.summary_mem.flush()
+    agent.journal.close()
+    with open(memory_path + ".journal", "a", encoding="utf-8") as f:
+        f.write('{"seq":99,"op":"sl')
+
+    agent = _agent(memory_path)
+    agent.respond("J'habite à Lyon.")
+    agent.summary_mem.flush()
+    agent.journal.close()
+
+    restored = _agent(memory_path)
+    assert restored.slots.to_dict() == {"name": "Alice", "city": "Lyon"}
+
+
+def test_truncate_keeps_only_records_after_snapshot(tmp_path):
+    journal = Journal(str(tmp_path / "j.journal"), fsync="never")
+    for v in ("a", "b", "c"):
+        journal.append({"op": "slot", "k": "x", "v": v})
+    journal.truncate(2)
+
+    assert not Path(journal.path + ".tmp").exists()
+    assert [r["seq"] for r in Journal(journal.path).replay()] == [3]
+    journal.append({"op": "slot", "k": "x", "v": "d"})
+    journal.close()
+    assert [r["v"] for r in Journal(journal.path).replay(after_seq=2)] == ["c", "d"]
+
+
+def test_agent_restores_snapshot_plus_journal_after_save(memory_path):
+    agent = _agent(memory_path)
+    agent.respond("Je m'appelle Alice.")
+    payload = agent.save()
+    agent.respond("J'habite à Lyon.")
+    agent.summary_mem.flush()
+    agent.journal.close()
+
+    with open(memory_path, "r", encoding="utf-8") as f:
+        assert json.load(f)["journal_seq"] == payload["journal_seq"]
+    with open(memory_path + ".journal", "r", encoding="utf-8") as f:
+        assert all(json.loads(line)["seq"] > payload["journal_seq"] for line in f)
+    assert _agent(memory_path).slots.to_dict() == {"name": "Alice", "city": "Lyon"}
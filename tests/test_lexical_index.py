@@ -0,0 +1,33 @@
+# Index BM25 : recherche, suppression et remise à zéro persistées dans le journal.
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from lexical_index import LexicalIndex  # noqa: E402
+
+
+def test_search_and_remove_survive_reload(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(["a", "b"], ["André aime les agents d'IA", "Marie habite à Lyon"])
+    index.remove(["b"])
+
+    reloaded = LexicalIndex(str(tmp_path))
+    assert [doc_id for doc_id, _ in reloaded.search("Qu'aime André ?")] == ["a"]
+    assert reloaded.search("Lyon") == []
+    assert reloaded.coverage("Qu'aime André ?", "a") == 1.0
+
+
+def test_clear_resets_size_and_log(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(["a", "b"], ["André aime les agents d'IA", "Marie habite à Lyon"])
+    index.clear()
+    assert len(index) == 0
+    index.add(["c"], ["Paul joue du piano"])
+
+    reloaded = LexicalIndex(str(tmp_path))
+    assert len(reloaded) == 1
+    assert reloaded.search("André") == []
+    with open(reloaded.path, "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
@@ -0,0 +1,44 @@
+# MemoryLifecycle : accès comptés aussi pour les souvenirs d'avant les ids hachés (uuid).
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from fake_models import FakeEmbeddings  # noqa: E402
+from lexical_index import LexicalIndex  # noqa: E402
+from memory_lifecycle import MemoryLifecycle, new_metadata  # noqa: E402
+from MemoryTry import fact_hash  # noqa: E402
+from numpy_store import NumpyVectorStore  # noqa: E402
+
+
+def _lifecycle(tmp_path, max_facts=10):
+    emb = FakeEmbeddings()
+    store = NumpyVectorStore(emb, str(tmp_path))
+    return MemoryLifecycle(store, LexicalIndex(str(tmp_path)), emb, key=fact_hash, max_facts=max_facts)
+
+
+def test_flush_access_counts_legacy_uuid_memories(tmp_path):
+    life = _lifecycle(tmp_path)
+    legacy = "Marie habite à Lyon"
+    life.store.add_texts([legacy], metadatas=[{"type": "memory"}], ids=["0b6f1c9e-legacy-uuid"])
+    life.touch([fact_hash(legacy)])
+    life.touch([fact_hash(legacy)])
+
+    assert life.flush_access() == 1
+    meta = life.store.get(ids=["0b6f1c9e-legacy-uuid"])["metadatas"][0]
+    assert meta["access_count"] == 2
+
+
+def test_touched_legacy_memory_outlives_unused_one(tmp_path):
+    life = _lifecycle(tmp_path, max_facts=1)
+    legacy, fresh = "Marie habite à Lyon", "Paul joue du piano"
+    life.store.add_texts([legacy], metadatas=[{"type": "memory", "created_at": 0.0}], ids=["legacy-uuid"])
+    h = fact_hash(fresh)
+    life.store.add_texts([fresh], metadatas=[{**new_metadata(h, now=0.0), "access_count": 1}], ids=[h])
+    life.lexical.add(["legacy-uuid", h], [legacy, fresh])
+    for _ in range(3):
+        life.touch([fact_hash(legacy)], now=0.0)
+
+    assert life.evict(now=0.0) == 1
+    assert life.store.get()["ids"] == ["legacy-uuid"]
@@ -0,0 +1,71 @@
+# Client Ollama contre le faux serveur (stub_ollama.py) : aucun modèle ni réseau externe.
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "src")]
+
+import stub_ollama  # noqa: E402
+from ollama_client import OllamaClient, OllamaError  # noqa: E402
+
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+@pytest.fixture
+def stub():
+    server = stub_ollama.make_server(0, first_token_ms=0, token_ms=0, tokens=5)
+    yield _serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_stream_yields_tokens_and_stats(stub):
+    client = OllamaClient(stub)
+    stats = {}
+    pieces = list(client.chat_stream("gemma3", [{"role": "user", "content": "Bonjour"}], stats=stats))
+    assert len(pieces) == 5
+    assert pieces[0].startswith("réponse")
+    assert stats["eval_count"] == 5
+    assert "prompt_eval_count" in stats
+    assert client.chat("gemma3", [{"role": "user", "content": "Encore"}]) != ""
+
+
+def test_error_body_dict(stub):
+    client = OllamaClient(stub)
+    with pytest.raises(OllamaError, match="unsupported path"):
+        client._post("/api/unknown", {})
+
+
+def test_error_body_not_a_dict():
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.dumps(["boom"]).encode()
+            self.send_response(500)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    try:
+        with pytest.raises(OllamaError, match=r"\(500\).*boom"):
+            list(OllamaClient(_serve(server)).chat_stream("gemma3", []))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unreachable_server():
+    with pytest.raises(OllamaError, match="injoignable"):
+        OllamaClient("http://127.0.0.1:9").chat("gemma3", [])
@@ -0,0 +1,74 @@
+# SessionManager : éviction LRU / inactivité, jamais d'une session en cours d'utilisation ou de résumé.
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT)]
+
+from fake_models import FakeChatModel  # noqa: E402
+from lab6module2 import Agent  # noqa: E402
+from session_store import SessionManager, SessionStore  # noqa: E402
+
+
+class BusyAgent:
+    """Agent minimal dont le « résumé en arrière-plan » se pilote à la main."""
+    def __init__(self):
+        self.state = {}
+        self.summarizing = False
+
+    def busy(self) -> bool:
+        return self.summarizing
+
+    def snapshot(self, wait: bool = True):
+        return dict(self.state)
+
+    def restore(self, data):
+        self.state = dict(data)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite"))
+
+
+def test_busy_session_is_kept_until_its_summary_ends(store):
+    sessions = SessionManager(BusyAgent, store=store, max_hot=1, idle_s=60)
+    with sessions.session("alice") as agent:
+        agent.summarizing = True
+        agent.state["turns"] = 1
+    with sessions.session("bob"):
+        pass
+    # alice résume encore : le LRU chasse bob à sa place
+    assert list(sessions._hot) == ["alice"]
+    assert sessions.evict(now=time.monotonic() + 120) == 0  # inactive mais toujours occupée
+
+    agent.state["summary"] = "fini"   # le résumé se termine après la sauvegarde du tour
+    agent.summarizing = False
+    assert sessions.evict(now=time.monotonic() + 120) == 1
+    assert sessions.hot_count() == 0
+    # l'état sauvé à l'éviction contient le résumé terminé
+    assert store.load("alice") == {"turns": 1, "summary": "fini"}
+
+
+def test_session_in_use_is_never_evicted(store):
+    sessions = SessionManager(BusyAgent, store=store, max_hot=1, idle_s=0)
+    with sessions.session("alice"):
+        assert sessions.evict() == 0
+        assert sessions.hot_count() == 1
+    assert sessions.hot_count() == 0  # inactive (idle_s=0) : évincée à la sortie du tour
+
+
+def test_evicted_session_reloads_its_memory(store):
+    llm = FakeChatModel()
+    sessions = SessionManager(lambda: Agent(memory_path=None, llm=llm), store=store, max_hot=1)
+    with sessions.session("alice") as agent:
+        agent.respond("Je m'appelle Alice.")
+    with sessions.session("bob") as agent:
+        agent.respond("Je m'appelle Bob.")
+    assert sessions.hot_count() == 1
+
+    with sessions.session("alice") as agent:
+        assert agent.slots.get("name") == "Alice"
@@ -0,0 +1,23 @@
+# token_budget.py — Estimation rapide (locale) du nombre de tokens
+# Pas de tokenizer du modèle : on approxime à partir des mots et de la ponctuation.
+# Un mot ≈ 1 token par tranche de 4 caractères, chaque signe de ponctuation ≈ 1 token.
+# Suffisant pour décider quand résumer ou couper un prompt, en quelques microsecondes.
+
+import re
+from typing import Iterable
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Surcoût du gabarit de chat par message (balises de rôle, séparateurs)
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return sum((len(p) + 3) // 4 for p in _PIECES.findall(text))
+
+
+def estimate_messages_tokens(contents: Iterable[str]) -> int:
+    """Estimation pour une liste de contenus de messages (surcoût de rôle inclus)."""
+    return sum(estimate_tokens(c) + MESSAGE_OVERHEAD for c in contents)
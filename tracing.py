@@ -0,0 +1,218 @@
+# tracing.py — Instrumentation légère des étapes chaudes (LLM, résumé, recherche, persistance)
+#   with span("llm.invoke", model="gemma3") as sp:
+#       sp.set_prompt(messages)       # caractères + tokens estimés en entrée
+#       ...
+#       sp.first_token()              # time-to-first-token (streaming)
+#       sp.set_output(text)           # tokens estimés en sortie
+#       sp.set(k=3, hits=2)           # attributs libres (numériques -> agrégés en métriques)
+#
+# Désactivé par défaut : span() renvoie un objet vide partagé, coût ≈ un appel de fonction.
+# Activation par variables d'environnement :
+#   AGENT_TRACE=traces.jsonl      une ligne JSON par span
+#   AGENT_METRICS_PORT=9464       endpoint texte Prometheus sur http://0.0.0.0:9464/metrics
+# L'import active seulement les spans ; le port n'est ouvert que par tracing.start(), appelé par
+# les points d'entrée (app, serveur, CLI) : importer un module instrumenté n'ouvre jamais de socket.
+# Par code : tracing.enable(path="traces.jsonl", metrics_port=9464)
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from token_budget import estimate_tokens
+
+AGENT_TRACE = os.getenv("AGENT_TRACE") or None
+AGENT_METRICS_PORT = int(os.getenv("AGENT_METRICS_PORT", "0")) or None
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = False
+_jsonl = None
+_lock = threading.Lock()
+# span -> {"count", "sum", "buckets": [...], "errors", "attrs": {attr: somme}}
+_metrics: Dict[str, Dict] = {}
+_server: Optional[ThreadingHTTPServer] = None
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def set_prompt(self, messages):
+        pass
+
+    def set_output(self, text):
+        pass
+
+    def first_token(self):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _text_of(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(m["content"] if isinstance(m, dict) else str(m.content) for m in messages)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "t0", "_ttft")
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self._ttft: Optional[float] = None
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def set_prompt(self, messages):
+        text = _text_of(messages)
+        self.attrs["prompt_chars"] = len(text)
+        self.attrs["tokens_in"] = estimate_tokens(text)
+
+    def set_output(self, text: str):
+        self.attrs["output_chars"] = len(text)
+        self.attrs["tokens_out"] = estimate_tokens(text)
+
+    def first_token(self):
+        if self._ttft is None:
+            self._ttft = time.perf_counter() - self.t0
+            self.attrs["ttft_ms"] = round(self._ttft * 1000, 3)
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.t0
+        if exc_type is GeneratorExit:
+            self.attrs["abandoned"] = 1  # flux arrêté par son consommateur : pas une erreur
+        elif exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _record(self.name, seconds, self.attrs)
+        return False
+
+
+def span(name: str, **attrs):
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def _record(name: str, seconds: float, attrs: Dict):
+    with _lock:
+        m = _metrics.get(name)
+        if m is None:
+            m = _metrics[name] = {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS), "errors": 0, "attrs": {}}
+        m["count"] += 1
+        m["sum"] += seconds
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                m["buckets"][i] += 1
+        m["errors"] += "error" in attrs
+        for k, v in attrs.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                m["attrs"][k] = m["attrs"].get(k, 0) + v
+        if _jsonl is not None:
+            rec = {"ts": round(time.time(), 6), "span": name, "ms": round(seconds * 1000, 3),
+                   "thread": threading.current_thread().name, **attrs}
+            _jsonl.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            _jsonl.flush()
+
+
+# --------- Export ----------
+def prometheus_text() -> str:
+    lines: List[str] = [
+        "# HELP agent_span_duration_seconds Durée des étapes instrumentées.",
+        "# TYPE agent_span_duration_seconds histogram",
+    ]
+    with _lock:
+        snapshot: List[Tuple[str, Dict]] = [(k, {**v, "buckets": list(v["buckets"]), "attrs": dict(v["attrs"])})
+                                            for k, v in sorted(_metrics.items())]
+    for name, m in snapshot:
+        for b, n in zip(BUCKETS, m["buckets"]):
+            lines.append(f'agent_span_duration_seconds_bucket{{span="{name}",le="{b}"}} {n}')
+        lines.append(f'agent_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {m["count"]}')
+        lines.append(f'agent_span_duration_seconds_sum{{span="{name}"}} {m["sum"]:.6f}')
+        lines.append(f'agent_span_duration_seconds_count{{span="{name}"}} {m["count"]}')
+    lines += ["# HELP agent_span_errors_total Spans terminés par une exception.",
+              "# TYPE agent_span_errors_total counter"]
+    lines += [f'agent_span_errors_total{{span="{name}"}} {m["errors"]}' for name, m in snapshot]
+    lines += ["# HELP agent_span_attr_total Somme des attributs numériques (tokens, caractères, hits...).",
+              "# TYPE agent_span_attr_total counter"]
+    for name, m in snapshot:
+        for attr, total in sorted(m["attrs"].items()):
+            lines.append(f'agent_span_attr_total{{span="{name}",attr="{attr}"}} {total}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
+
+
+def start():
+    """Point d'entrée : ouvre l'endpoint Prometheus si AGENT_METRICS_PORT est défini (idempotent)."""
+    if AGENT_METRICS_PORT:
+        start_metrics_server(AGENT_METRICS_PORT)
+
+
+def enable(path: Optional[str] = None, metrics_port: Optional[int] = None):
+    global _enabled, _jsonl
+    with _lock:
+        if path and _jsonl is None:
+            _jsonl = open(path, "a", encoding="utf-8")
+        _enabled = True
+    if metrics_port:
+        start_metrics_server(metrics_port)
+
+
+def disable():
+    global _enabled, _jsonl
+    with _lock:
+        _enabled = False
+        if _jsonl is not None:
+            _jsonl.close()
+            _jsonl = None
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+if AGENT_TRACE or AGENT_METRICS_PORT:
+    enable(AGENT_TRACE)  # spans actifs dès l'import ; le port attend start()